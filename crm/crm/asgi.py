@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'crm.settings')
+# vues asynchrones de lecture des clients, contrats et événements
+os.environ.setdefault('CRM_API_ASYNC_READ', '1')
 
 application = get_asgi_application()
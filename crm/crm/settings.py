@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -47,6 +48,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'crm_api.async_views.StreamingMiddleware',
+    'crm_api.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -138,7 +141,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     # Paramètres de pagination
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'crm_api.pagination.CrmPagination',
     'PAGE_SIZE': 100,
     # Classes de permission
     'DEFAULT_PERMISSION_CLASSES': (
@@ -146,10 +149,23 @@ REST_FRAMEWORK = {
     ),
     # Authentification avec rest_framework_jwt
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_jwt.authentication.JSONWebTokenAuthentication',
+        'crm_api.authentication.RoleClaimsJSONWebTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ),
+    # Rendu et lecture du JSON avec orjson s'il est installé, et de
+    # MessagePack (application/msgpack) pour les services de synchronisation
+    'DEFAULT_RENDERER_CLASSES': [
+        'crm_api.renderers.FastJSONRenderer',
+        'crm_api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'crm_api.parsers.FastJSONParser',
+        'crm_api.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     # Format par défaut des requetes
     'TEST_REQUEST_DEFAULT_FORMAT': 'json',
     'TEST_REQUEST_RENDERER_CLASSES': [
@@ -168,6 +184,110 @@ JWT_AUTH = {
     'JWT_AUTH_HEADER_PREFIX': 'Bearer',
 }
 
+# Paramètres de l'application crm_api
+# Durée de mise en cache (en secondes) du profil des utilisateurs, invalidé
+# par signal (0 pour désactiver ; le cache doit être partagé entre les
+# processus en production : avertissement crm_api.W004 avec le cache en
+# mémoire locale)
+CRM_API_PROFILE_CACHE_TIMEOUT = 300
+# Tokens JWT portant le rôle, les contacts et les permissions de l'utilisateur
+# (les versions de révocation sont stockées dans la table TokenVersions et
+# gardées dans le cache, qui doit être partagé entre les processus en
+# production : avertissement crm_api.W001 avec le cache en mémoire locale)
+CRM_API_JWT_ROLE_CLAIMS = False
+# Durée maximale (en secondes) de conservation de la matrice des permissions
+# par rôle, invalidée par signal dans le processus qui modifie les groupes
+CRM_API_PERMISSION_MATRIX_TIMEOUT = 300
+# Durée maximale (en secondes) de conservation des tables EventStatus et Group
+# par le registre des tables de référence, invalidé par signal dans le
+# processus qui les modifie
+CRM_API_LOOKUP_TIMEOUT = 300
+# Cache des représentations des clients, contrats et événements servies par
+# retrieve, invalidé par signal ; CRM_API_OBJECT_CACHE_ALIAS désigne le cache
+# de CACHES à utiliser, qui doit être partagé entre les processus en
+# production (avertissement crm_api.W003 avec un cache en mémoire locale)
+CRM_API_OBJECT_CACHE = False
+CRM_API_OBJECT_CACHE_ALIAS = "default"
+CRM_API_OBJECT_CACHE_TIMEOUT = 300
+# ETag et Last-Modified des listes de clients, contrats et événements
+# (une requête d'agrégation max(date_updated) et COUNT par liste, y compris
+# avec la pagination par curseur et les counts estimés ou mis en cache)
+CRM_API_CONDITIONAL_LIST = False
+# Cache des réponses des listes de clients, contrats et événements par rôle,
+# contact et paramètres, invalidé à chaque écriture pour les contacts concernés
+# (le cache doit être partagé entre les processus en production :
+# avertissement crm_api.W002 avec le cache en mémoire locale)
+CRM_API_LIST_CACHE = False
+CRM_API_LIST_CACHE_TIMEOUT = 60
+# Exécution unique des listes identiques (même url, même contact) demandées
+# simultanément, les autres requêtes attendant son résultat au plus
+# CRM_API_COALESCE_TIMEOUT secondes avant de s'exécuter elles-mêmes (requêtes
+# traitées en parallèle : serveur WSGI multi-thread ou, en ASGI, vues de
+# CRM_API_ASYNC_READ ; les autres vues synchrones sont traitées une à une
+# par Django 3.2 en ASGI)
+CRM_API_COALESCE_LIST = False
+CRM_API_COALESCE_TIMEOUT = 30
+# Listes des vues avec fast_list = True construites à partir de .values()
+# sans instancier les modèles (représentations identiques aux sérializers)
+CRM_API_FAST_LIST = True
+# Compression des réponses par CompressionMiddleware : codages par ordre de
+# préférence (br et zstd si les paquets brotli et zstandard sont installés),
+# niveau de chaque codage, taille minimale (en octets) des réponses
+# compressées, compression des exports en flux et types de contenu compressés
+CRM_API_COMPRESSION_CODINGS = ["zstd", "br", "gzip"]
+CRM_API_COMPRESSION_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+CRM_API_COMPRESSION_MIN_SIZE = 1024
+CRM_API_COMPRESSION_STREAMING = True
+CRM_API_COMPRESSION_CONTENT_TYPES = [
+    "application/json",
+    "application/msgpack",
+    "application/x-ndjson",
+    "text/",
+]
+# Journalisation des métriques de compression (taux, temps CPU par Mo)
+# toutes les N réponses compressées (0 : jamais)
+CRM_API_COMPRESSION_METRICS_INTERVAL = 1000
+# Vues asynchrones de list et retrieve des clients, contrats et événements,
+# activées par crm/asgi.py : les requêtes de lecture sont traitées par un pool
+# de CRM_API_ASYNC_READ_THREADS threads (à ajuster aux connexions disponibles
+# de la base de données)
+CRM_API_ASYNC_READ = os.environ.get("CRM_API_ASYNC_READ") == "1"
+CRM_API_ASYNC_READ_THREADS = 8
+# Filtrage des clients, contrats et événements avec la table Visibilities,
+# maintenue par signal seulement lorsque ce paramètre est activé (à construire
+# avec la commande rebuildvisibility avant activation) ; sans elle, une
+# écriture invalide toutes les listes du cache des listes
+CRM_API_VISIBILITY_INDEX = False
+# Pagination : au-delà de ce nombre de lignes estimé par PostgreSQL, le champ
+# count est l'estimation du planificateur (None : toujours un COUNT exact,
+# sans requête EXPLAIN) ; les pages suivantes sont alors trouvées en lisant
+# une ligne de plus que la page, le count n'étant qu'indicatif
+CRM_API_COUNT_ESTIMATE_THRESHOLD = None
+# Durée de mise en cache (en secondes) du count par rôle, contact et filtres
+# (0 : pas de cache)
+CRM_API_COUNT_CACHE_TIMEOUT = 0
+# Nombre de lignes lues par lot lors des exports NDJSON et CSV (en ASGI,
+# lots lus dans le thread de l'export par StreamingMiddleware)
+CRM_API_EXPORT_CHUNK_SIZE = 2000
+# Nombre maximal d'objets par requête des endpoints bulk et taille des lots
+# d'INSERT envoyés à la base de données
+CRM_API_BULK_MAX_SIZE = 10000
+CRM_API_BULK_BATCH_SIZE = 1000
+# Suppression des contacts : au-delà de ce nombre de clients, contrats et
+# événements supprimés en cascade, la suppression est faite par lots en
+# arrière-plan (l'avancement est conservé dans le cache, qui doit être partagé
+# entre les processus en production)
+CRM_API_DELETION_THRESHOLD = 1000
+CRM_API_DELETION_CHUNK_SIZE = 500
+# Durée de conservation (en secondes) de l'état d'une suppression, prolongée
+# à chaque lot
+CRM_API_DELETION_JOB_TIMEOUT = 3600
+# Durée (en secondes) sans avancement au-delà de laquelle une suppression en
+# arrière-plan est signalée interrompue (processus arrêté ou recyclé), à
+# reprendre avec la commande deletecontact ; une nouvelle suppression du
+# contact n'est démarrée qu'une fois ce délai écoulé
+CRM_API_DELETION_JOB_STALE_TIMEOUT = 300
+
 
 LOGIN_REDIRECT_URL = '/admin/'
 LOGIN_URL = '/login/'
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CrmApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'crm_api'
+
+    def ready(self):
+        # connexion des receivers des signaux et enregistrement des checks
+        from crm_api import checks, signals  # noqa: F401
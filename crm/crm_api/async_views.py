@@ -0,0 +1,128 @@
+"""
+Module with the asynchronous (ASGI) read endpoints of the viewsets
+"""
+import functools
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.utils.deprecation import MiddlewareMixin
+
+READ_METHODS = ("GET", "HEAD")
+READ_ACTIONS = ("list", "retrieve")
+
+_executor_lock = threading.Lock()
+_executor = None
+
+
+def get_executor():
+    """
+    Returns the process-wide pool of CRM_API_ASYNC_READ_THREADS threads
+    running the read requests, created on first use
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.CRM_API_ASYNC_READ_THREADS,
+                thread_name_prefix="crm_api_read",
+            )
+        return _executor
+
+
+def run_read(view, request, *args, **kwargs):
+    """
+    Runs a read request in a thread of the pool and renders its response
+    there, the connections to the database of the thread being closed
+    when they are expired, as Django does around each request
+    """
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, "render", None)):
+            response = response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_read_view(view):
+    """
+    Returns an asynchronous view running the GET and HEAD requests of a view
+    in the pool of get_executor(), the other requests as Django runs
+    the synchronous views.
+    Django 3.2 has no asynchronous ORM: the authentication, the permissions,
+    the profile, the queries and the serialization stay synchronous,
+    but only the requests being processed hold a thread of the bounded pool,
+    the requests waiting for it or sending their response do not
+    """
+
+    async def async_view(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await sync_to_async(
+                run_read, thread_sensitive=False, executor=get_executor()
+            )(view, request, *args, **kwargs)
+        return await sync_to_async(view)(request, *args, **kwargs)
+
+    # csrf_exempt, cls, initkwargs et actions de la vue de DRF
+    return functools.update_wrapper(async_view, view)
+
+
+class AsyncReadMixin:
+    """
+    Viewset mixin making the views of list and retrieve asynchronous
+    when CRM_API_ASYNC_READ is True (under ASGI, see crm/asgi.py)
+    """
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.CRM_API_ASYNC_READ:
+            return view
+        if actions.get("get") not in READ_ACTIONS:
+            return view
+        return async_read_view(view)
+
+
+def threaded_stream(chunks, batch_size):
+    """
+    Yields the chunks of a streaming response joined by batches of at most
+    batch_size, each batch being pulled in a thread dedicated to the stream:
+    the queries of the server-side cursor stay on the connection of this
+    thread, closed at the end of the stream
+    """
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="crm_api_stream")
+    iterator = iter(chunks)
+    try:
+        while True:
+            batch = executor.submit(list, itertools.islice(iterator, batch_size))
+            batch = batch.result()
+            if not batch:
+                return
+            yield b"".join(batch)
+    finally:
+        executor.submit(connections.close_all).result()
+        executor.shutdown()
+
+
+class StreamingMiddleware(MiddlewareMixin):
+    """
+    Middleware pulling the streaming responses (exports) in a worker thread
+    under ASGI, by batches of CRM_API_EXPORT_CHUNK_SIZE chunks.
+    The ASGI handler of Django 3.2 iterates them on the event loop,
+    where the queries raise SynchronousOnlyOperation: the event loop waits
+    for each batch, the queries, the serialization and the compression
+    of the middlewares below being done in the thread of the stream.
+    Under WSGI, the responses are left as they are
+    """
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if response.streaming:
+            response.streaming_content = threaded_stream(
+                response.streaming_content, settings.CRM_API_EXPORT_CHUNK_SIZE
+            )
+        return response
@@ -0,0 +1,162 @@
+"""
+Module for customized authentication classes
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils.translation import gettext as _
+from rest_framework import exceptions
+from rest_framework_jwt.authentication import JSONWebTokenAuthentication
+from rest_framework_jwt.settings import api_settings
+
+from crm_api.filters import Profile
+from crm_api.models import TokenVersion
+
+jwt_payload_handler = api_settings.JWT_PAYLOAD_HANDLER
+
+TOKEN_VERSION_KEY = "crm_api:jwt:version:{}"
+TOKEN_GLOBAL_VERSION_KEY = "crm_api:jwt:version"
+
+
+def token_version_key(user_id):
+    """
+    Returns the cache key of the token version of a user
+    """
+    return TOKEN_VERSION_KEY.format(user_id)
+
+
+def get_token_version(user_id):
+    """
+    Returns the tuple (global version, user version) that a token
+    must carry to be accepted, read from the table TokenVersions
+    when the cache does not have it (evicted, restarted, ...)
+    """
+    keys = [TOKEN_GLOBAL_VERSION_KEY, token_version_key(user_id)]
+    versions = cache.get_many(keys)
+    if len(versions) < len(keys):
+        stored = dict(
+            TokenVersion.objects.filter(
+                user_id__in=[TokenVersion.ALL_USERS, user_id]
+            ).values_list("user_id", "version")
+        )
+        versions = {
+            TOKEN_GLOBAL_VERSION_KEY: stored.get(TokenVersion.ALL_USERS, 0),
+            token_version_key(user_id): stored.get(user_id, 0),
+        }
+        cache.set_many(versions, None)
+    return [versions[key] for key in keys]
+
+
+def _bump(user_id, key):
+    """
+    Increments a version in the table TokenVersions and removes it
+    from the cache, now and once committed, so that it is read again
+    """
+    with transaction.atomic():
+        TokenVersion.objects.get_or_create(user_id=user_id)
+        TokenVersion.objects.filter(user_id=user_id).update(version=F("version") + 1)
+    cache.delete(key)
+    # version lue par une autre requête avant le commit
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def revoke_tokens(user_id):
+    """
+    Revokes all the role claims tokens issued to a user
+    """
+    _bump(user_id, token_version_key(user_id))
+
+
+def revoke_all_tokens():
+    """
+    Revokes all the role claims tokens,
+    e.g. when the permissions of a group change
+    """
+    _bump(TokenVersion.ALL_USERS, TOKEN_GLOBAL_VERSION_KEY)
+
+
+def role_claims_payload_handler(user):
+    """
+    Returns the payload of a token carrying the role, the contact ids,
+    the permissions and the token version of the user
+    """
+    payload = jwt_payload_handler(user)
+    the_profile = Profile.from_user(user)
+    payload["role"] = the_profile.role
+    payload["contacts"] = [
+        the_profile.staff_contact_id,
+        the_profile.sales_contact_id,
+        the_profile.support_contact_id,
+    ]
+    payload["su"] = user.is_superuser
+    payload["perms"] = sorted(user.get_all_permissions())
+    payload["ver"] = get_token_version(user.pk)
+    return payload
+
+
+class TokenUser:
+    """
+    Lightweight user built from the claims of a token without database access
+    """
+
+    is_active = True
+    is_anonymous = False
+    is_authenticated = True
+
+    def __init__(self, payload):
+        """
+        Init TokenUser from the payload of a token
+        """
+        self.pk = self.id = payload["user_id"]
+        self.username = payload.get("username", "")
+        self.is_superuser = bool(payload.get("su", False))
+        # pas d'accès à l'administration de Django avec un token
+        self.is_staff = False
+        self.has_crm_role = payload.get("role") is not None
+        self.contact_ids = tuple(payload["contacts"])
+        self.role = payload.get("role")
+        self._perms = frozenset(payload.get("perms", []))
+
+    def get_username(self):
+        """
+        Returns the username
+        """
+        return self.username
+
+    def get_all_permissions(self, obj=None):
+        """
+        Returns the permissions carried by the token
+        """
+        return set(self._perms)
+
+    def has_perm(self, perm, obj=None):
+        """
+        Returns True if the token carries the permission
+        """
+        return self.is_superuser or perm in self._perms
+
+    def has_perms(self, perm_list, obj=None):
+        """
+        Returns True if the token carries all the permissions
+        """
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def __str__(self):
+        return self.username
+
+
+class RoleClaimsJSONWebTokenAuthentication(JSONWebTokenAuthentication):
+    """
+    JSON Web Token authentication that builds a TokenUser from the role
+    claims of a token, and loads the User from the database otherwise
+    """
+
+    def authenticate_credentials(self, payload):
+        """
+        Returns a TokenUser for a role claims token which has not been revoked
+        """
+        if "role" not in payload:
+            return super().authenticate_credentials(payload)
+        if payload.get("ver") != get_token_version(payload["user_id"]):
+            raise exceptions.AuthenticationFailed(_("Token has been revoked."))
+        return TokenUser(payload)
@@ -0,0 +1,338 @@
+"""
+Module for the bulk operations on clients, contracts and events
+"""
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueValidator
+
+from crm_api import list_cache, object_cache, visibility
+from crm_api.models import Client, Contract, Event
+
+
+def check_batch(items):
+    """
+    Raises a ValidationError if items is not a list of at most
+    CRM_API_BULK_MAX_SIZE objects
+    """
+    if not isinstance(items, list):
+        raise ValidationError(detail="a list of objects is expected", code="invalid")
+    if len(items) > settings.CRM_API_BULK_MAX_SIZE:
+        raise ValidationError(
+            detail=f"at most {settings.CRM_API_BULK_MAX_SIZE} objects are accepted",
+            code="invalid",
+        )
+
+
+def has_filters(request, view):
+    """
+    Returns True if the request filters the objects of the view with one
+    of its filterset_fields or its search parameter
+    """
+    names = set(getattr(view, "filterset_fields", None) or ())
+    if getattr(view, "search_fields", None):
+        names.add(api_settings.SEARCH_PARAM)
+    return any(request.query_params.get(name) for name in names)
+
+
+def pop_unique_validators(serializer):
+    """
+    Removes the UniqueValidator of the fields of the serializer,
+    the unicity being checked for the whole batch,
+    returns a dict mapping each field name to its validator
+    """
+    unique_validators = dict()
+    for name, field in serializer.fields.items():
+        for validator in field.validators:
+            if isinstance(validator, UniqueValidator):
+                unique_validators[name] = validator
+        if name in unique_validators:
+            field.validators = [
+                validator
+                for validator in field.validators
+                if not isinstance(validator, UniqueValidator)
+            ]
+    return unique_validators
+
+
+def check_unique(model, validated, unique_validators, errors):
+    """
+    Checks with one query per unique field that the values
+    are neither already in the database nor repeated in the batch
+    """
+    for name, validator in unique_validators.items():
+        indexes = dict()
+        for index, data in enumerate(validated):
+            if data is not None and name in data:
+                indexes.setdefault(data[name], []).append(index)
+        existing = set(
+            model.objects.filter(**{f"{name}__in": list(indexes)})
+            .values_list(name, flat=True)
+        )
+        for value, value_indexes in indexes.items():
+            # la première occurrence est acceptée si la valeur est nouvelle
+            duplicates = value_indexes if value in existing else value_indexes[1:]
+            for index in duplicates:
+                errors[index].setdefault(name, []).append(validator.message)
+
+
+def resolve_relations(validated, items, relations, errors):
+    """
+    Fetches the related objects with one query per relation,
+    returns a dict mapping each field to the objects by pk
+    """
+    related = dict()
+    for field, model, key in relations:
+        pks = dict()
+        for index, data in enumerate(validated):
+            if data is None:
+                continue
+            try:
+                pks[index] = model._meta.pk.to_python(items[index][key])
+            except DjangoValidationError:
+                errors[index].setdefault(key, []).append(
+                    f'Incorrect type. Expected pk value, received "{items[index][key]}".'
+                )
+        related[field] = model.objects.in_bulk(set(pks.values()))
+        for index, pk in pks.items():
+            if pk not in related[field]:
+                errors[index].setdefault(key, []).append(
+                    f'Invalid pk "{pk}" - object does not exist.'
+                )
+    return related
+
+
+def bulk_create(serializer_class, items, relations, **extra):
+    """
+    Validates a list of objects with the serializer, resolves the related
+    objects given as (field, model, key) with one query per relation,
+    and inserts them with bulk_create in a single transaction.
+    Returns the tuple (instances, errors), errors being None
+    or a list of errors by object as for a serializer with many=True
+    """
+    check_batch(items)
+    model = serializer_class.Meta.model
+    errors = [dict() for _ in items]
+    validated = [None] * len(items)
+    unique_validators = dict()
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[index]["non_field_errors"] = ["an object is expected"]
+            continue
+        serializer = serializer_class(data=item)
+        unique_validators.update(pop_unique_validators(serializer))
+        if serializer.is_valid():
+            validated[index] = serializer.validated_data
+        else:
+            errors[index] = serializer.errors
+    check_unique(model, validated, unique_validators, errors)
+    related = resolve_relations(validated, items, relations, errors)
+    if any(errors):
+        return [], errors
+    instances = [
+        model(
+            **data,
+            **{
+                field: related[field][model_._meta.pk.to_python(items[index][key])]
+                for field, model_, key in relations
+            },
+            **extra,
+        )
+        for index, data in enumerate(validated)
+    ]
+    with transaction.atomic():
+        model.objects.bulk_create(instances, batch_size=settings.CRM_API_BULK_BATCH_SIZE)
+        if instances and instances[0].pk is None and unique_validators:
+            # base de données ne renvoyant pas les clés primaires insérées
+            name = next(iter(unique_validators))
+            pks = model.objects.in_bulk(
+                [getattr(instance, name) for instance in instances], field_name=name
+            )
+            for instance in instances:
+                instance.pk = pks[getattr(instance, name)].pk
+        # bulk_create n'envoie pas de signaux
+        visibility.clients_changed(
+            instance.pk if model is Client else instance.client_id
+            for instance in instances
+        )
+    return instances, None
+
+
+def validate_changes(serializer, changes, updatable, resolvers):
+    """
+    Validates the changes with the fields of the serializer,
+    returns the tuple (values, errors)
+    """
+    values, errors = dict(), dict()
+    for name, value in changes.items():
+        try:
+            if name in resolvers:
+                field_name, resolved = resolvers[name](value)
+                values[field_name] = resolved
+            elif name in updatable:
+                values[name] = serializer.fields[name].run_validation(value)
+            else:
+                errors[name] = ["this field can not be updated"]
+        except ValidationError as exc:
+            errors[name] = exc.detail
+    if not values and not errors:
+        errors["non_field_errors"] = ["no field to update"]
+    return values, errors
+
+
+def bulk_update(queryset, serializer_class, data, updatable, resolvers=None,
+                filtered=False):
+    """
+    Applies the changes of data to the objects of the queryset and bumps
+    their date_updated, data being either a list of objects with their id,
+    saved with bulk_update, or a dict of changes applied with a single UPDATE
+    to the objects of its "ids" list or, when the request is filtered,
+    to the filtered queryset, at most CRM_API_BULK_MAX_SIZE objects.
+    Returns the tuple (number of updated objects, errors)
+    """
+    resolvers = resolvers or dict()
+    serializer = serializer_class()
+    model = queryset.model
+    now = timezone.now()
+    max_size = settings.CRM_API_BULK_MAX_SIZE
+    if isinstance(data, dict):
+        data = dict(data)
+        ids = data.pop("ids", None)
+        values, errors = validate_changes(serializer, data, updatable, resolvers)
+        if ids is not None:
+            try:
+                check_batch(ids)
+                queryset = queryset.filter(
+                    pk__in=[model._meta.pk.to_python(pk) for pk in ids]
+                )
+            except (DjangoValidationError, TypeError):
+                errors["ids"] = ["a list of ids is expected"]
+            except ValidationError as exc:
+                errors["ids"] = exc.detail
+        elif not filtered:
+            # pas de modification de tous les objets visibles par erreur
+            errors["non_field_errors"] = [
+                "a filter or a list of ids is required to update many objects"
+            ]
+        if errors:
+            return 0, errors
+        with transaction.atomic():
+            rows = list(queryset.values_list("pk", "client_id")[:max_size + 1])
+            if len(rows) > max_size:
+                return 0, {
+                    "non_field_errors": [
+                        f"at most {max_size} objects can be updated at once"
+                    ]
+                }
+            count = model.objects.filter(pk__in=[pk for pk, _ in rows]).update(
+                **values, date_updated=now
+            )
+        # update n'envoie pas de signaux
+        object_cache.invalidate_model(model)
+        list_cache.invalidate_clients({client_id for _, client_id in rows})
+        return count, None
+    check_batch(data)
+    errors = [dict() for _ in data]
+    changes = [None] * len(data)
+    pks = dict()
+    for index, item in enumerate(data):
+        if not isinstance(item, dict) or "id" not in item:
+            errors[index]["non_field_errors"] = ["an object with its id is expected"]
+            continue
+        try:
+            pks[index] = model._meta.pk.to_python(item["id"])
+        except DjangoValidationError:
+            errors[index]["id"] = [
+                f'Incorrect type. Expected pk value, received "{item["id"]}".'
+            ]
+        changes[index], item_errors = validate_changes(
+            serializer,
+            {name: value for name, value in item.items() if name != "id"},
+            updatable,
+            resolvers,
+        )
+        errors[index].update(item_errors)
+    fields = {"date_updated"}
+    with transaction.atomic():
+        instances = queryset.select_for_update(of=("self",)).in_bulk(set(pks.values()))
+        for index, pk in pks.items():
+            if pk not in instances:
+                # objet inexistant ou non visible par l'utilisateur
+                errors[index]["id"] = ["Not found."]
+        if any(errors):
+            return 0, errors
+        for index, pk in pks.items():
+            for name, value in changes[index].items():
+                setattr(instances[pk], name, value)
+                fields.add(name)
+            instances[pk].date_updated = now
+        model.objects.bulk_update(
+            instances.values(), fields, batch_size=settings.CRM_API_BULK_BATCH_SIZE
+        )
+    # bulk_update n'envoie pas de signaux
+    object_cache.invalidate(model, instances.keys())
+    list_cache.invalidate_clients(
+        {instance.client_id for instance in instances.values()}
+    )
+    # le client et le contact ne sont pas modifiables : visibilité inchangée
+    return len(instances), None
+
+
+def reassign(model, field, from_contact, to_contact, chunk_size=None):
+    """
+    Moves the objects of a contact to another contact with set-based UPDATEs,
+    by chunks of chunk_size objects each in its own transaction
+    (all the objects at once if chunk_size is None),
+    returns the number of moved objects
+    """
+    client_field = "pk" if model is Client else "client_id"
+    count = 0
+    while True:
+        with transaction.atomic():
+            rows = model.objects.filter(**{field: from_contact}).order_by("pk")
+            rows = rows.values_list("pk", client_field)
+            rows = list(rows[:chunk_size] if chunk_size else rows)
+            if not rows:
+                return count
+            count += model.objects.filter(pk__in=[pk for pk, _ in rows]).update(
+                **{field: to_contact}, date_updated=timezone.now()
+            )
+            # update n'envoie pas de signaux
+            visibility.clients_changed(client_id for _, client_id in rows)
+            object_cache.invalidate(model, [pk for pk, _ in rows])
+        if not chunk_size:
+            return count
+
+
+def reassign_sales_portfolio(from_contact, to_contact, chunk_size=None):
+    """
+    Moves the clients and the contracts of a sales contact to another one,
+    in a single transaction if chunk_size is None,
+    returns the numbers of moved clients and contracts
+    """
+    with nullcontext() if chunk_size else transaction.atomic():
+        return {
+            "clients": reassign(
+                Client, "sales_contact", from_contact, to_contact, chunk_size
+            ),
+            "contracts": reassign(
+                Contract, "sales_contact", from_contact, to_contact, chunk_size
+            ),
+        }
+
+
+def reassign_support_events(from_contact, to_contact, chunk_size=None):
+    """
+    Moves the events of a support contact to another one,
+    returns the number of moved events
+    """
+    return {
+        "events": reassign(
+            Event, "support_contact", from_contact, to_contact, chunk_size
+        ),
+    }
@@ -0,0 +1,47 @@
+"""
+Module with the system checks of the settings of crm_api
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# caches propres à chaque processus
+LOCAL_CACHE_BACKENDS = ("django.core.cache.backends.locmem.LocMemCache",)
+
+# paramètres dont les invalidations passent par un cache : (paramètre,
+# paramètre désignant l'alias du cache ou None pour "default", identifiant)
+SHARED_CACHE_SETTINGS = (
+    ("CRM_API_JWT_ROLE_CLAIMS", None, "crm_api.W001"),
+    ("CRM_API_LIST_CACHE", None, "crm_api.W002"),
+    ("CRM_API_OBJECT_CACHE", "CRM_API_OBJECT_CACHE_ALIAS", "crm_api.W003"),
+    ("CRM_API_PROFILE_CACHE_TIMEOUT", None, "crm_api.W004"),
+)
+
+
+def is_local_cache(alias):
+    """
+    Returns True if the cache alias of CACHES is local to each process
+    """
+    return settings.CACHES[alias]["BACKEND"] in LOCAL_CACHE_BACKENDS
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """
+    Warns when a setting relying on invalidations through the cache is on
+    with a cache local to each process: the other processes do not see them
+    """
+    errors = []
+    for name, alias_setting, check_id in SHARED_CACHE_SETTINGS:
+        alias = getattr(settings, alias_setting) if alias_setting else "default"
+        if getattr(settings, name) and is_local_cache(alias):
+            errors.append(
+                Warning(
+                    f"{name} is on with a cache local to each process.",
+                    hint="Configure a cache shared between the processes "
+                    f"(Redis, Memcached, ...) as the cache {alias!r} of CACHES "
+                    "when running several processes.",
+                    obj="crm_api",
+                    id=check_id,
+                )
+            )
+    return errors
@@ -0,0 +1,111 @@
+"""
+Module coalescing the identical concurrent list requests of the clients,
+contracts and events into a single execution
+"""
+import threading
+
+from django.conf import settings
+from rest_framework.response import Response
+
+from crm_api import filters, list_cache
+
+
+class Flight:
+    """
+    Execution shared by the identical concurrent requests
+    """
+
+    def __init__(self):
+        """
+        Init a Flight without result
+        """
+        self.done = threading.Event()
+        self.data = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Process-wide registry of the executions in flight by key.
+    The first request of a key (the leader) executes the function,
+    the concurrent requests of the same key wait for its result
+    with a threading.Event.
+    The requests are only coalesced when they run in parallel threads:
+    under WSGI with a threaded server, or under ASGI with CRM_API_ASYNC_READ,
+    the lists running in the pool of crm_api.async_views. Under ASGI,
+    Django 3.2 runs the other synchronous views one at a time
+    in a single thread (sync_to_async with thread_sensitive=True),
+    so that no request is ever in flight while another one starts
+    """
+
+    _lock = threading.Lock()
+    _flights = dict()
+
+    @classmethod
+    def do(cls, key, function, timeout=None):
+        """
+        Returns the tuple (result of the function, shared), the function
+        being executed once for the concurrent calls of the key.
+        A waiter executes the function itself when the leader fails,
+        answers something else than a result or exceeds the timeout
+        """
+        with cls._lock:
+            flight = cls._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = cls._flights[key] = Flight()
+            else:
+                flight.waiters += 1
+        if not leader:
+            if flight.done.wait(timeout) and flight.data is not None:
+                return flight.data, True
+            return function(), False
+        try:
+            data = function()
+            flight.data = data
+            return data, False
+        finally:
+            with cls._lock:
+                del cls._flights[key]
+            flight.done.set()
+
+    @classmethod
+    def in_flight(cls):
+        """
+        Returns the number of executions in flight
+        """
+        with cls._lock:
+            return len(cls._flights)
+
+
+class CoalescingMixin:
+    """
+    Viewset mixin sharing the execution of list between the identical
+    concurrent requests when CRM_API_COALESCE_LIST is True.
+    The requests are identical when they have the same url and rendering
+    format and are made by the same role and contact in the same generation
+    of its lists (see crm_api.list_cache), so the waiters receive
+    the response they would have computed
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not settings.CRM_API_COALESCE_LIST:
+            return super().list(request, *args, **kwargs)
+        the_profile = filters.Profile.from_request(request)
+        if the_profile.is_anonymous:
+            return super().list(request, *args, **kwargs)
+        response = None
+
+        def execute():
+            nonlocal response
+            response = super(CoalescingMixin, self).list(request, *args, **kwargs)
+            return response.data if response.status_code == 200 else None
+
+        data, shared = SingleFlight.do(
+            list_cache.list_key(request, self, the_profile),
+            execute,
+            settings.CRM_API_COALESCE_TIMEOUT,
+        )
+        if shared:
+            return Response(data)
+        return response
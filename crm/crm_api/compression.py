@@ -0,0 +1,282 @@
+"""
+Module with the compression of the responses (gzip, and brotli and zstd
+when their packages are installed) and its metrics
+"""
+import logging
+import threading
+import time
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+
+class BrotliCompressor:
+    """
+    Brotli compressor with the interface of zlib.compressobj
+    """
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+def available_compressors():
+    """
+    Returns a dict mapping the available content codings to a function
+    returning a compressor (compress and flush) for a level
+    """
+    compressors = {
+        "gzip": lambda level: zlib.compressobj(level, zlib.DEFLATED, 31),
+    }
+    if brotli is not None:
+        compressors["br"] = BrotliCompressor
+    if zstandard is not None:
+        compressors["zstd"] = lambda level: zstandard.ZstdCompressor(
+            level=level
+        ).compressobj()
+    return compressors
+
+
+COMPRESSORS = available_compressors()
+
+
+def parse_accept_encoding(header):
+    """
+    Returns a dict mapping the codings of an Accept-Encoding header
+    to their quality
+    """
+    accepted = dict()
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+
+def negotiate(header):
+    """
+    Returns the coding of CRM_API_COMPRESSION_CODINGS with the highest
+    quality in the Accept-Encoding header, the first one on a tie, or None
+    """
+    accepted = parse_accept_encoding(header)
+    best, best_quality = None, 0.0
+    for coding in settings.CRM_API_COMPRESSION_CODINGS:
+        if coding not in COMPRESSORS:
+            continue
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def get_compressor(coding):
+    """
+    Returns a compressor of a coding at its level of CRM_API_COMPRESSION_LEVELS
+    """
+    return COMPRESSORS[coding](settings.CRM_API_COMPRESSION_LEVELS[coding])
+
+
+def is_compressible(response):
+    """
+    Returns True if the content type of the response is one of
+    CRM_API_COMPRESSION_CONTENT_TYPES (or starts with one ending with /)
+    """
+    content_type = response.get("Content-Type", "").split(";")[0].strip()
+    return any(
+        content_type.startswith(prefix) if prefix.endswith("/")
+        else content_type == prefix
+        for prefix in settings.CRM_API_COMPRESSION_CONTENT_TYPES
+    )
+
+
+class CompressionMetrics:
+    """
+    Process-wide counters of the compressed responses by coding:
+    number of responses, bytes before and after compression and CPU time
+    of the compression, logged every CRM_API_COMPRESSION_METRICS_INTERVAL
+    responses
+    """
+
+    _lock = threading.Lock()
+    _counters = dict()
+
+    @classmethod
+    def record(cls, coding, size, compressed_size, cpu_time):
+        """
+        Records the compression of a response
+        """
+        with cls._lock:
+            counters = cls._counters.setdefault(
+                coding,
+                {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_time": 0.0},
+            )
+            counters["responses"] += 1
+            counters["bytes_in"] += size
+            counters["bytes_out"] += compressed_size
+            counters["cpu_time"] += cpu_time
+            responses = sum(item["responses"] for item in cls._counters.values())
+        interval = settings.CRM_API_COMPRESSION_METRICS_INTERVAL
+        if interval and responses % interval == 0:
+            logger.info(msg=f"compression metrics: {cls.snapshot()}")
+
+    @classmethod
+    def snapshot(cls):
+        """
+        Returns the counters by coding with the compression ratio
+        and the CPU time in milliseconds per megabyte compressed
+        """
+        with cls._lock:
+            snapshot = {coding: dict(item) for coding, item in cls._counters.items()}
+        for item in snapshot.values():
+            item["ratio"] = round(item["bytes_in"] / (item["bytes_out"] or 1), 2)
+            item["cpu_ms_per_mb"] = round(
+                item["cpu_time"] * 1000 / ((item["bytes_in"] or 1) / 1e6), 2
+            )
+        return snapshot
+
+    @classmethod
+    def reset(cls):
+        """
+        Resets the counters
+        """
+        with cls._lock:
+            cls._counters = dict()
+
+
+def compress(coding, content):
+    """
+    Returns the content compressed with a coding and the CPU time spent
+    """
+    start = time.thread_time()
+    compressor = get_compressor(coding)
+    compressed = compressor.compress(content) + compressor.flush()
+    return compressed, time.thread_time() - start
+
+
+def compress_stream(coding, chunks):
+    """
+    Yields the chunks of a streaming response compressed with a coding,
+    the compressor emitting a block once it has enough data,
+    and records the metrics at the end of the stream
+    """
+    compressor = get_compressor(coding)
+    size = compressed_size = 0
+    cpu_time = 0.0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        start = time.thread_time()
+        compressed = compressor.compress(chunk)
+        cpu_time += time.thread_time() - start
+        size += len(chunk)
+        compressed_size += len(compressed)
+        if compressed:
+            yield compressed
+    start = time.thread_time()
+    compressed = compressor.flush()
+    cpu_time += time.thread_time() - start
+    compressed_size += len(compressed)
+    CompressionMetrics.record(coding, size, compressed_size, cpu_time)
+    yield compressed
+
+
+def weaken_etag(response):
+    """
+    Makes the strong ETag of a response weak, as GZipMiddleware does:
+    the representations compressed with each coding have different bytes
+    """
+    etag = response.get("ETag")
+    if etag and etag.startswith('"'):
+        response["ETag"] = f"W/{etag}"
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Middleware compressing the responses of CRM_API_COMPRESSION_CONTENT_TYPES
+    with the preferred coding accepted by the client: the responses of at
+    least CRM_API_COMPRESSION_MIN_SIZE bytes, and the streaming responses
+    (exports) block by block when CRM_API_COMPRESSION_STREAMING is True.
+    All the responses of these content types and the 304 responses vary
+    on Accept-Encoding, and their ETags are made weak, as GZipMiddleware
+    does, when the client accepts a coding, even if the response is too
+    small to be compressed: a 304 carries the ETag of the response it
+    validates.
+    Under ASGI, Django 3.2 runs the process_response of a MiddlewareMixin
+    in the single thread of the synchronous views (thread_sensitive=True):
+    the middleware is asynchronous there and compresses in a thread
+    of the default executor of asgiref instead
+    """
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return await sync_to_async(self.process_response, thread_sensitive=False)(
+            request, response
+        )
+
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding"):
+            return response
+        not_modified = response.status_code == 304
+        if not not_modified and not is_compressible(response):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        coding = negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if coding is None:
+            return response
+        weaken_etag(response)
+        if not_modified:
+            return response
+        if response.streaming:
+            if not settings.CRM_API_COMPRESSION_STREAMING:
+                return response
+        elif len(response.content) < settings.CRM_API_COMPRESSION_MIN_SIZE:
+            return response
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                coding, response.streaming_content
+            )
+            del response["Content-Length"]
+        else:
+            compressed, cpu_time = compress(coding, response.content)
+            CompressionMetrics.record(
+                coding, len(response.content), len(compressed), cpu_time
+            )
+            if len(compressed) >= len(response.content):
+                return response
+            response["Server-Timing"] = (
+                f'compress;dur={cpu_time * 1000:.2f};desc="{coding} '
+                f'{len(response.content) / len(compressed):.1f}x"'
+            )
+            response.content = compressed
+            response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = coding
+        return response
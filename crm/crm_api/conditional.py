@@ -0,0 +1,160 @@
+"""
+Module with the conditional requests (ETag and Last-Modified)
+based on the date_updated of the clients, contracts and events
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags
+
+from crm_api.identity import IdentityMap
+from crm_api.sparse import EXCLUDE_QUERY_PARAM, FIELDS_QUERY_PARAM
+
+
+def make_etag(*parts):
+    """
+    Returns a quoted ETag made of the parts
+    """
+    digest = hashlib.md5(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+# en-têtes des requêtes conditionnelles
+CONDITIONAL_HEADERS = (
+    "HTTP_IF_MATCH",
+    "HTTP_IF_NONE_MATCH",
+    "HTTP_IF_MODIFIED_SINCE",
+    "HTTP_IF_UNMODIFIED_SINCE",
+)
+
+
+def is_conditional(request):
+    """
+    Returns True if the request has a conditional header
+    """
+    return any(header in request.META for header in CONDITIONAL_HEADERS)
+
+
+def strengthen_if_match(request):
+    """
+    Removes the W/ prefix of the ETags of If-Match, which Django compares
+    strongly: the ETags of the views are only made weak by
+    CompressionMiddleware (see crm_api.compression) and the clients send
+    them back as they received them
+    """
+    if_match = request.META.get("HTTP_IF_MATCH")
+    if if_match:
+        request.META["HTTP_IF_MATCH"] = ", ".join(
+            etag[2:] if etag.startswith("W/") else etag
+            for etag in parse_etags(if_match)
+        )
+
+
+class ConditionalMixin:
+    """
+    Viewset mixin emitting ETag and Last-Modified on list and retrieve,
+    answering 304 to If-None-Match and If-Modified-Since before serializing,
+    and 412 to a failed If-Match or If-Unmodified-Since on updates.
+    The validators are read before the handler for the conditional requests
+    only, the others taking them from the IdentityMap after the handler
+    """
+
+    def get_object_validators(self):
+        """
+        Returns the ETag and the Last-Modified timestamp of the object
+        of the request, from its date_updated and the requested fieldset,
+        or (None, None)
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        model = self.get_queryset().model
+        try:
+            pk = model._meta.pk.to_python(self.kwargs[lookup_url_kwarg])
+        except ValidationError:
+            return None, None
+        # objet déjà chargé par get_object, ou lu une seule fois par requête
+        date_updated = IdentityMap.of(self.request).version(
+            model, pk, lambda: self.filter_queryset(self.get_queryset())
+        )
+        if date_updated is None:
+            return None, None
+        etag = make_etag(
+            model._meta.model_name,
+            pk,
+            date_updated.isoformat(),
+            self.request.accepted_renderer.format,
+            self.request.query_params.get(FIELDS_QUERY_PARAM, ""),
+            self.request.query_params.get(EXCLUDE_QUERY_PARAM, ""),
+        )
+        return etag, int(date_updated.timestamp())
+
+    def get_list_validators(self):
+        """
+        Returns the ETag and the Last-Modified timestamp of the list
+        of the request, from the max(date_updated) and the count
+        of the visible objects
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        aggregate = queryset.aggregate(last=Max("date_updated"), count=Count("pk"))
+        last = aggregate["last"]
+        etag = make_etag(
+            queryset.model._meta.model_name,
+            self.request.get_full_path(),
+            last.isoformat() if last else "",
+            aggregate["count"],
+            self.request.accepted_renderer.format,
+        )
+        return etag, int(last.timestamp()) if last else None
+
+    def set_validators(self, response, etag, last_modified):
+        """
+        Sets the ETag and Last-Modified headers of a successful response
+        """
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            if etag:
+                response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def conditional(self, validators, handler, *args, **kwargs):
+        """
+        Returns the conditional response of the request if any,
+        the response of the handler with its validators otherwise
+        """
+        etag = last_modified = None
+        conditional = is_conditional(self.request)
+        if conditional:
+            etag, last_modified = validators()
+            strengthen_if_match(self.request)
+            response = get_conditional_response(
+                self.request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                return self.set_validators(response, etag, last_modified)
+        response = handler(self.request, *args, **kwargs)
+        if not 200 <= response.status_code < 300:
+            return response
+        if not conditional or self.request.method not in ("GET", "HEAD"):
+            # validateurs de l'objet chargé (ou modifié) par le handler
+            etag, last_modified = validators()
+        return self.set_validators(response, etag, last_modified)
+
+    def list(self, request, *args, **kwargs):
+        if not settings.CRM_API_CONDITIONAL_LIST:
+            return super().list(request, *args, **kwargs)
+        return self.conditional(
+            self.get_list_validators, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(
+            self.get_object_validators, super().retrieve, *args, **kwargs
+        )
+
+    def update(self, request, *args, **kwargs):
+        return self.conditional(
+            self.get_object_validators, super().update, *args, **kwargs
+        )
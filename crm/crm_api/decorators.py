@@ -1,8 +1,12 @@
 """
 Module for customized decorators
 """
+from functools import wraps
+
 from rest_framework.exceptions import PermissionDenied
 
+from crm_api.permissions import user_has_perm
+
 
 def route_permissions(permission_required):
     """Decorator that performs a method if the user has the permission
@@ -14,11 +18,12 @@ def route_permissions(permission_required):
         the wrapper method
         """
 
+        @wraps(drf_custom_method)
         def _decorator(self, *args, **kwargs):
             """
             the inner method
             """
-            if self.request.user.has_perm(permission_required):
+            if user_has_perm(self.request, permission_required):
                 return drf_custom_method(self, *args, **kwargs)
             else:
                 raise PermissionDenied()
@@ -0,0 +1,219 @@
+"""
+Module deleting the contacts and the objects of their cascade by chunks
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, pre_delete
+
+from crm_api import object_cache, signals, visibility
+from crm_api.models import Client, Contract, Event, SalesContact, SupportContact
+
+logger = logging.getLogger(__name__)
+
+DELETION_JOB_KEY = "crm_api:deletion:{}:{}"
+DELETION_CLAIM_KEY = "crm_api:deletion:{}:{}:claim"
+
+
+def deletion_job_key(model, pk):
+    """
+    Returns the cache key of the deletion job of a contact
+    """
+    return DELETION_JOB_KEY.format(model._meta.model_name, pk)
+
+
+def deletion_claim_key(model, pk):
+    """
+    Returns the cache key held by the running deletion job of a contact
+    """
+    return DELETION_CLAIM_KEY.format(model._meta.model_name, pk)
+
+
+def cascade(contact):
+    """
+    Returns the querysets of the objects deleted with a contact,
+    in the order they must be deleted
+    """
+    if isinstance(contact, SalesContact):
+        return [
+            Event.objects.filter(client__sales_contact=contact),
+            Contract.objects.filter(
+                Q(client__sales_contact=contact) | Q(sales_contact=contact)
+            ),
+            Client.objects.filter(sales_contact=contact),
+        ]
+    if isinstance(contact, SupportContact):
+        return [Event.objects.filter(support_contact=contact)]
+    return []
+
+
+def cascade_size(contact):
+    """
+    Returns the number of objects deleted with a contact
+    """
+    return sum(queryset.count() for queryset in cascade(contact))
+
+
+def can_raw_delete(model):
+    """
+    Returns True if the only receivers of pre_delete and post_delete
+    for the model are those whose work delete_chunks does once per chunk
+    (see signals.CHUNK_DELETE_RECEIVERS)
+    """
+    receivers = pre_delete._live_receivers(model) + post_delete._live_receivers(model)
+    return all(receiver in signals.CHUNK_DELETE_RECEIVERS for receiver in receivers)
+
+
+def delete_chunks(queryset, chunk_size):
+    """
+    Deletes the objects of the queryset by chunks, each in its own
+    transaction, and yields the number of objects of each chunk.
+    When can_raw_delete is True, each chunk is deleted with a single DELETE
+    without signals, the visibility and the caches being refreshed once per
+    chunk instead, the objects depending on those of the chunk being deleted
+    before (see cascade). Otherwise the chunks are deleted by Django with
+    their signals, the visibility being refreshed once per chunk
+    """
+    model = queryset.model
+    raw = can_raw_delete(model)
+    client_field = "pk" if model is Client else "client_id"
+    while True:
+        with transaction.atomic():
+            rows = list(
+                queryset.order_by("pk").values_list("pk", client_field)[:chunk_size]
+            )
+            if not rows:
+                return
+            pks = [pk for pk, _ in rows]
+            chunk = model.objects.filter(pk__in=pks)
+            if raw:
+                chunk._raw_delete(chunk.db)
+                visibility.clients_changed({client_id for _, client_id in rows})
+            else:
+                with visibility.deferred_refresh():
+                    chunk.delete()
+        if raw:
+            object_cache.invalidate(model, pks)
+        yield len(pks)
+
+
+def delete_contact(contact, chunk_size=None, progress=None):
+    """
+    Deletes the objects of the cascade of a contact by chunks, then the contact,
+    calling progress(deleted, total) after each chunk,
+    returns the number of deleted objects
+    """
+    chunk_size = chunk_size or settings.CRM_API_DELETION_CHUNK_SIZE
+    total = cascade_size(contact)
+    deleted = 0
+    for queryset in cascade(contact):
+        for count in delete_chunks(queryset, chunk_size):
+            deleted += count
+            if progress:
+                progress(deleted, total)
+    contact.delete()
+    return deleted
+
+
+def get_deletion_job(model, pk):
+    """
+    Returns the state of the deletion job of a contact, or None,
+    a running job without progress for CRM_API_DELETION_JOB_STALE_TIMEOUT
+    seconds being reported as interrupted (process stopped or recycled)
+    """
+    state = cache.get(deletion_job_key(model, pk))
+    if state is None:
+        return None
+    state = dict(state)
+    heartbeat = state.pop("heartbeat", 0)
+    if (
+        state["status"] == "running"
+        and time.time() - heartbeat > settings.CRM_API_DELETION_JOB_STALE_TIMEOUT
+    ):
+        # à reprendre avec la commande deletecontact
+        state["status"] = "interrupted"
+    return state
+
+
+def set_deletion_job(key, state):
+    """
+    Stores the state of a deletion job with the time of its last progress,
+    returns the state
+    """
+    cache.set(
+        key, dict(state, heartbeat=time.time()), settings.CRM_API_DELETION_JOB_TIMEOUT
+    )
+    return state
+
+
+def claim_deletion_job(contact):
+    """
+    Returns True if the deletion job of a contact is claimed by the caller,
+    False if it is already claimed. The claim is released at the end
+    of the job, or expires after CRM_API_DELETION_JOB_STALE_TIMEOUT seconds
+    without progress
+    """
+    return cache.add(
+        deletion_claim_key(contact.__class__, contact.pk),
+        True,
+        settings.CRM_API_DELETION_JOB_STALE_TIMEOUT,
+    )
+
+
+def run_deletion_job(contact, chunk_size=None):
+    """
+    Deletes a contact keeping the state of its deletion job in the cache
+    """
+    key = deletion_job_key(contact.__class__, contact.pk)
+    claim_key = deletion_claim_key(contact.__class__, contact.pk)
+
+    def progress(deleted, total):
+        set_deletion_job(key, {"status": "running", "deleted": deleted, "total": total})
+        cache.touch(claim_key, settings.CRM_API_DELETION_JOB_STALE_TIMEOUT)
+
+    try:
+        deleted = delete_contact(contact, chunk_size, progress)
+    except Exception:
+        logger.exception(msg=f"deletion of {contact} has failed")
+        state = dict(
+            get_deletion_job(contact.__class__, contact.pk) or dict(), status="failed"
+        )
+    else:
+        state = {"status": "done", "deleted": deleted, "total": deleted}
+    state = set_deletion_job(key, state)
+    cache.delete(claim_key)
+    return state
+
+
+def _run_in_thread(contact, chunk_size):
+    """
+    Target of the thread of a deletion job
+    """
+    try:
+        run_deletion_job(contact, chunk_size)
+    finally:
+        # le thread a sa propre connexion à la base de données
+        connection.close()
+
+
+def start_deletion_job(contact, chunk_size=None):
+    """
+    Deletes a contact in a background thread of the process, the state of
+    the job being kept in the cache, returns its initial state, or the state
+    of the job already running for the contact (see claim_deletion_job).
+    The job does not survive the process: an interrupted job is resumed
+    with the command deletecontact
+    """
+    state = {"status": "running", "deleted": 0, "total": cascade_size(contact)}
+    if not claim_deletion_job(contact):
+        return get_deletion_job(contact.__class__, contact.pk) or state
+    state = set_deletion_job(deletion_job_key(contact.__class__, contact.pk), state)
+    threading.Thread(
+        target=_run_in_thread, args=(contact, chunk_size), daemon=True
+    ).start()
+    return state
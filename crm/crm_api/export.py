@@ -0,0 +1,155 @@
+"""
+Module streaming the export of querysets as NDJSON, CSV or MessagePack
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from crm_api.renderers import (
+    CSVRenderer,
+    MessagePackRenderer,
+    NDJSONRenderer,
+    native_fields,
+)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "msgpack": MessagePackRenderer.media_type,
+}
+
+# renderers des actions export : ndjson et csv négociés aussi par Accept
+EXPORT_RENDERER_CLASSES = [
+    *api_settings.DEFAULT_RENDERER_CLASSES,
+    NDJSONRenderer,
+    CSVRenderer,
+]
+
+
+class Echo:
+    """
+    Pseudo buffer returning the lines written by csv.writer
+    """
+
+    def write(self, value):
+        return value
+
+
+def flatten(data, prefix=""):
+    """
+    Returns the serialized data with the nested dicts flattened
+    into columns named "field.subfield"
+    """
+    row = dict()
+    for key, value in data.items():
+        if isinstance(value, dict):
+            row.update(flatten(value, f"{prefix}{key}."))
+        else:
+            row[f"{prefix}{key}"] = value
+    return row
+
+
+def field_names(fields, prefix=""):
+    """
+    Returns the names of the columns of the fields of a serializer,
+    those of the nested serializers being flattened as by flatten
+    """
+    names = []
+    for name, field in fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.Serializer):
+            names.extend(field_names(field.fields, f"{prefix}{name}."))
+        else:
+            names.append(f"{prefix}{name}")
+    return names
+
+
+def serialized_rows(queryset, serializer_class, chunk_size, native=False):
+    """
+    Yields the serialized objects of the queryset, with native datetimes
+    and decimals if native is True, fetched by chunks
+    with a server-side cursor when available
+    """
+    serializer = serializer_class()
+    if native:
+        native_fields(serializer.fields)
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        yield serializer.to_representation(instance)
+
+
+def ndjson_lines(rows):
+    """
+    Yields one JSON document per row
+    """
+    for data in rows:
+        yield json.dumps(data, cls=JSONEncoder) + "\n"
+
+
+def msgpack_chunks(rows):
+    """
+    Yields one MessagePack object per row
+    """
+    renderer = MessagePackRenderer()
+    for data in rows:
+        yield renderer.render(data)
+
+
+def csv_lines(rows, fieldnames):
+    """
+    Yields the header, even without rows, then one CSV line per row
+    """
+    # objet imbriqué à None : colonnes vides
+    writer = csv.DictWriter(Echo(), fieldnames=fieldnames, extrasaction="ignore")
+    yield writer.writeheader()
+    for data in rows:
+        yield writer.writerow(flatten(data))
+
+
+def requested_format(request):
+    """
+    Returns the export format of ?export_format=, or msgpack if the request
+    accepts MessagePack, or ndjson
+    """
+    default = "ndjson"
+    renderer = getattr(request, "accepted_renderer", None)
+    if getattr(renderer, "format", None) in EXPORT_FORMATS:
+        default = renderer.format
+    return request.query_params.get("export_format", default)
+
+
+def export_response(queryset, serializer_class, export_format, filename):
+    """
+    Returns a StreamingHttpResponse exporting the queryset
+    in the format ndjson, csv or msgpack
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValidationError(
+            detail=f"export_format must be one of {', '.join(EXPORT_FORMATS)}",
+            code="invalid",
+        )
+    rows = serialized_rows(
+        queryset,
+        serializer_class,
+        settings.CRM_API_EXPORT_CHUNK_SIZE,
+        native=export_format == "msgpack",
+    )
+    if export_format == "csv":
+        lines = csv_lines(rows, field_names(serializer_class().fields))
+    elif export_format == "msgpack":
+        lines = msgpack_chunks(rows)
+    else:
+        lines = ndjson_lines(rows)
+    response = StreamingHttpResponse(
+        lines, content_type=EXPORT_FORMATS[export_format]
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{filename}.{export_format}"'
+    )
+    return response
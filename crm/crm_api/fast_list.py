@@ -0,0 +1,190 @@
+"""
+Module with the read-only serialization of the lists from .values() rows,
+following a field plan compiled once per serializer and fieldset
+"""
+import threading
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.encoding import force_str
+from rest_framework import fields as drf_fields
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+# champs dont la représentation est la valeur lue dans la base de données
+PLAIN_FIELDS = (
+    drf_fields.BooleanField,
+    drf_fields.CharField,
+    drf_fields.IntegerField,
+    drf_fields.ReadOnlyField,
+)
+DISPLAY_PREFIX = "get_"
+DISPLAY_SUFFIX = "_display"
+
+
+class FieldPlan:
+    """
+    Plan building the representations of a serializer from the rows
+    of .values(*plan.columns), without instantiating the models
+    nor going through the fields which only copy the values
+    """
+
+    _lock = threading.Lock()
+    _plans = dict()
+
+    def __init__(self, entries, pk_column):
+        """
+        Init a FieldPlan with its entries (name, column, convert, nested plan)
+        and the column of the primary key
+        """
+        self.entries = entries
+        self.pk_column = pk_column
+
+    @property
+    def columns(self):
+        """
+        Returns the columns to read, those of the nested plans included
+        """
+        columns = [self.pk_column]
+        for _, column, _, nested in self.entries:
+            columns.append(column)
+            if nested is not None:
+                columns.extend(nested.columns)
+        return list(dict.fromkeys(columns))
+
+    @classmethod
+    def of(cls, serializer):
+        """
+        Returns the plan of a serializer and of its current fields
+        (native or not, see crm_api.renderers), compiled on first use,
+        or None if a field is not supported
+        """
+        key = (
+            serializer.__class__,
+            tuple(field.field_name for field in serializer._readable_fields),
+            getattr(serializer, "native_types", False),
+        )
+        if key not in cls._plans:
+            plan = cls.compile(serializer)
+            with cls._lock:
+                cls._plans[key] = plan
+        return cls._plans[key]
+
+    @classmethod
+    def compile(cls, serializer, prefix=""):
+        """
+        Returns the plan of a ModelSerializer, or None
+        """
+        if not isinstance(serializer, serializers.ModelSerializer):
+            return None
+        model = serializer.Meta.model
+        entries = []
+        for field in serializer._readable_fields:
+            entry = cls.compile_field(model, field, prefix)
+            if entry is None:
+                return None
+            entries.append(entry)
+        return cls(entries, prefix + model._meta.pk.attname)
+
+    @classmethod
+    def compile_field(cls, model, field, prefix):
+        """
+        Returns the entry (name, column, convert, nested plan) of a field
+        reading a concrete field of the model, or None
+        """
+        source = field.source
+        display = source.startswith(DISPLAY_PREFIX) and source.endswith(DISPLAY_SUFFIX)
+        if display:
+            source = source[len(DISPLAY_PREFIX):-len(DISPLAY_SUFFIX)]
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        if isinstance(field, serializers.BaseSerializer):
+            if not model_field.is_relation:
+                return None
+            nested = cls.compile(field, f"{prefix}{model_field.name}__")
+            if nested is None:
+                return None
+            return field.field_name, prefix + model_field.attname, None, nested
+        if model_field.is_relation and not (
+            source == model_field.attname
+            or isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None
+        ):
+            return None
+        column = prefix + model_field.attname
+        if display:
+            choices = dict(model_field.flatchoices)
+
+            def convert(value, field=field, choices=choices):
+                # même valeur que Model.get_FOO_display()
+                return field.to_representation(
+                    force_str(choices.get(value, value), strings_only=True)
+                )
+
+            return field.field_name, column, convert, None
+        if isinstance(field, PLAIN_FIELDS) or isinstance(field, PrimaryKeyRelatedField):
+            return field.field_name, column, None, None
+        return field.field_name, column, field.to_representation, None
+
+    def row(self, values):
+        """
+        Returns the representation of a row of .values()
+        """
+        ret = dict()
+        for name, column, convert, nested in self.entries:
+            value = values[column]
+            if value is None:
+                ret[name] = None
+            elif nested is not None:
+                ret[name] = nested.row(values)
+            elif convert is None:
+                ret[name] = value
+            else:
+                ret[name] = convert(value)
+        return ret
+
+    def rows(self, values_list):
+        """
+        Returns the representations of the rows of .values()
+        """
+        return [self.row(values) for values in values_list]
+
+
+class FastListMixin:
+    """
+    Viewset mixin serving list from .values() rows and a FieldPlan when the
+    fast_list attribute of the viewset and CRM_API_FAST_LIST are True,
+    with the same representations as the serializer.
+    The lists whose serializer has a field not supported by FieldPlan
+    keep the serializer
+    """
+
+    fast_list = False
+
+    def get_list_plan(self):
+        """
+        Returns the FieldPlan of the serializer of the list, or None
+        """
+        if not (self.fast_list and settings.CRM_API_FAST_LIST):
+            return None
+        return FieldPlan.of(self.get_serializer(many=True).child)
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_list_plan()
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        columns = plan.columns
+        # colonnes nécessaires aux curseurs de la pagination
+        columns += [
+            name for name in getattr(self, "cursor_ordering_fields", ())
+            if name not in columns
+        ]
+        queryset = self.filter_queryset(self.get_queryset()).values(*columns)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.rows(page))
+        return Response(plan.rows(queryset))
@@ -1,20 +1,53 @@
 """
 Module with customized filter_backends
 """
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.db.models import Q
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.filters import BaseFilterBackend
 
+from crm_api import visibility
 from crm_api.models import (
     Client,
     Contract,
     Event,
     SalesContact,
-    StaffContact,
     SupportContact,
 )
 
 
+PROFILE_CACHE_KEY = "crm_api:profile:{}"
+
+
+def profile_cache_key(user_id):
+    """
+    Returns the cache key of the contact ids of a user
+    """
+    return PROFILE_CACHE_KEY.format(user_id)
+
+
+def get_contact_ids(user):
+    """
+    Returns the tuple (staff_contact_id, sales_contact_id, support_contact_id)
+    of a user, read from the cache or resolved with a single query
+    """
+    if user is None or user.pk is None:
+        return (None, None, None)
+    if getattr(user, "contact_ids", None) is not None:
+        # utilisateur construit à partir des claims d'un token
+        return tuple(user.contact_ids)
+    key = profile_cache_key(user.pk)
+    contact_ids = cache.get(key)
+    if contact_ids is None:
+        contact_ids = User.objects.filter(pk=user.pk).values_list(
+            "staffcontact__id", "salescontact__id", "supportcontact__id"
+        ).first() or (None, None, None)
+        cache.set(key, tuple(contact_ids), settings.CRM_API_PROFILE_CACHE_TIMEOUT)
+    return tuple(contact_ids)
+
+
 class Profile:
     """
     Class that defines the profile of a user
@@ -24,22 +57,44 @@ class Profile:
         """
         Init Profile from request user attribute
         """
-        self._user = getattr(request, "user", None)
-        try:
-            self._staff_contact = StaffContact.objects.get(user=self._user)
-        except StaffContact.DoesNotExist:
-            self._staff_contact = None
-        self._is_staff = bool(self._user.is_superuser or self._staff_contact)
-        try:
-            self._sales_contact = SalesContact.objects.get(user=self._user)
-        except SalesContact.DoesNotExist:
-            self._sales_contact = None
-        self._is_sales = bool(self._sales_contact)
-        try:
-            self._support_contact = SupportContact.objects.get(user=self._user)
-        except SupportContact.DoesNotExist:
-            self._support_contact = None
-        self._is_support = bool(self._support_contact)
+        self._resolve(getattr(request, "user", None))
+
+    def _resolve(self, user):
+        """
+        Resolves the contacts and the role of a user
+        """
+        self._user = user
+        (
+            self._staff_contact_id,
+            self._sales_contact_id,
+            self._support_contact_id,
+        ) = get_contact_ids(self._user)
+        self._is_staff = bool(
+            getattr(self._user, "is_superuser", False) or self._staff_contact_id
+        )
+        self._is_sales = bool(self._sales_contact_id)
+        self._is_support = bool(self._support_contact_id)
+
+    @classmethod
+    def from_user(cls, user):
+        """
+        Returns the Profile of a user outside of a request
+        """
+        profile = cls.__new__(cls)
+        profile._resolve(user)
+        return profile
+
+    @classmethod
+    def from_request(cls, request):
+        """
+        Returns the Profile attached to the request,
+        resolving it only once per request and per user
+        """
+        profile = getattr(request, "_crm_profile", None)
+        if profile is None or profile.user is not getattr(request, "user", None):
+            profile = cls(request)
+            request._crm_profile = profile
+        return profile
 
     @property
     def user(self):
@@ -53,14 +108,39 @@ class Profile:
         """
         Returns SalesContact instance
         """
-        return self._sales_contact
+        if self._sales_contact_id is None:
+            return None
+        return SalesContact(pk=self._sales_contact_id, user_id=self._user.pk)
 
     @property
     def support_contact(self):
         """
         Returns SupportContact instance
         """
-        return self._support_contact
+        if self._support_contact_id is None:
+            return None
+        return SupportContact(pk=self._support_contact_id, user_id=self._user.pk)
+
+    @property
+    def sales_contact_id(self):
+        """
+        Returns the id of the SalesContact instance
+        """
+        return self._sales_contact_id
+
+    @property
+    def support_contact_id(self):
+        """
+        Returns the id of the SupportContact instance
+        """
+        return self._support_contact_id
+
+    @property
+    def staff_contact_id(self):
+        """
+        Returns the id of the StaffContact instance
+        """
+        return self._staff_contact_id
 
     @property
     def is_sales(self):
@@ -90,6 +170,33 @@ class Profile:
         """
         return not (self._is_sales or self._is_staff or self.is_support)
 
+    @property
+    def role(self):
+        """
+        Returns the name of the role of the user (STAFF, SALES or SUPPORT)
+        or None for an anonymous profile
+        """
+        if self._is_staff:
+            return "STAFF"
+        elif self._is_sales:
+            return "SALES"
+        elif self._is_support:
+            return "SUPPORT"
+        return None
+
+
+def filter_visible(queryset, the_profile, object_type):
+    """
+    Filters the queryset with the Visibility rows of the profile
+    """
+    if the_profile.is_sales:
+        contact_id = the_profile.sales_contact_id
+    else:
+        contact_id = the_profile.support_contact_id
+    return queryset.filter(
+        id__in=visibility.visible_ids(the_profile.role, contact_id, object_type)
+    ).order_by("id")
+
 
 class ClientFilter(BaseFilterBackend):
     """
@@ -100,28 +207,27 @@ class ClientFilter(BaseFilterBackend):
         """
         Overides filter_queryset method according to the app specifications
         """
-        the_profile = Profile(request)
+        the_profile = Profile.from_request(request)
         if the_profile.is_anonymous:
             raise PermissionDenied
         elif the_profile.is_staff:
             # liste de tous les clients
             return queryset.order_by("id")
+        elif settings.CRM_API_VISIBILITY_INDEX:
+            return filter_visible(queryset, the_profile, visibility.CLIENT)
         elif the_profile.is_sales:
             # liste des clients rattachés à sales_contact
-            sales_contact = the_profile.sales_contact
-            return queryset.filter(sales_contact=sales_contact).order_by(
-                "id"
-            )
+            return queryset.filter(
+                sales_contact_id=the_profile.sales_contact_id
+            ).order_by("id")
         elif the_profile.is_support:
             # liste des clients rattachés aux événements
             # attribués à support_contact
-            list_client_id = [
-                q["client_id"]
-                for q in Event.objects.filter(
-                    support_contact=the_profile.support_contact
+            return queryset.filter(
+                id__in=Event.objects.filter(
+                    support_contact_id=the_profile.support_contact_id
                 ).values("client_id")
-            ]
-            return queryset.filter(Q(id__in=list_client_id)).order_by("id")
+            ).order_by("id")
         else:
             # queryset vide
             return Client.objects.none()
@@ -136,22 +242,22 @@ class ContractFilter(BaseFilterBackend):
         """
         Overides filter_queryset method according to the app specifications
         """
-        the_profile = Profile(request)
+        the_profile = Profile.from_request(request)
         if the_profile.is_staff:
             # liste de tous les contrats
             return queryset.order_by("id")
+        elif the_profile.is_sales and settings.CRM_API_VISIBILITY_INDEX:
+            return filter_visible(queryset, the_profile, visibility.CONTRACT)
         elif the_profile.is_sales:
             # liste des contrats suivis par sales_contact
             # ou rattachés aux clients suivis par sales_contacts
-            list_client_id = [
-                q["id"]
-                for q in Client.objects.filter(
-                    sales_contact=the_profile.sales_contact
-                ).values("id")
-            ]
             return queryset.filter(
-                Q(sales_contact=the_profile.sales_contact)
-                | Q(client_id__in=list_client_id)
+                Q(sales_contact_id=the_profile.sales_contact_id)
+                | Q(
+                    client_id__in=Client.objects.filter(
+                        sales_contact_id=the_profile.sales_contact_id
+                    ).values("id")
+                )
             ).order_by("id")
         else:
             # les autres profils n'ont pas accès aux contrats
@@ -167,32 +273,32 @@ class EventFilter(BaseFilterBackend):
         """
         Overides filter_queryset method according to the app specifications
         """
-        the_profile = Profile(request)
+        the_profile = Profile.from_request(request)
         if the_profile.is_anonymous:
             raise PermissionDenied
         elif the_profile.is_staff:
             # liste de tous les événements
             return queryset.order_by("id")
+        elif settings.CRM_API_VISIBILITY_INDEX:
+            return filter_visible(queryset, the_profile, visibility.EVENT)
         elif the_profile.is_sales:
             # liste des événements des clients
             # ou des contrats suivis par sales_contacts
-            list_client_id = [
-                q["client_id"]
-                for q in Contract.objects.filter(
-                    sales_contact=the_profile.sales_contact
-                ).values("client_id")
-            ]
             return queryset.filter(
                 Q(
-                    client__in=Client.objects.filter(
-                        sales_contact=the_profile.sales_contact
-                    )
+                    client_id__in=Client.objects.filter(
+                        sales_contact_id=the_profile.sales_contact_id
+                    ).values("id")
+                )
+                | Q(
+                    client_id__in=Contract.objects.filter(
+                        sales_contact_id=the_profile.sales_contact_id
+                    ).values("client_id")
                 )
-                | Q(client_id__in=list_client_id)
             ).order_by("id")
         elif the_profile.is_support:
             return queryset.filter(
-                support_contact=the_profile.support_contact
+                support_contact_id=the_profile.support_contact_id
             ).order_by("id")
         else:
             return Event.objects.none()
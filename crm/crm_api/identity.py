@@ -0,0 +1,116 @@
+"""
+Module with the request-scoped identity map of the model instances
+"""
+from django.shortcuts import get_object_or_404
+
+
+class IdentityMap:
+    """
+    Map of the model instances loaded during a request, so that each instance
+    is loaded at most once and shared by the view, the permission classes
+    and the serializers
+    """
+
+    def __init__(self):
+        """
+        Init an empty IdentityMap
+        """
+        self._instances = dict()
+        self._visible = set()
+        self._versions = dict()
+
+    @classmethod
+    def of(cls, request):
+        """
+        Returns the IdentityMap of a request, created on first use
+        """
+        identity_map = getattr(request, "_identity_map", None)
+        if identity_map is None:
+            identity_map = cls()
+            request._identity_map = identity_map
+        return identity_map
+
+    @staticmethod
+    def key(model, pk):
+        """
+        Returns the key of an instance, the pk coming from the url or the data
+        """
+        return model._meta.concrete_model, str(pk)
+
+    def add(self, instance, visible=False):
+        """
+        Adds an instance, visible being True if it has been loaded
+        through the filter backends of a view
+        """
+        key = self.key(instance.__class__, instance.pk)
+        self._instances[key] = instance
+        if visible:
+            self._visible.add(key)
+        return instance
+
+    def get(self, model, pk, visible=False):
+        """
+        Returns the instance if it has been loaded (through the filter backends
+        of a view if visible is True), or None
+        """
+        key = self.key(model, pk)
+        if visible and key not in self._visible:
+            return None
+        return self._instances.get(key)
+
+    def version(self, model, pk, get_queryset):
+        """
+        Returns the date_updated of an object visible through the filter
+        backends of a view, from its instance if it has been loaded that way,
+        or read alone on first use from get_queryset(), the queryset filtered
+        by the filter backends, or None if it is not visible
+        """
+        instance = self.get(model, pk, visible=True)
+        if instance is not None:
+            return instance.date_updated
+        key = self.key(model, pk)
+        if key not in self._versions:
+            self._versions[key] = (
+                get_queryset().filter(pk=pk).values_list("date_updated", flat=True)
+                .first()
+            )
+        return self._versions[key]
+
+    def fetch(self, model, pk):
+        """
+        Returns the instance, loading it on first use (404 if not found)
+        """
+        instance = self.get(model, pk)
+        if instance is None:
+            instance = self.add(get_object_or_404(model, pk=pk))
+        return instance
+
+
+def fetch(request, model, pk):
+    """
+    Returns an instance from the IdentityMap of the request if any,
+    from the database otherwise (404 if not found)
+    """
+    if request is None:
+        return get_object_or_404(model, pk=pk)
+    return IdentityMap.of(request).fetch(model, pk)
+
+
+class IdentityMapMixin:
+    """
+    Viewset mixin resolving get_object once per request
+    """
+
+    def get_object(self):
+        """
+        Returns the object of the request from the IdentityMap, after having
+        loaded it through the filter backends on first use
+        """
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        model = self.get_queryset().model
+        identity_map = IdentityMap.of(self.request)
+        instance = identity_map.get(model, self.kwargs[lookup_url_kwarg], visible=True)
+        if instance is None:
+            return identity_map.add(super().get_object(), visible=True)
+        self.check_object_permissions(self.request, instance)
+        return instance
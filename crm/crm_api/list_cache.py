@@ -0,0 +1,138 @@
+"""
+Module with the cache of the list responses of the clients, contracts
+and events per role, contact and query parameters
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+from crm_api import filters
+from crm_api.models import Visibility
+
+LIST_KEY = "crm_api:list:{}:{}:{}:{}:{}"
+GENERATION_KEY = "crm_api:list:generation:{}:{}"
+ALL_GENERATION_KEY = "crm_api:list:generation"
+STAFF = "STAFF"
+
+
+def generation_keys(the_profile):
+    """
+    Returns the keys of the generations of the lists of a profile:
+    the generation of all the lists and that of its role and contact
+    """
+    return [
+        ALL_GENERATION_KEY,
+        GENERATION_KEY.format(
+            the_profile.role,
+            the_profile.sales_contact_id or the_profile.support_contact_id,
+        ),
+    ]
+
+
+def generation(the_profile):
+    """
+    Returns the current generation of the lists of a profile
+    """
+    keys = generation_keys(the_profile)
+    generations = cache.get_many(keys)
+    return ".".join(str(generations.get(key, 0)) for key in keys)
+
+
+def _bump(key):
+    """
+    Increments a generation kept in the cache without expiration
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def _bump_all(keys):
+    """
+    Increments generations now and once again after the commit,
+    so that a list cached from a not yet committed state is not kept
+    """
+    for key in keys:
+        _bump(key)
+    transaction.on_commit(lambda: [_bump(key) for key in keys])
+
+
+def invalidate_contacts(contacts):
+    """
+    Invalidates the lists of the (role, contact_id) pairs and of the staff
+    contacts, which see all the clients, contracts and events
+    """
+    keys = {GENERATION_KEY.format(role, contact_id) for role, contact_id in contacts}
+    keys.add(GENERATION_KEY.format(STAFF, None))
+    _bump_all(sorted(keys))
+
+
+def invalidate_clients(client_ids):
+    """
+    Invalidates the lists of the contacts which see the clients,
+    their contracts or their events according to the Visibility table,
+    or all the lists when CRM_API_VISIBILITY_INDEX is False
+    """
+    client_ids = set(client_ids)
+    if not client_ids:
+        return
+    if not settings.CRM_API_VISIBILITY_INDEX:
+        invalidate_all()
+        return
+    invalidate_contacts(
+        Visibility.objects.filter(client_id__in=client_ids)
+        .values_list("role", "contact_id")
+        .distinct()
+    )
+
+
+def invalidate_all():
+    """
+    Invalidates all the lists, e.g. after a change of a lookup table
+    """
+    _bump_all([ALL_GENERATION_KEY])
+
+
+def list_key(request, view, the_profile):
+    """
+    Returns the current key of a list response, made of the view,
+    the role and contact of the profile, its generation and a digest
+    of the absolute url (pagination links) and of the rendering format
+    """
+    digest = hashlib.md5(
+        f"{request.build_absolute_uri()}:{request.accepted_renderer.format}".encode()
+    ).hexdigest()
+    return LIST_KEY.format(
+        getattr(view, "basename", view.__class__.__name__),
+        the_profile.role,
+        the_profile.sales_contact_id or the_profile.support_contact_id,
+        generation(the_profile),
+        digest,
+    )
+
+
+class ListCacheMixin:
+    """
+    Viewset mixin serving list from the cache when CRM_API_LIST_CACHE is True.
+    The key is computed before the list is built, so that a write during
+    the building makes the stored response unreachable
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not settings.CRM_API_LIST_CACHE:
+            return super().list(request, *args, **kwargs)
+        the_profile = filters.Profile.from_request(request)
+        if the_profile.is_anonymous:
+            return super().list(request, *args, **kwargs)
+        key = list_key(request, self, the_profile)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, settings.CRM_API_LIST_CACHE_TIMEOUT)
+        return response
@@ -0,0 +1,114 @@
+"""
+Module with the process-wide registry of the lookup tables
+"""
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import Group
+
+
+class LookupRegistry:
+    """
+    Process-wide registry of the rows of the tiny and nearly immutable tables
+    EventStatus and Group, loaded once and invalidated by signal.
+    The rows are shared between the requests and must not be modified
+    """
+
+    _lock = threading.Lock()
+    _tables = None
+    _loaded_at = 0.0
+    _generation = 0
+
+    @classmethod
+    def load(cls):
+        """
+        Returns a dict mapping each table to its rows by code or name
+        """
+        event_status_model = apps.get_model("crm_api", "EventStatus")
+        return {
+            "event_status": {
+                item.status: item for item in event_status_model.objects.all()
+            },
+            "group": {group.name: group for group in Group.objects.all()},
+        }
+
+    @classmethod
+    def get(cls):
+        """
+        Returns the tables, loading them on first use or once expired
+        """
+        tables = cls._tables
+        timeout = settings.CRM_API_LOOKUP_TIMEOUT
+        if tables is None or time.monotonic() - cls._loaded_at > timeout:
+            generation = cls._generation
+            tables = cls.load()
+            with cls._lock:
+                # une invalidation pendant le chargement rend les tables obsolètes
+                if generation == cls._generation:
+                    cls._tables = tables
+                    cls._loaded_at = time.monotonic()
+        return tables
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Invalidates the tables after a change on event statuses or groups
+        """
+        with cls._lock:
+            cls._generation += 1
+            cls._tables = None
+
+    @classmethod
+    def lookup(cls, table, key):
+        """
+        Returns the row of the table, reloading the tables once
+        if it is unknown (e.g. created by another process), or None
+        """
+        row = cls.get()[table].get(key)
+        if row is None:
+            cls.invalidate()
+            row = cls.get()[table].get(key)
+        return row
+
+    @classmethod
+    def event_status(cls, code):
+        """
+        Returns the EventStatus of a code, e.g. EventStatus.Status.CREATED
+        """
+        event_status_model = apps.get_model("crm_api", "EventStatus")
+        the_event_status = cls.lookup("event_status", code)
+        if the_event_status is None:
+            raise event_status_model.DoesNotExist(f"EventStatus {code} does not exist")
+        return the_event_status
+
+    @classmethod
+    def event_status_by_label(cls, label):
+        """
+        Returns the EventStatus of a label, e.g. "IN PROGRESS"
+        """
+        event_status_model = apps.get_model("crm_api", "EventStatus")
+        codes = {str(label): code for code, label in event_status_model.Status.choices}
+        if label not in codes:
+            raise event_status_model.DoesNotExist(f"EventStatus {label} does not exist")
+        return cls.event_status(codes[label])
+
+    @classmethod
+    def event_status_labels(cls):
+        """
+        Returns the labels of the event statuses
+        """
+        event_status_model = apps.get_model("crm_api", "EventStatus")
+        return [str(label) for label in event_status_model.Status.labels]
+
+    @classmethod
+    def group(cls, name):
+        """
+        Returns the Group of a name, e.g. "SALES"
+        """
+        the_group = cls.lookup("group", name)
+        if the_group is None:
+            raise Group.DoesNotExist(f"Group {name} does not exist")
+        return the_group
+
@@ -0,0 +1,142 @@
+"""
+Module benchmarkasgi.py
+"""
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core import management
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+
+from crm_api import async_views
+from crm_api.views import ClientViewSet, ContractViewSet, EventViewSet
+
+VIEWSETS = {
+    "clients": ClientViewSet,
+    "contracts": ContractViewSet,
+    "events": EventViewSet,
+}
+
+
+class Command(management.base.BaseCommand):
+    help = (
+        'Benchmark the throughput and the latencies of the lists of clients, '
+        'contracts and events served by synchronous views in a pool of '
+        'workers (WSGI) and by the asynchronous views of crm_api.async_views '
+        'on an event loop (ASGI), at increasing concurrencies'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--username", required=True,
+            help="user sending the requests",
+        )
+        parser.add_argument(
+            "--endpoint", choices=sorted(VIEWSETS), default="events",
+            help="list to request",
+        )
+        parser.add_argument(
+            "--concurrency", nargs="+", type=int, default=[10, 100, 1000],
+            help="numbers of concurrent requests",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=8,
+            help="number of threads of the WSGI server",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=2000,
+            help="number of requests per run",
+        )
+
+    def run_wsgi(self, view, user, url, concurrency, total):
+        """
+        Returns the latencies of total requests sent concurrency at a time
+        to a synchronous view, processed by a pool of --workers threads
+        as a threaded WSGI server does
+        """
+        factory = RequestFactory()
+
+        def send(submitted):
+            request = factory.get(url)
+            request.user = user
+            async_views.run_read(view, request)
+            # attente d'un worker comprise, comme pour ASGI
+            return time.perf_counter() - submitted
+
+        latencies = []
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for offset in range(0, total, concurrency):
+                batch = [
+                    executor.submit(send, time.perf_counter())
+                    for _ in range(min(concurrency, total - offset))
+                ]
+                latencies.extend(future.result() for future in batch)
+        return latencies
+
+    def run_asgi(self, view, user, url, concurrency, total):
+        """
+        Returns the latencies of total requests sent concurrency at a time
+        to an asynchronous view on an event loop
+        """
+        factory = AsyncRequestFactory()
+
+        async def send():
+            request = factory.get(url)
+            request.user = user
+            start = time.perf_counter()
+            await view(request)
+            return time.perf_counter() - start
+
+        async def run():
+            latencies = []
+            for offset in range(0, total, concurrency):
+                latencies.extend(await asyncio.gather(
+                    *[send() for _ in range(min(concurrency, total - offset))]
+                ))
+            return latencies
+
+        return async_to_sync(run)()
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise management.base.CommandError(
+                f"User {options['username']} does not exist"
+            )
+        self.workers = options["workers"]
+        viewset_class = VIEWSETS[options["endpoint"]]
+        url = f"/{options['endpoint']}/"
+        with override_settings(
+            CRM_API_ASYNC_READ=False, CRM_API_ASYNC_READ_THREADS=self.workers
+        ):
+            wsgi_view = viewset_class.as_view({"get": "list"})
+        with override_settings(
+            CRM_API_ASYNC_READ=True, CRM_API_ASYNC_READ_THREADS=self.workers
+        ):
+            asgi_view = viewset_class.as_view({"get": "list"})
+            benchmarks = (
+                ("WSGI", self.run_wsgi, wsgi_view),
+                ("ASGI", self.run_asgi, asgi_view),
+            )
+            self.stdout.write(
+                f"{'concurrency':>11} | {'server':<6} | {'req/s':>8}"
+                f" | {'p50 (ms)':>8} | {'p99 (ms)':>8}"
+            )
+            for concurrency in options["concurrency"]:
+                for name, run, view in benchmarks:
+                    start = time.perf_counter()
+                    latencies = run(
+                        view, user, url, concurrency, options["requests"]
+                    )
+                    elapsed = time.perf_counter() - start
+                    percentiles = statistics.quantiles(latencies, n=100)
+                    self.stdout.write(
+                        f"{concurrency:>11} | {name:<6}"
+                        f" | {len(latencies) / elapsed:>8.1f}"
+                        f" | {percentiles[49] * 1000:>8.2f}"
+                        f" | {percentiles[98] * 1000:>8.2f}"
+                    )
@@ -0,0 +1,201 @@
+"""
+Module benchmarkfilters.py
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core import management
+from django.db import transaction
+from django.db.models import Q
+from django.test.client import RequestFactory
+from django.utils import timezone
+
+from crm_api import visibility
+from crm_api.filters import (
+    ClientFilter,
+    ContractFilter,
+    EventFilter,
+    Profile,
+    filter_visible,
+)
+from crm_api.models import (
+    Client,
+    Contract,
+    Event,
+    EventStatus,
+    SalesContact,
+    SupportContact,
+)
+
+
+class Rollback(Exception):
+    """
+    Exception raised to roll back the data created by the benchmark
+    """
+
+
+class Command(management.base.BaseCommand):
+    help = (
+        'Benchmark the filter backends against the number of clients '
+        'per contact (the data are created in a transaction rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--clients", nargs="+", type=int, default=[100, 1000, 10000],
+            help="numbers of clients per contact to benchmark",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5,
+            help="number of runs of each query",
+        )
+
+    def create_data(self, size, index):
+        """
+        Creates a sales contact and a support contact following
+        size clients with one contract and one event each
+        """
+        sales_contact = SalesContact.objects.create(
+            user=User(username=f"benchmark_sales_{index}")
+        )
+        support_contact = SupportContact.objects.create(
+            user=User(username=f"benchmark_support_{index}")
+        )
+        event_status, _ = EventStatus.objects.get_or_create(
+            status=EventStatus.Status.CREATED
+        )
+        Client.objects.bulk_create(
+            Client(
+                first_name="Benchmark",
+                last_name=f"Client {i}",
+                email=f"benchmark.{index}.{i}@example.com",
+                sales_contact=sales_contact,
+            )
+            for i in range(size)
+        )
+        clients = list(Client.objects.filter(sales_contact=sales_contact))
+        Contract.objects.bulk_create(
+            Contract(
+                sales_contact=sales_contact,
+                client=client,
+                status=False,
+                amount=0,
+                payment_due=timezone.now(),
+            )
+            for client in clients
+        )
+        Event.objects.bulk_create(
+            Event(
+                client=client,
+                support_contact=support_contact,
+                event_status=event_status,
+                attendees=0,
+                event_date=timezone.now(),
+            )
+            for client in clients
+        )
+        # bulk_create n'envoie pas de signaux
+        visibility.refresh_clients(client.pk for client in clients)
+        return sales_contact, support_contact
+
+    def timeit(self, repeat, get_queryset):
+        """
+        Returns the best time in milliseconds to fetch the ids of the queryset
+        """
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            len(get_queryset().values_list("id", flat=True))
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def filtered(self, filter_backend, queryset, user):
+        """
+        Returns a function applying the filter backend for the user
+        """
+        def get_queryset():
+            request = RequestFactory().get("/")
+            request.user = user
+            return filter_backend().filter_queryset(request, queryset)
+        return get_queryset
+
+    def indexed(self, object_type, queryset, user):
+        """
+        Returns a function filtering with the Visibility table for the user
+        """
+        def get_queryset():
+            return filter_visible(queryset, Profile.from_user(user), object_type)
+        return get_queryset
+
+    def materialized(self, sales_contact, support_contact):
+        """
+        Returns the functions filtering with lists of ids materialized
+        in Python, as the filter backends did before
+        """
+        def clients():
+            list_client_id = list(
+                Event.objects.filter(support_contact=support_contact)
+                .values_list("client_id", flat=True)
+            )
+            return Client.objects.filter(id__in=list_client_id).order_by("id")
+
+        def contracts():
+            list_client_id = list(
+                Client.objects.filter(sales_contact=sales_contact)
+                .values_list("id", flat=True)
+            )
+            return Contract.objects.filter(
+                Q(sales_contact=sales_contact) | Q(client_id__in=list_client_id)
+            ).order_by("id")
+
+        def events():
+            list_client_id = list(
+                Contract.objects.filter(sales_contact=sales_contact)
+                .values_list("client_id", flat=True)
+            )
+            return Event.objects.filter(
+                Q(client__in=Client.objects.filter(sales_contact=sales_contact))
+                | Q(client_id__in=list_client_id)
+            ).order_by("id")
+
+        return clients, contracts, events
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'clients':>8} | {'filter':<14} | {'subquery (ms)':>13}"
+            f" | {'id list (ms)':>12} | {'index (ms)':>10}"
+        )
+        try:
+            with transaction.atomic():
+                for index, size in enumerate(options["clients"]):
+                    sales_contact, support_contact = self.create_data(size, index)
+                    clients, contracts, events = self.materialized(
+                        sales_contact, support_contact
+                    )
+                    benchmarks = (
+                        ("ClientFilter", ClientFilter, Client,
+                         support_contact.user, clients, visibility.CLIENT),
+                        ("ContractFilter", ContractFilter, Contract,
+                         sales_contact.user, contracts, visibility.CONTRACT),
+                        ("EventFilter", EventFilter, Event,
+                         sales_contact.user, events, visibility.EVENT),
+                    )
+                    for (name, filter_backend, model, user,
+                         materialized, object_type) in benchmarks:
+                        subquery_time = self.timeit(
+                            options["repeat"],
+                            self.filtered(filter_backend, model.objects.all(), user),
+                        )
+                        materialized_time = self.timeit(options["repeat"], materialized)
+                        indexed_time = self.timeit(
+                            options["repeat"],
+                            self.indexed(object_type, model.objects.all(), user),
+                        )
+                        self.stdout.write(
+                            f"{size:>8} | {name:<14} | {subquery_time:>13.2f}"
+                            f" | {materialized_time:>12.2f} | {indexed_time:>10.2f}"
+                        )
+                raise Rollback
+        except Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS('Benchmark data have been rolled back'))
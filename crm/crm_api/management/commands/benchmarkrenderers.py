@@ -0,0 +1,109 @@
+"""
+Module benchmarkrenderers.py
+"""
+import io
+import time
+from collections import OrderedDict
+
+from django.core import management
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from crm_api.parsers import FastJSONParser, MessagePackParser
+from crm_api.renderers import FastJSONRenderer, MessagePackRenderer
+
+
+class Command(management.base.BaseCommand):
+    help = (
+        'Benchmark the throughput of the renderers and parsers '
+        'on pages of contracts and events'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", nargs="+", type=int, default=[100, 1000],
+            help="numbers of contracts and events per page",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=20,
+            help="number of runs of each rendering and parsing",
+        )
+
+    def pages(self, size):
+        """
+        Returns pages of size contracts and events
+        as represented by their serializers
+        """
+        contracts = [
+            OrderedDict([
+                ("id", i),
+                ("sales_contact_id", 1),
+                ("client_id", i),
+                ("date_created", "2021-09-04T14:47:43.985000+02:00"),
+                ("date_updated", "2021-09-04T14:47:43.985000+02:00"),
+                ("status", bool(i % 2)),
+                ("amount", "2000.00"),
+                ("payment_due", "2021-12-01T00:00:00+01:00"),
+            ])
+            for i in range(size)
+        ]
+        events = [
+            OrderedDict([
+                ("id", i),
+                ("client_id", i),
+                ("support_contact_id", 1),
+                ("event_status_id", 1),
+                ("event_status", OrderedDict([("status", "CREATED")])),
+                ("attendees", 100),
+                ("event_date", "2021-12-24T20:00:00+01:00"),
+                ("notes", "Soirée de Noël " * 136),
+                ("date_created", "2021-09-04T14:47:43.985000+02:00"),
+                ("date_updated", "2021-09-04T14:47:43.985000+02:00"),
+            ])
+            for i in range(size)
+        ]
+        return (
+            ("contracts", {"count": size, "results": contracts}),
+            ("events", {"count": size, "results": events}),
+        )
+
+    def timeit(self, repeat, function):
+        """
+        Returns the best time in seconds of the function
+        """
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def handle(self, *args, **options):
+        benchmarks = (
+            ("JSONRenderer", JSONRenderer(), JSONParser()),
+            ("FastJSONRenderer", FastJSONRenderer(), FastJSONParser()),
+            ("MessagePackRenderer", MessagePackRenderer(), MessagePackParser()),
+        )
+        self.stdout.write(
+            f"{'rows':>6} | {'page':<9} | {'renderer':<19} | {'size (KB)':>9}"
+            f" | {'render (MB/s)':>13} | {'parse (MB/s)':>12}"
+        )
+        for size in options["rows"]:
+            for page, data in self.pages(size):
+                for name, renderer, parser in benchmarks:
+                    body = renderer.render(data, renderer.media_type)
+                    megabytes = len(body) / 1e6
+                    render_time = self.timeit(
+                        options["repeat"],
+                        lambda: renderer.render(data, renderer.media_type),
+                    )
+                    parse_time = self.timeit(
+                        options["repeat"],
+                        lambda: parser.parse(io.BytesIO(body), parser.media_type, {}),
+                    )
+                    self.stdout.write(
+                        f"{size:>6} | {page:<9} | {name:<19}"
+                        f" | {len(body) / 1000:>9.1f}"
+                        f" | {megabytes / render_time:>13.1f}"
+                        f" | {megabytes / parse_time:>12.1f}"
+                    )
@@ -0,0 +1,147 @@
+"""
+Module benchmarkserialization.py
+"""
+import time
+
+from django.contrib.auth.models import User
+from django.core import management
+from django.db import transaction
+from django.utils import timezone
+
+from crm_api.fast_list import FieldPlan
+from crm_api.models import (
+    Client,
+    Contract,
+    Event,
+    EventStatus,
+    SalesContact,
+    SupportContact,
+)
+from crm_api.serializers import ClientSerializer, ContractSerializer, EventSerializer
+
+
+class Rollback(Exception):
+    """
+    Exception raised to roll back the data created by the benchmark
+    """
+
+
+class Command(management.base.BaseCommand):
+    help = (
+        'Benchmark the serialization of the lists of clients, contracts '
+        'and events by the serializers and by FieldPlan '
+        '(the data are created in a transaction rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", nargs="+", type=int, default=[100, 1000, 10000],
+            help="numbers of clients, contracts and events to serialize",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5,
+            help="number of runs of each serialization",
+        )
+
+    def create_data(self, size, index):
+        """
+        Creates size clients with one contract and one event each
+        """
+        sales_contact = SalesContact.objects.create(
+            user=User(username=f"benchmark_sales_{index}")
+        )
+        support_contact = SupportContact.objects.create(
+            user=User(username=f"benchmark_support_{index}")
+        )
+        event_status, _ = EventStatus.objects.get_or_create(
+            status=EventStatus.Status.CREATED
+        )
+        Client.objects.bulk_create(
+            Client(
+                first_name="Benchmark",
+                last_name=f"Client {i}",
+                email=f"benchmark.{index}.{i}@example.com",
+                sales_contact=sales_contact,
+            )
+            for i in range(size)
+        )
+        clients = list(Client.objects.filter(sales_contact=sales_contact))
+        Contract.objects.bulk_create(
+            Contract(
+                sales_contact=sales_contact,
+                client=client,
+                status=False,
+                amount="1234.50",
+                payment_due=timezone.now(),
+            )
+            for client in clients
+        )
+        Event.objects.bulk_create(
+            Event(
+                client=client,
+                support_contact=support_contact,
+                event_status=event_status,
+                attendees=0,
+                event_date=timezone.now(),
+                notes="n" * 2048,
+            )
+            for client in clients
+        )
+        return sales_contact
+
+    def timeit(self, repeat, function):
+        """
+        Returns the best time in milliseconds of the function
+        """
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return min(timings) * 1000
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'rows':>8} | {'serializer':<18} | {'serializer (ms)':>15}"
+            f" | {'plan (ms)':>10} | {'speedup':>7}"
+        )
+        try:
+            with transaction.atomic():
+                for index, size in enumerate(options["rows"]):
+                    sales_contact = self.create_data(size, index)
+                    benchmarks = (
+                        (ClientSerializer, Client.objects.filter(
+                            sales_contact=sales_contact)),
+                        (ContractSerializer, Contract.objects.filter(
+                            sales_contact=sales_contact)),
+                        (EventSerializer, Event.objects.filter(
+                            client__sales_contact=sales_contact
+                        ).select_related("event_status")),
+                    )
+                    for serializer_class, queryset in benchmarks:
+                        queryset = queryset.order_by("id")
+                        plan = FieldPlan.of(serializer_class())
+                        if plan.rows(queryset.values(*plan.columns)) != [
+                            dict(data)
+                            for data in serializer_class(queryset, many=True).data
+                        ]:
+                            raise management.base.CommandError(
+                                f"{serializer_class.__name__}: different representations"
+                            )
+                        serializer_time = self.timeit(
+                            options["repeat"],
+                            lambda: serializer_class(queryset.all(), many=True).data,
+                        )
+                        plan_time = self.timeit(
+                            options["repeat"],
+                            lambda: plan.rows(queryset.values(*plan.columns)),
+                        )
+                        self.stdout.write(
+                            f"{size:>8} | {serializer_class.__name__:<18}"
+                            f" | {serializer_time:>15.2f} | {plan_time:>10.2f}"
+                            f" | {serializer_time / plan_time:>6.1f}x"
+                        )
+                raise Rollback
+        except Rollback:
+            pass
+        self.stdout.write(self.style.SUCCESS('Benchmark data have been rolled back'))
@@ -0,0 +1,41 @@
+"""
+Module checkvisibility.py
+"""
+from django.core import management
+
+from crm_api import visibility
+
+
+class Command(management.base.BaseCommand):
+    help = (
+        'Check the Visibility table against clients, contracts and events '
+        '(exits with an error if it is inconsistent, to be run on a schedule)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=1000,
+            help="number of clients checked per query",
+        )
+        parser.add_argument(
+            "--fix", action="store_true",
+            help="refresh the visibility rows of the inconsistent clients",
+        )
+
+    def handle(self, *args, **options):
+        client_ids = visibility.check(chunk_size=options["chunk_size"])
+        if not client_ids:
+            self.stdout.write(self.style.SUCCESS('Visibility table is consistent'))
+            return
+        self.stdout.write(
+            self.style.WARNING(
+                f'Visibility table is inconsistent for {len(client_ids)} clients'
+            )
+        )
+        if options["fix"]:
+            visibility.refresh_clients(client_ids)
+            self.stdout.write(
+                self.style.SUCCESS('Visibility rows of these clients have been refreshed')
+            )
+        else:
+            raise management.base.CommandError('Visibility table is inconsistent')
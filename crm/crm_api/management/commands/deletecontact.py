@@ -0,0 +1,45 @@
+"""
+Module deletecontact.py
+"""
+from django.core import management
+
+from crm_api import deletion
+from crm_api.models import SalesContact, StaffContact, SupportContact
+
+
+class Command(management.base.BaseCommand):
+    help = (
+        'Delete a contact and the clients, contracts and events '
+        'of its cascade by chunks'
+    )
+
+    models = {
+        "sales": SalesContact,
+        "support": SupportContact,
+        "staff": StaffContact,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "role", choices=list(self.models),
+            help="role of the contact",
+        )
+        parser.add_argument("id", type=int, help="id of the contact")
+        parser.add_argument(
+            "--chunk-size", type=int, default=None,
+            help="number of objects deleted per transaction",
+        )
+
+    def progress(self, deleted, total):
+        self.stdout.write(f'{deleted}/{total} objects deleted')
+
+    def handle(self, *args, **options):
+        model = self.models[options["role"]]
+        try:
+            contact = model.objects.get(pk=options["id"])
+        except model.DoesNotExist:
+            raise management.base.CommandError(f'{model.__name__} does not exist')
+        deleted = deletion.delete_contact(contact, options["chunk_size"], self.progress)
+        self.stdout.write(
+            self.style.SUCCESS(f'{contact} has been deleted with {deleted} objects')
+        )
@@ -0,0 +1,46 @@
+"""
+Module reassignportfolio.py
+"""
+from django.core import management
+
+from crm_api import bulk
+from crm_api.models import SalesContact, SupportContact
+
+
+class Command(management.base.BaseCommand):
+    help = (
+        'Move the clients and contracts of a sales contact, '
+        'or the events of a support contact, to another contact'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "role", choices=["sales", "support"],
+            help="role of the contacts",
+        )
+        parser.add_argument("from_id", type=int, help="id of the leaving contact")
+        parser.add_argument("to_id", type=int, help="id of the receiving contact")
+        parser.add_argument(
+            "--chunk-size", type=int, default=None,
+            help="number of objects moved per transaction (default: all at once)",
+        )
+
+    def handle(self, *args, **options):
+        if options["role"] == "sales":
+            model, reassign = SalesContact, bulk.reassign_sales_portfolio
+        else:
+            model, reassign = SupportContact, bulk.reassign_support_events
+        if options["from_id"] == options["to_id"]:
+            raise management.base.CommandError('The contacts must be different')
+        try:
+            from_contact = model.objects.get(pk=options["from_id"])
+            to_contact = model.objects.get(pk=options["to_id"])
+        except model.DoesNotExist:
+            raise management.base.CommandError(f'{model.__name__} does not exist')
+        counts = reassign(from_contact, to_contact, options["chunk_size"])
+        details = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Moved from {from_contact} to {to_contact} : {details}'
+            )
+        )
@@ -0,0 +1,22 @@
+"""
+Module rebuildvisibility.py
+"""
+from django.core import management
+
+from crm_api import visibility
+
+
+class Command(management.base.BaseCommand):
+    help = 'Rebuild the Visibility table from clients, contracts and events'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size", type=int, default=1000,
+            help="number of clients refreshed per query",
+        )
+
+    def handle(self, *args, **options):
+        count = visibility.rebuild(chunk_size=options["chunk_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f'Visibility table has been rebuilt : {count} rows')
+        )
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-18 13:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Visibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contact_id', models.BigIntegerField()),
+                ('role', models.CharField(choices=[('SALES', 'SALES'), ('SUPPORT', 'SUPPORT')], max_length=7)),
+                ('object_type', models.CharField(choices=[('client', 'client'), ('contract', 'contract'), ('event', 'event')], max_length=8)),
+                ('object_id', models.BigIntegerField()),
+                ('client_id', models.BigIntegerField(db_index=True)),
+            ],
+            options={
+                'db_table': 'Visibilities',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='visibility',
+            constraint=models.UniqueConstraint(fields=('contact_id', 'role', 'object_type', 'object_id'), name='unique_visibility'),
+        ),
+    ]
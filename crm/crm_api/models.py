@@ -1,9 +1,11 @@
 from datetime import datetime
 
-from django.contrib.auth.models import User, Group
+from django.contrib.auth.models import User
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from crm_api.lookups import LookupRegistry
+
 
 class SalesContact(models.Model):
     """
@@ -24,7 +26,7 @@ class SalesContact(models.Model):
         self.user.save(
             force_insert=False, force_update=False, using=None, update_fields=None
         )
-        self.user.groups.add(Group.objects.get(name="SALES"))
+        self.user.groups.add(LookupRegistry.group("SALES"))
         super().save(
             force_insert=False, force_update=False, using=None, update_fields=None
         )
@@ -59,7 +61,7 @@ class StaffContact(models.Model):
         self.user.save(
             force_insert=False, force_update=False, using=None, update_fields=None
         )
-        self.user.groups.add(Group.objects.get(name="STAFF"))
+        self.user.groups.add(LookupRegistry.group("STAFF"))
         super().save(
             force_insert=False, force_update=False, using=None, update_fields=None
         )
@@ -95,7 +97,7 @@ class SupportContact(models.Model):
         self.user.save(
             force_insert=False, force_update=False, using=None, update_fields=None
         )
-        self.user.groups.add(Group.objects.get(name="SUPPORT"))
+        self.user.groups.add(LookupRegistry.group("SUPPORT"))
         super().save(
             force_insert=False, force_update=False, using=None, update_fields=None
         )
@@ -123,7 +125,7 @@ class Client(models.Model):
     mobile = models.CharField(max_length=20, blank=True)
     sales_contact = models.ForeignKey(to=SalesContact, on_delete=models.CASCADE)
     date_created = models.DateTimeField(auto_now_add=True)
-    date_updated = models.DateTimeField(auto_now=True)
+    date_updated = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -137,7 +139,7 @@ class Contract(models.Model):
     sales_contact = models.ForeignKey(to=SalesContact, on_delete=models.CASCADE)
     client = models.ForeignKey(to=Client, on_delete=models.CASCADE)
     date_created = models.DateTimeField(auto_now_add=True)
-    date_updated = models.DateTimeField(auto_now=True)
+    date_updated = models.DateTimeField(auto_now=True, db_index=True)
     status = models.BooleanField()
     amount = models.DecimalField(max_digits=9, decimal_places=2)
     payment_due = models.DateTimeField(default=datetime.now())
@@ -174,7 +176,7 @@ class Event(models.Model):
 
     client = models.ForeignKey(to=Client, on_delete=models.CASCADE)
     date_created = models.DateTimeField(auto_now_add=True)
-    date_updated = models.DateTimeField(auto_now=True)
+    date_updated = models.DateTimeField(auto_now=True, db_index=True)
     support_contact = models.ForeignKey(to=SupportContact, on_delete=models.CASCADE)
     event_status = models.ForeignKey(to=EventStatus, on_delete=models.CASCADE)
     attendees = models.IntegerField()
@@ -186,3 +188,57 @@ class Event(models.Model):
             f"{self.client} | {self.support_contact} | "
             f"{self.event_status} | {self.attendees} | {self.event_date}"
         )
+
+
+class Visibility(models.Model):
+    """
+    Visibility Entity : row-level access of a sales or support contact
+    to a client, a contract or an event, maintained by crm_api.visibility
+    """
+
+    class Role(models.TextChoices):
+        SALES = "SALES", _("SALES")
+        SUPPORT = "SUPPORT", _("SUPPORT")
+
+    class ObjectType(models.TextChoices):
+        CLIENT = "client", _("client")
+        CONTRACT = "contract", _("contract")
+        EVENT = "event", _("event")
+
+    contact_id = models.BigIntegerField()
+    role = models.CharField(max_length=7, choices=Role.choices)
+    object_type = models.CharField(max_length=8, choices=ObjectType.choices)
+    object_id = models.BigIntegerField()
+    client_id = models.BigIntegerField(db_index=True)
+
+    class Meta:
+        db_table = "Visibilities"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["contact_id", "role", "object_type", "object_id"],
+                name="unique_visibility",
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.role} {self.contact_id} | {self.object_type} {self.object_id}"
+        )
+
+
+class TokenVersion(models.Model):
+    """
+    TokenVersion Entity : version of the role claims tokens of a user,
+    or of all the users (user_id ALL_USERS), incremented on revocation
+    """
+
+    ALL_USERS = 0
+
+    user_id = models.BigIntegerField(primary_key=True)
+    version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "TokenVersions"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.version}"
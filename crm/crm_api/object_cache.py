@@ -0,0 +1,114 @@
+"""
+Module with the read-through cache of the serialized clients,
+contracts and events
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from rest_framework.response import Response
+
+from crm_api.identity import IdentityMap
+from crm_api.sparse import is_sparse
+
+OBJECT_KEY = "crm_api:object:{}:{}:{}:{}:{}"
+OBJECT_VERSION_KEY = "crm_api:object:version:{}:{}"
+OBJECT_GENERATION_KEY = "crm_api:object:generation:{}"
+
+
+def get_cache():
+    """
+    Returns the cache backend of CRM_API_OBJECT_CACHE_ALIAS
+    """
+    return caches[settings.CRM_API_OBJECT_CACHE_ALIAS]
+
+
+def _bump(key):
+    """
+    Increments a version kept in the cache without expiration
+    """
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def object_key(model, pk, native=False):
+    """
+    Returns the current key of the representation of an object,
+    made of its model, its pk, the generation of its model, its version
+    and the kind of representation (native datetimes and decimals or not)
+    """
+    name = model._meta.model_name
+    generation_key = OBJECT_GENERATION_KEY.format(name)
+    version_key = OBJECT_VERSION_KEY.format(name, pk)
+    versions = get_cache().get_many([generation_key, version_key])
+    return OBJECT_KEY.format(
+        name,
+        pk,
+        versions.get(generation_key, 0),
+        versions.get(version_key, 0),
+        "native" if native else "str",
+    )
+
+
+def get_data(key):
+    """
+    Returns the representation stored under a key, or None
+    """
+    return get_cache().get(key)
+
+
+def set_data(key, data):
+    """
+    Stores a representation under the key computed before loading the object,
+    so that a change during the loading makes it unreachable
+    """
+    get_cache().set(key, data, settings.CRM_API_OBJECT_CACHE_TIMEOUT)
+
+
+def invalidate(model, pks):
+    """
+    Invalidates the representations of objects after a change
+    """
+    for pk in pks:
+        _bump(OBJECT_VERSION_KEY.format(model._meta.model_name, pk))
+
+
+def invalidate_model(model):
+    """
+    Invalidates the representations of all the objects of a model,
+    e.g. after a change of a related lookup table or a set-based UPDATE
+    """
+    _bump(OBJECT_GENERATION_KEY.format(model._meta.model_name))
+
+
+class ObjectCacheMixin:
+    """
+    Viewset mixin serving retrieve from the object cache
+    when CRM_API_OBJECT_CACHE is True, for the complete representations only.
+    On a hit, the visibility of the object is still checked through
+    the filter backends, once per request with the conditional requests
+    (see IdentityMap.version); the object permissions are not checked,
+    those of the viewsets depending only on the action for retrieve
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.CRM_API_OBJECT_CACHE or is_sparse(request):
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset())
+        try:
+            pk = queryset.model._meta.pk.to_python(self.kwargs[lookup_url_kwarg])
+        except ValidationError:
+            return super().retrieve(request, *args, **kwargs)
+        renderer = getattr(request, "accepted_renderer", None)
+        key = object_key(queryset.model, pk, getattr(renderer, "native_types", False))
+        data = get_data(key)
+        if data is not None and IdentityMap.of(request).version(
+            queryset.model, pk, lambda: queryset
+        ):
+            return Response(data)
+        data = dict(self.get_serializer(self.get_object()).data)
+        set_data(key, data)
+        return Response(data)
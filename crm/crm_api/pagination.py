@@ -0,0 +1,244 @@
+"""
+Module with customized pagination classes
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from functools import cached_property, partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.utils.http import urlencode
+from django.utils.translation import gettext_lazy as _
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+
+from crm_api import list_cache
+from crm_api.filters import Profile
+
+COUNT_CACHE_KEY = "crm_api:count:{}:{}:{}:{}:{}"
+
+
+def estimate_count(queryset):
+    """
+    Returns the number of rows of the queryset estimated by the planner
+    of PostgreSQL, or None for the other databases
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class ProbedPage(Page):
+    """
+    Page knowing whether a next page exists from the rows read past it
+    """
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class CountingPaginator(DjangoPaginator):
+    """
+    Django Paginator delegating the count of the objects to a function.
+    When the count is not exact (estimated or cached), it is only reported:
+    the pages and the next links are found by reading one row past the page
+    """
+
+    def __init__(self, object_list, per_page, counter, is_exact, **kwargs):
+        self._counter = counter
+        self._is_exact = is_exact
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        return self._counter(self.object_list)
+
+    def validate_number(self, number):
+        if self._is_exact():
+            return super().validate_number(number)
+        try:
+            if isinstance(number, float) and not number.is_integer():
+                raise ValueError
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger(_("That page number is not an integer"))
+        if number < 1:
+            raise EmptyPage(_("That page number is less than 1"))
+        return number
+
+    def page(self, number):
+        # count (et count_type) avant de choisir le mode de pagination
+        self.count
+        if self._is_exact():
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_("That page contains no results"))
+        return ProbedPage(
+            rows[:self.per_page], number, self, len(rows) > self.per_page
+        )
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination on an indexed key with opaque cursors
+    and without count query
+    """
+
+    ordering = "id"
+    ordering_query_param = "ordering"
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Returns the ordering requested with ?ordering= on the id (default)
+        or on one of the indexed cursor_ordering_fields of the view,
+        the id being then the tie-breaker
+        """
+        fields = ("id",) + tuple(getattr(view, "cursor_ordering_fields", ()))
+        ordering = request.query_params.get(self.ordering_query_param, self.ordering)
+        if ordering.lstrip("-") not in fields:
+            ordering = self.ordering
+        if ordering.lstrip("-") == "id":
+            return (ordering,)
+        return (ordering, "-id" if ordering.startswith("-") else "id")
+
+
+class CrmPagination(PageNumberPagination):
+    """
+    Page number pagination switching to KeysetPagination
+    with ?pagination=cursor or when a cursor is given
+    """
+
+    mode_query_param = "pagination"
+    keyset_pagination_class = KeysetPagination
+
+    def __init__(self):
+        self.keyset = self.keyset_pagination_class()
+        self.use_cursor = False
+        self.count_type = "exact"
+        self.count_cache_key = None
+
+    @property
+    def django_paginator_class(self):
+        return partial(
+            CountingPaginator,
+            counter=self.get_count,
+            is_exact=lambda: self.count_type == "exact",
+        )
+
+    def get_count_cache_key(self, request, view):
+        """
+        Returns the key of the count of a list per role, contact
+        and query parameters, in the current generation of the lists
+        of the contact
+        """
+        the_profile = Profile.from_request(request)
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            if key != self.page_query_param
+            for value in values
+        )
+        return COUNT_CACHE_KEY.format(
+            getattr(view, "basename", view.__class__.__name__),
+            the_profile.role,
+            the_profile.sales_contact_id or the_profile.support_contact_id,
+            list_cache.generation(the_profile),
+            hashlib.md5(urlencode(params).encode()).hexdigest(),
+        )
+
+    def get_count(self, queryset):
+        """
+        Returns the cached count of the queryset, its estimate when above
+        CRM_API_COUNT_ESTIMATE_THRESHOLD or its exact count,
+        setting count_type accordingly (see CountingPaginator)
+        """
+        timeout = settings.CRM_API_COUNT_CACHE_TIMEOUT
+        if timeout and self.count_cache_key:
+            count = cache.get(self.count_cache_key)
+            if count is not None:
+                self.count_type = "cached"
+                return count
+        threshold = settings.CRM_API_COUNT_ESTIMATE_THRESHOLD
+        estimate = estimate_count(queryset) if threshold is not None else None
+        if estimate is not None and estimate >= threshold:
+            count = estimate
+            self.count_type = "estimated"
+        else:
+            count = queryset.count()
+            self.count_type = "exact"
+        if timeout and self.count_cache_key:
+            cache.set(self.count_cache_key, count, timeout)
+        return count
+
+    def is_cursor_mode(self, request):
+        """
+        Returns True if the request asks for the keyset pagination
+        """
+        return bool(
+            request.query_params.get(self.mode_query_param) == "cursor"
+            or self.keyset.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = self.is_cursor_mode(request)
+        if self.use_cursor:
+            page = self.keyset.paginate_queryset(queryset, request, view)
+            self.display_page_controls = self.keyset.display_page_controls
+            return page
+        if view is not None:
+            self.count_cache_key = self.get_count_cache_key(request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.use_cursor:
+            return self.keyset.get_paginated_response(data)
+        return Response(OrderedDict([
+            ("count", self.page.paginator.count),
+            ("count_type", self.count_type),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        paginated_schema = super().get_paginated_response_schema(schema)
+        paginated_schema["properties"]["count_type"] = {
+            "type": "string",
+            "enum": ["exact", "estimated", "cached"],
+        }
+        return paginated_schema
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            parameter
+            for parameter in self.keyset.get_schema_operation_parameters(view)
+            if parameter["name"] != self.page_query_param
+        ]
+
+    def get_html_context(self):
+        if self.use_cursor:
+            return self.keyset.get_html_context()
+        return super().get_html_context()
+
+    def to_html(self):
+        if self.use_cursor:
+            return self.keyset.to_html()
+        return super().to_html()
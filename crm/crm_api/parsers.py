@@ -0,0 +1,73 @@
+"""
+Module with the parsers of the API
+"""
+import codecs
+import io
+from decimal import Decimal
+
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
+
+from crm_api.renderers import DECIMAL_EXT_TYPE, FastJSONRenderer, MessagePackRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+
+class FastJSONParser(parsers.JSONParser):
+    """
+    JSONParser decoding UTF-8 bodies with orjson when it is installed,
+    with the stdlib decoder of JSONParser otherwise or when orjson rejects
+    the body, for the same data and the same error messages
+    """
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read() if stream is not None else b""
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # entier de plus de 64 bits, ... ou message d'erreur de JSONParser
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+def ext_hook(code, data):
+    """
+    Decodes the extension types of MessagePackRenderer
+    """
+    if code == DECIMAL_EXT_TYPE:
+        return Decimal(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+class MessagePackParser(parsers.BaseParser):
+    """
+    Parser decoding MessagePack, the Timestamps as UTC datetimes
+    and the extension type DECIMAL_EXT_TYPE as decimals
+    """
+
+    media_type = "application/msgpack"
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if msgpack is None:
+            raise UnsupportedMediaType(media_type)
+        try:
+            return msgpack.unpackb(
+                stream.read(), ext_hook=ext_hook, timestamp=3, strict_map_key=False
+            )
+        except (ValueError, TypeError) as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
@@ -1,8 +1,135 @@
 """
 Module for customized permissions
 """
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission, User
+from django.db.models import Q
 from rest_framework import permissions
 
+from crm_api.filters import Profile
+
+
+class PermissionMatrix:
+    """
+    Process-wide matrix of the permissions granted to each role,
+    compiled from the groups STAFF, SALES and SUPPORT, along with
+    the permissions of each user (its own and those of all its groups)
+    """
+
+    _lock = threading.Lock()
+    _matrix = None
+    _loaded_at = 0.0
+    _generation = 0
+    _user_perms = dict()
+
+    @classmethod
+    def compile(cls):
+        """
+        Returns a dict mapping each group name to its set of permissions
+        """
+        matrix = dict()
+        for name, app_label, codename in Group.objects.values_list(
+            "name", "permissions__content_type__app_label", "permissions__codename"
+        ):
+            perms = matrix.setdefault(name, set())
+            if codename:
+                perms.add(f"{app_label}.{codename}")
+        return {name: frozenset(perms) for name, perms in matrix.items()}
+
+    @classmethod
+    def get(cls):
+        """
+        Returns the matrix, compiling it on first use or once expired
+        """
+        matrix = cls._matrix
+        timeout = settings.CRM_API_PERMISSION_MATRIX_TIMEOUT
+        if matrix is None or time.monotonic() - cls._loaded_at > timeout:
+            generation = cls._generation
+            matrix = cls.compile()
+            with cls._lock:
+                # une invalidation pendant la compilation rend la matrice obsolète
+                if generation == cls._generation:
+                    cls._matrix = matrix
+                    cls._loaded_at = time.monotonic()
+                    # permissions des utilisateurs expirées avec la matrice
+                    cls._user_perms = dict()
+        return matrix
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Invalidates the matrix after a change on groups or permissions
+        """
+        with cls._lock:
+            cls._generation += 1
+            cls._matrix = None
+            cls._user_perms = dict()
+
+    @classmethod
+    def invalidate_users(cls, user_ids):
+        """
+        Invalidates the permissions of users after a change on their
+        permissions or groups
+        """
+        with cls._lock:
+            for user_id in user_ids:
+                cls._user_perms.pop(user_id, None)
+
+    @classmethod
+    def role_has_perm(cls, role, perm):
+        """
+        Returns True if the role has the permission
+        """
+        return perm in cls.get().get(role, frozenset())
+
+    @classmethod
+    def user_has_perm(cls, user, perm):
+        """
+        Returns True if the user has the permission, granted to itself
+        or to one of its groups, as User.has_perm does
+        """
+        if not isinstance(user, User):
+            # TokenUser : permissions portées par le token
+            return user.has_perm(perm)
+        cls.get()
+        generation = cls._generation
+        perms = cls._user_perms.get(user.pk)
+        if perms is None:
+            perms = frozenset(
+                f"{app_label}.{codename}"
+                for app_label, codename in Permission.objects.filter(
+                    Q(user=user) | Q(group__user=user)
+                ).values_list("content_type__app_label", "codename")
+            )
+            with cls._lock:
+                if generation == cls._generation:
+                    cls._user_perms[user.pk] = perms
+        return perm in perms
+
+
+def user_has_perm(request, perm):
+    """
+    Returns True if the user of the request has the permission,
+    looked up in the PermissionMatrix from the role of its profile,
+    then among the permissions of the user
+    """
+    user = getattr(request, "user", None)
+    if not (user and user.is_active):
+        return False
+    if user.is_superuser:
+        return True
+    the_profile = Profile.from_request(request)
+    if the_profile.role is None:
+        # utilisateur sans profil : permissions gérées par Django
+        return user.has_perm(perm)
+    if PermissionMatrix.role_has_perm(the_profile.role, perm):
+        return True
+    # permissions de l'utilisateur et de ses autres groupes
+    return PermissionMatrix.user_has_perm(user, perm)
+
 
 class ContractPermission(permissions.BasePermission):
     """
@@ -11,10 +138,13 @@ class ContractPermission(permissions.BasePermission):
 
     _perms = dict()
     _perms["create"] = "crm_api.add_contract"
+    _perms["bulk_create"] = "crm_api.add_contract"
     _perms["update"] = "crm_api.change_contract"
     _perms["partial_update"] = "crm_api.change_contract"
+    _perms["bulk_update"] = "crm_api.change_contract"
     _perms["retrieve"] = "crm_api.view_contract"
     _perms["list"] = "crm_api.view_contract"
+    _perms["export"] = "crm_api.view_contract"
     _perms["destroy"] = "crm_api.delete_contract"
 
     def change_contract_status_only(self, request, obj):
@@ -32,7 +162,43 @@ class ContractPermission(permissions.BasePermission):
             amount == obj.amount
             and request.data["payment_due"]
             == obj.payment_due.strftime("%Y-%m-%dT%H:%M:%SZ")
-            and request.user.has_perm("crm_api.change_contract_status")
+            and user_has_perm(request, "crm_api.change_contract_status")
+        )
+
+    def change_contracts_status_only(self, request):
+        """
+        Returns True if a bulk update changes the status of the contracts only
+        and user has change_contract_status
+        """
+        if isinstance(request.data, dict):
+            # les ids des contrats de la forme dict ne sont pas une modification
+            names = {name for name in request.data if name != "ids"}
+        elif isinstance(request.data, list):
+            names = {
+                name for item in request.data if isinstance(item, dict)
+                for name in item if name != "id"
+            }
+        else:
+            return False
+        return bool(
+            names == {"status"}
+            and user_has_perm(request, "crm_api.change_contract_status")
+        )
+
+    def has_permission(self, request, view):
+        """
+        Returns true if user can perform a bulk update,
+        the other actions being checked at object level
+        """
+        if getattr(view, "action", None) != "bulk_update":
+            return True
+        return bool(
+            request.user
+            and request.user.is_authenticated
+            and (
+                self.change_contracts_status_only(request)
+                or user_has_perm(request, self._perms[view.action])
+            )
         )
 
     def has_object_permission(self, request, view, obj):
@@ -43,10 +209,10 @@ class ContractPermission(permissions.BasePermission):
         user_is_authenticated = bool(request.user
                                      and request.user.is_authenticated)
         if view.action == "update" or view.action == "partial_update":
-            user_has_perm = bool(
+            has_perm = bool(
                 self.change_contract_status_only(request, obj)
-                or request.user.has_perm(self._perms[view.action])
+                or user_has_perm(request, self._perms[view.action])
             )
         else:
-            user_has_perm = request.user.has_perm(self._perms[view.action])
-        return bool(user_is_authenticated and user_has_perm)
+            has_perm = user_has_perm(request, self._perms[view.action])
+        return bool(user_is_authenticated and has_perm)
@@ -0,0 +1,171 @@
+"""
+Module with the renderers of the API
+"""
+import csv
+import io
+import json
+from decimal import Decimal
+
+from rest_framework import renderers, serializers
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+# type d'extension MessagePack des décimaux (chaîne de caractères UTF-8)
+DECIMAL_EXT_TYPE = 1
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer encoding with orjson when it is installed, with the stdlib
+    encoder of JSONRenderer otherwise, for the same output: compact UTF-8,
+    the types unknown to orjson (Decimal, lazy strings, ...) and the datetimes
+    being encoded by the encoder of DRF, and \\u2028 and \\u2029 escaped
+    """
+
+    options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if orjson else None
+    )
+
+    def use_orjson(self, accepted_media_type, renderer_context):
+        """
+        Returns True if orjson gives the output of JSONRenderer
+        """
+        return (
+            orjson is not None
+            and not self.ensure_ascii
+            and self.compact
+            and self.strict
+            and self.get_indent(accepted_media_type, renderer_context or {}) is None
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not self.use_orjson(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default,
+                               option=self.options)
+        except TypeError:
+            # entier de plus de 64 bits, NaN, ...
+            return super().render(data, accepted_media_type, renderer_context)
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+                b"\xe2\x80\xa9", b"\\u2029"
+            )
+        return ret
+
+
+def native_fields(fields):
+    """
+    Makes the datetime and decimal fields of a serializer, and of its nested
+    serializers, represent their values as datetime and Decimal objects
+    """
+    for field in fields.values():
+        if isinstance(field, serializers.DateTimeField):
+            field.format = None
+        elif isinstance(field, serializers.DecimalField):
+            field.coerce_to_string = False
+        elif isinstance(field, serializers.BaseSerializer):
+            native_fields(getattr(field, "child", field).fields)
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    Renderer encoding with MessagePack, the datetimes being encoded
+    as Timestamp (extension type -1, UTC) and the decimals as the extension
+    type DECIMAL_EXT_TYPE, when the fields are native (see NativeTypesMixin)
+    """
+
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+    native_types = True
+    encoder_class = encoders.JSONEncoder
+
+    def default(self, obj):
+        """
+        Returns the encoding of an object unknown to MessagePack
+        """
+        if isinstance(obj, Decimal):
+            return msgpack.ExtType(DECIMAL_EXT_TYPE, str(obj).encode())
+        # dates, datetimes sans fuseau horaire, chaînes traduites, ...
+        return self.encoder_class().default(obj)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if msgpack is None:
+            raise NotAcceptable("msgpack is not installed")
+        return msgpack.packb(data, default=self.default, datetime=True)
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+    """
+    Renderer of the exports negotiated with Accept: application/x-ndjson,
+    the exports being streamed by crm_api.export: renders the other responses
+    (errors) as one JSON document per line
+    """
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+    encoder_class = encoders.JSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        return "".join(
+            json.dumps(row, cls=self.encoder_class) + "\n" for row in rows
+        ).encode()
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """
+    Renderer of the exports negotiated with Accept: text/csv, the exports
+    being streamed by crm_api.export: renders the other responses (errors)
+    as a header and one CSV line per row
+    """
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        rows = [row if isinstance(row, dict) else {"detail": row} for row in rows]
+        fieldnames = list(dict.fromkeys(name for row in rows for name in row))
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue().encode()
+
+
+class NativeTypesMixin:
+    """
+    Viewset mixin making the serializers represent the datetimes and decimals
+    as datetime and Decimal objects for the renderers with native_types
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        renderer = getattr(self.request, "accepted_renderer", None)
+        if getattr(renderer, "native_types", False):
+            child = getattr(serializer, "child", serializer)
+            native_fields(child.fields)
+            child.native_types = True
+        return serializer
@@ -3,9 +3,9 @@ Module serializers.py
 """
 
 from django.contrib.auth.models import Group, User
-from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 
+from crm_api import identity
 from crm_api.models import (
     Client,
     Contract,
@@ -150,7 +150,7 @@ class ClientSerializer(serializers.ModelSerializer):
     Client serializer
     """
 
-    sales_contact_id = serializers.ReadOnlyField(source="sales_contact.id")
+    sales_contact_id = serializers.ReadOnlyField()
 
     class Meta:
         """ MetaClass with model and excluded fields"""
@@ -173,8 +173,9 @@ class ClientSerializer(serializers.ModelSerializer):
         """
         Method to save the instance of Client
         """
-        the_sales_contact = get_object_or_404(
-            SalesContact, pk=self._kwargs["data"]["sales_contact_id"]
+        request = self.context.get("request")
+        the_sales_contact = identity.fetch(
+            request, SalesContact, self._kwargs["data"]["sales_contact_id"]
         )
         return super().save(sales_contact=the_sales_contact)
 
@@ -184,8 +185,8 @@ class ContractSerializer(serializers.ModelSerializer):
     Contract serializer
     """
 
-    sales_contact_id = serializers.ReadOnlyField(source="sales_contact.id")
-    client_id = serializers.ReadOnlyField(source="client.id")
+    sales_contact_id = serializers.ReadOnlyField()
+    client_id = serializers.ReadOnlyField()
 
     class Meta:
         """ MetaClass with model and excluded fields"""
@@ -210,11 +211,13 @@ class ContractSerializer(serializers.ModelSerializer):
         """
         Method to save the instance of Contract
         """
-        the_sales_contact = get_object_or_404(
-            SalesContact, pk=self._kwargs["data"]["sales_contact_id"]
+        request = self.context.get("request")
+        the_sales_contact = identity.fetch(
+            request, SalesContact, self._kwargs["data"]["sales_contact_id"]
+        )
+        the_client = identity.fetch(
+            request, Client, self._kwargs["data"]["client_id"]
         )
-        the_client = get_object_or_404(Client,
-                                       pk=self._kwargs["data"]["client_id"])
         return super().save(sales_contact=the_sales_contact, client=the_client)
 
 
@@ -235,9 +238,9 @@ class EventSerializer(serializers.ModelSerializer):
     Event serializer
     """
 
-    support_contact_id = serializers.ReadOnlyField(source="support_contact.id")
-    client_id = serializers.ReadOnlyField(source="client.id")
-    event_status_id = serializers.ReadOnlyField(source="event_status.id")
+    support_contact_id = serializers.ReadOnlyField()
+    client_id = serializers.ReadOnlyField()
+    event_status_id = serializers.ReadOnlyField()
     event_status = EventStatusSerializer(many=False, read_only=True)
 
     class Meta:
@@ -274,13 +277,15 @@ class EventSerializer(serializers.ModelSerializer):
         """
         Method to save the instance of Event
         """
-        the_support_contact = get_object_or_404(
-            SupportContact, pk=self._kwargs["data"]["support_contact_id"]
+        request = self.context.get("request")
+        the_support_contact = identity.fetch(
+            request, SupportContact, self._kwargs["data"]["support_contact_id"]
+        )
+        the_client = identity.fetch(
+            request, Client, self._kwargs["data"]["client_id"]
         )
-        the_client = get_object_or_404(Client,
-                                       pk=self._kwargs["data"]["client_id"])
-        the_event_status = get_object_or_404(
-            EventStatus, pk=self._kwargs["data"]["event_status_id"]
+        the_event_status = identity.fetch(
+            request, EventStatus, self._kwargs["data"]["event_status_id"]
         )
         return super().save(
             support_contact=the_support_contact,
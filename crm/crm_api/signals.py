@@ -0,0 +1,215 @@
+"""
+Module with the signal receivers of crm_api
+"""
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from crm_api.authentication import revoke_all_tokens, revoke_tokens
+from crm_api.filters import profile_cache_key
+from crm_api import list_cache, object_cache, visibility
+from crm_api.lookups import LookupRegistry
+from crm_api.models import (
+    Client,
+    Contract,
+    Event,
+    EventStatus,
+    SalesContact,
+    StaffContact,
+    SupportContact,
+)
+from crm_api.permissions import PermissionMatrix
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_profile(sender, instance, **kwargs):
+    """
+    Removes the cached profile of a created, updated or deleted user
+    """
+    cache.delete(profile_cache_key(instance.pk))
+
+
+@receiver(post_save, sender=SalesContact)
+@receiver(post_delete, sender=SalesContact)
+@receiver(post_save, sender=StaffContact)
+@receiver(post_delete, sender=StaffContact)
+@receiver(post_save, sender=SupportContact)
+@receiver(post_delete, sender=SupportContact)
+def invalidate_contact_profile(sender, instance, **kwargs):
+    """
+    Removes the cached profile of the user of a created or deleted contact
+    """
+    cache.delete(profile_cache_key(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def revoke_user_tokens(sender, instance, update_fields=None, **kwargs):
+    """
+    Revokes the tokens of a deleted or updated user
+    (password, activation, ...) except on login
+    """
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+    revoke_tokens(instance.pk)
+
+
+@receiver(post_save, sender=SalesContact)
+@receiver(post_delete, sender=SalesContact)
+@receiver(post_save, sender=StaffContact)
+@receiver(post_delete, sender=StaffContact)
+@receiver(post_save, sender=SupportContact)
+@receiver(post_delete, sender=SupportContact)
+def revoke_contact_tokens(sender, instance, **kwargs):
+    """
+    Revokes the tokens of the user of a created or deleted contact
+    """
+    revoke_tokens(instance.user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def revoke_group_member_tokens(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Revokes the tokens of the users added to or removed from a group,
+    or whose own permissions change
+    """
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        revoke_tokens(instance.pk)
+    elif pk_set:
+        for user_id in pk_set:
+            revoke_tokens(user_id)
+    else:
+        revoke_all_tokens()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def revoke_permission_tokens(sender, action=None, **kwargs):
+    """
+    Revokes all the tokens when the permissions of the groups change
+    """
+    if action is None or action.startswith("post_"):
+        revoke_all_tokens()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_permission_matrix(sender, **kwargs):
+    """
+    Invalidates the PermissionMatrix when groups or permissions change
+    """
+    PermissionMatrix.invalidate()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalidates the permissions of the users in the PermissionMatrix
+    when their groups or their own permissions change
+    """
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        PermissionMatrix.invalidate_users([instance.pk])
+    elif pk_set:
+        PermissionMatrix.invalidate_users(pk_set)
+    else:
+        PermissionMatrix.invalidate()
+
+
+@receiver(post_save, sender=EventStatus)
+@receiver(post_delete, sender=EventStatus)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_lookup_registry(sender, **kwargs):
+    """
+    Invalidates the LookupRegistry when event statuses or groups change
+    """
+    LookupRegistry.invalidate()
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_cached_object(sender, instance, **kwargs):
+    """
+    Invalidates the cached representation of a saved or deleted
+    client, contract or event
+    """
+    object_cache.invalidate(sender, [instance.pk])
+
+
+@receiver(post_save, sender=EventStatus)
+@receiver(post_delete, sender=EventStatus)
+def invalidate_cached_events(sender, **kwargs):
+    """
+    Invalidates the cached representations of the events,
+    which embed their status
+    """
+    object_cache.invalidate_model(Event)
+
+
+@receiver(post_save, sender=EventStatus)
+@receiver(post_delete, sender=EventStatus)
+def invalidate_cached_lists(sender, **kwargs):
+    """
+    Invalidates all the cached lists when event statuses change
+    """
+    list_cache.invalidate_all()
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def refresh_client_visibility(sender, instance, raw=False, **kwargs):
+    """
+    Refreshes the Visibility rows of a saved or deleted client,
+    except while loading fixtures (see the command rebuildvisibility)
+    """
+    if raw:
+        return
+    visibility.clients_changed([instance.pk])
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+def refresh_contract_visibility(sender, instance, raw=False, **kwargs):
+    """
+    Refreshes the Visibility rows of the client of a saved or deleted contract
+    """
+    if raw:
+        return
+    visibility.object_changed(visibility.CONTRACT, instance.pk, instance.client_id)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def refresh_event_visibility(sender, instance, raw=False, **kwargs):
+    """
+    Refreshes the Visibility rows of the client of a saved or deleted event
+    """
+    if raw:
+        return
+    visibility.object_changed(visibility.EVENT, instance.pk, instance.client_id)
+
+
+# receivers de post_delete dont deletion.delete_chunks fait le travail
+# une fois par lot lorsqu'il supprime sans signaux
+CHUNK_DELETE_RECEIVERS = (
+    invalidate_cached_object,
+    refresh_client_visibility,
+    refresh_contract_visibility,
+    refresh_event_visibility,
+)
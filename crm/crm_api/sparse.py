@@ -0,0 +1,126 @@
+"""
+Module with the sparse fieldsets (?fields= and ?exclude=) of the viewsets,
+trimming the representations and the columns read from the database
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+
+FIELDS_QUERY_PARAM = "fields"
+EXCLUDE_QUERY_PARAM = "exclude"
+SPARSE_ACTIONS = ("list", "retrieve")
+
+
+def is_sparse(request):
+    """
+    Returns True if the request asks for a sparse fieldset
+    """
+    params = request.query_params
+    return FIELDS_QUERY_PARAM in params or EXCLUDE_QUERY_PARAM in params
+
+
+def split_names(value):
+    """
+    Returns the list of the names of a comma separated value
+    """
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def model_fields(model, serializer_fields):
+    """
+    Returns the names of the model fields read by the serializer fields,
+    or None if one of them does not read a concrete field of the model
+    (method, many-to-many or reverse relation)
+    """
+    names = {model._meta.pk.name}
+    for field in serializer_fields.values():
+        if field.source == "*":
+            return None
+        try:
+            model_field = model._meta.get_field(field.source.split(".")[0])
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        names.add(model_field.name)
+    return names
+
+
+def project(queryset, names):
+    """
+    Returns the queryset loading only the fields of names, without the
+    select_related and prefetch_related of the relations left aside
+    """
+    related = queryset.query.select_related
+    if isinstance(related, dict):
+        related = [name for name in related if name in names]
+        queryset = queryset.select_related(None)
+        if related:
+            # select_related() sans argument suivrait toutes les relations
+            queryset = queryset.select_related(*related)
+    lookups = queryset._prefetch_related_lookups
+    if lookups:
+        queryset = queryset.prefetch_related(None).prefetch_related(
+            *[
+                lookup
+                for lookup in lookups
+                if getattr(lookup, "prefetch_through", lookup).split("__")[0]
+                in names
+            ]
+        )
+    return queryset.only(*names)
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset mixin restricting the representations of list and retrieve
+    to the fields given by ?fields=id,event_date or to all the fields but
+    those given by ?exclude=notes, and loading only the matching columns
+    """
+
+    def get_sparse_fields(self, fields):
+        """
+        Returns the names of the serializer fields requested among fields,
+        or None without ?fields= nor ?exclude=
+        """
+        if getattr(self, "action", None) not in SPARSE_ACTIONS:
+            return None
+        if not is_sparse(self.request):
+            return None
+        params = self.request.query_params
+        requested = split_names(params.get(FIELDS_QUERY_PARAM, ""))
+        excluded = split_names(params.get(EXCLUDE_QUERY_PARAM, ""))
+        unknown = sorted(set(requested + excluded) - set(fields))
+        if unknown:
+            raise ValidationError(
+                {"fields": [f"unknown fields: {', '.join(unknown)}"]}
+            )
+        names = [name for name in fields if not requested or name in requested]
+        return [name for name in names if name not in excluded]
+
+    def trim_fields(self, fields):
+        """
+        Removes from the serializer fields those not requested
+        """
+        names = self.get_sparse_fields(fields)
+        if names is not None:
+            for name in list(fields):
+                if name not in names:
+                    fields.pop(name)
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        self.trim_fields(getattr(serializer, "child", serializer).fields)
+        return serializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, "action", None) not in SPARSE_ACTIONS:
+            return queryset
+        if not is_sparse(self.request):
+            return queryset
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        names = model_fields(queryset.model, self.trim_fields(serializer.fields))
+        if names is None:
+            return queryset
+        return project(queryset, names)
@@ -0,0 +1,232 @@
+"""
+Module test_async_views.py
+"""
+
+import asyncio
+import csv
+import gzip
+import io
+import json
+import threading
+import time
+
+import mock
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from crm_api import async_views
+from crm_api.coalescing import SingleFlight
+from crm_api.fast_list import FastListMixin
+from crm_api.models import Event, User
+from crm_api.tests.test_views import TestInterface
+from crm_api.views import ClientViewSet, ContractViewSet, EventViewSet
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.test import (AsyncRequestFactory, TransactionTestCase,
+                         override_settings)
+from parameterized import parameterized
+from rest_framework import status
+
+
+@override_settings(CRM_API_ASYNC_READ=True, CRM_API_ASYNC_READ_THREADS=2)
+class AsyncReadTest(TransactionTestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        async_views._executor = None
+
+    def tearDown(self):
+        if async_views._executor is not None:
+            async_views._executor.shutdown()
+        async_views._executor = None
+
+    def get_request(self, url, username="staff_contact_01"):
+        # utilisateur de la session, comme le fait AuthenticationMiddleware
+        request = AsyncRequestFactory().get(url)
+        request.user = User.objects.get(username=username) if username else AnonymousUser()
+        return request
+
+    @pytest.mark.django_db
+    def test_async_views(self):
+        view = ClientViewSet.as_view({"get": "list", "post": "create"})
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertIs(view.cls, ClientViewSet)
+        self.assertTrue(view.csrf_exempt)
+        view = ClientViewSet.as_view({"get": "export"})
+        self.assertFalse(asyncio.iscoroutinefunction(view))
+        with override_settings(CRM_API_ASYNC_READ=False):
+            view = ClientViewSet.as_view({"get": "list"})
+        self.assertFalse(asyncio.iscoroutinefunction(view))
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            (ClientViewSet, {"get": "list"}, "/clients/", {}),
+            (ContractViewSet, {"get": "list"}, "/contracts/", {}),
+            (EventViewSet, {"get": "list"}, "/events/", {}),
+            (EventViewSet, {"get": "retrieve"}, "/events/1/", {"pk": "1"}),
+        ]
+    )
+    def test_same_content(self, viewset_class, actions, url, kwargs):
+        self.login("staff_contact_01", "N3wpolo6")
+        expected = self.client.get(url)
+        view = viewset_class.as_view(actions)
+        response = async_to_sync(view)(self.get_request(url), **kwargs)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, expected.content)
+
+    @pytest.mark.django_db
+    def test_permissions(self):
+        view = ClientViewSet.as_view({"get": "retrieve"})
+        response = async_to_sync(view)(
+            self.get_request("/clients/2/", "sales_contact_01"), pk="2"
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = async_to_sync(view)(self.get_request("/clients/2/", None), pk="2")
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+
+    @pytest.mark.django_db
+    def test_bounded_pool(self):
+        view = EventViewSet.as_view({"get": "list"})
+        threads = set()
+        run_read = async_views.run_read
+
+        def tracking_run_read(*args, **kwargs):
+            threads.add(threading.get_ident())
+            return run_read(*args, **kwargs)
+
+        requests = [self.get_request("/events/") for _ in range(10)]
+
+        async def concurrent_requests():
+            return await asyncio.gather(*[view(request) for request in requests])
+
+        with mock.patch.object(async_views, "run_read", tracking_run_read):
+            responses = async_to_sync(concurrent_requests)()
+        self.assertEqual({response.status_code for response in responses}, {200})
+        self.assertLessEqual(len(threads), 2)
+
+    def coalesced_lists(self, view, count, wait):
+        """
+        Sends count concurrent requests of the list of events to view,
+        the list waiting at most wait seconds for the other requests
+        to join its execution, returns the tuple (responses, executions)
+        """
+        executions = []
+        fast_list = FastListMixin.list
+
+        def waiting_list(viewset, request, *args, **kwargs):
+            executions.append(threading.get_ident())
+            deadline = time.monotonic() + wait
+            while time.monotonic() < deadline and not any(
+                flight.waiters == count - 1
+                for flight in list(SingleFlight._flights.values())
+            ):
+                time.sleep(0.01)
+            return fast_list(viewset, request, *args, **kwargs)
+
+        requests = [self.get_request("/events/") for _ in range(count)]
+
+        async def concurrent_requests():
+            return await asyncio.gather(*[view(request) for request in requests])
+
+        with mock.patch.object(FastListMixin, "list", waiting_list):
+            responses = async_to_sync(concurrent_requests)()
+        return responses, executions
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_COALESCE_LIST=True, CRM_API_ASYNC_READ_THREADS=4)
+    def test_coalescing(self):
+        view = EventViewSet.as_view({"get": "list"})
+        responses, executions = self.coalesced_lists(view, 3, 5)
+        self.assertEqual(len(executions), 1)
+        self.assertEqual({response.status_code for response in responses}, {200})
+        self.assertEqual(len({response.content for response in responses}), 1)
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_COALESCE_LIST=True, CRM_API_ASYNC_READ=False)
+    def test_no_coalescing_in_thread_sensitive_views(self):
+        # vue synchrone servie en ASGI, comme le fait le handler de Django 3.2
+        view = sync_to_async(EventViewSet.as_view({"get": "list"}))
+        responses, executions = self.coalesced_lists(view, 3, 0.1)
+        self.assertEqual(len(executions), 3)
+        self.assertEqual(len(set(executions)), 1)
+        self.assertEqual({response.status_code for response in responses}, {200})
+
+
+class AsgiExportTest(TransactionTestCase):
+
+    fixtures = AsyncReadTest.fixtures
+
+    def setUp(self):
+        cache.clear()
+
+    def asgi_get(self, url, username="staff_contact_01", headers=()):
+        # requête servie par l'application ASGI de Django, comme crm/asgi.py
+        self.client.force_login(User.objects.get(username=username))
+        session = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        path, _, query = url.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"cookie", f"{settings.SESSION_COOKIE_NAME}={session}".encode()),
+                *headers,
+            ],
+            "client": ["127.0.0.1", 50000],
+            "server": ["testserver", 80],
+        }
+        messages = []
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(get_asgi_application())(scope, receive, send)
+        start, *body = messages
+        return start, b"".join(message.get("body", b"") for message in body)
+
+    @pytest.mark.django_db
+    def test_export(self):
+        start, content = self.asgi_get("/events/export/")
+        self.assertEqual(start["status"], status.HTTP_200_OK)
+        rows = [json.loads(line) for line in content.decode().splitlines()]
+        self.assertEqual(
+            [row["id"] for row in rows],
+            list(Event.objects.order_by("id").values_list("id", flat=True)),
+        )
+
+    @pytest.mark.django_db
+    def test_compressed_export(self):
+        start, content = self.asgi_get(
+            "/events/export/?export_format=csv",
+            headers=[(b"accept-encoding", b"gzip")],
+        )
+        self.assertEqual(start["status"], status.HTTP_200_OK)
+        self.assertIn((b"Content-Encoding", b"gzip"), start["headers"])
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(content).decode())))
+        self.assertEqual(len(rows), Event.objects.count())
@@ -0,0 +1,120 @@
+"""
+Module test_authentication.py
+"""
+
+import pytest
+from crm_api.authentication import (RoleClaimsJSONWebTokenAuthentication,
+                                    TokenUser, revoke_tokens)
+from crm_api.filters import Profile
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.client import RequestFactory
+from parameterized import parameterized
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+
+
+@override_settings(CRM_API_JWT_ROLE_CLAIMS=True)
+class RoleClaimsJSONWebTokenAuthenticationTest(TestCase):
+    """
+    TestCase for testing RoleClaimsJSONWebTokenAuthentication
+    """
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    def get_token(self, username):
+        url = "/api/login/"
+        data = {"username": username, "password": "N3wpolo6"}
+        response = self.client.post(url, data, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["token"]
+
+    def authenticate(self, token):
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        return RoleClaimsJSONWebTokenAuthentication().authenticate(request)
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("sales_contact_01", "SALES", "crm_api.add_client", True),
+            ("sales_contact_01", "SALES", "crm_api.delete_client", False),
+            ("support_contact_01", "SUPPORT", "crm_api.change_event", True),
+            ("staff_contact_01", "STAFF", "crm_api.delete_client", True),
+            ("anonymous_user", None, "crm_api.view_client", False),
+        ]
+    )
+    def test_authenticate(self, username, role, perm, has_perm):
+        """
+        Test a token user and its profile are built without any query
+        """
+        token = self.get_token(username)
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(token)
+            request = RequestFactory().get("/")
+            request.user = user
+            the_profile = Profile.from_request(request)
+        self.assertIsInstance(user, TokenUser)
+        self.assertEqual(the_profile.role, role)
+        self.assertEqual(user.has_perm(perm), has_perm)
+        self.assertEqual(user.has_crm_role, role is not None)
+        self.assertFalse(user.is_staff)
+
+    @pytest.mark.django_db
+    def test_revoked_token(self):
+        """
+        Test a revoked token is rejected
+        """
+        token = self.get_token("sales_contact_01")
+        revoke_tokens(User.objects.get(username="sales_contact_01").pk)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    @pytest.mark.django_db
+    def test_revoked_token_after_cache_loss(self):
+        """
+        Test a revoked token is still rejected once the cache is lost
+        (evicted, restarted or another process)
+        """
+        token = self.get_token("sales_contact_01")
+        revoke_tokens(User.objects.get(username="sales_contact_01").pk)
+        cache.clear()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+        token = self.get_token("sales_contact_01")
+        cache.clear()
+        user, _ = self.authenticate(token)
+        self.assertIsInstance(user, TokenUser)
+
+    @pytest.mark.django_db
+    def test_password_change_revokes_token(self):
+        """
+        Test a token is rejected once the password of the user has changed
+        """
+        token = self.get_token("support_contact_01")
+        user = User.objects.get(username="support_contact_01")
+        user.set_password("Tk1nt3r0K")
+        user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_JWT_ROLE_CLAIMS=False)
+    def test_legacy_token(self):
+        """
+        Test a token without role claims loads the user from the database
+        """
+        token = self.get_token("sales_contact_01")
+        user, _ = self.authenticate(token)
+        self.assertIsInstance(user, User)
@@ -0,0 +1,52 @@
+"""
+Module test_checks.py
+"""
+
+from crm_api.checks import check_shared_caches
+from django.test import SimpleTestCase, override_settings
+from parameterized import parameterized
+
+LOCAL_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+SHARED_CACHE = {"default": {"BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache"}}
+
+
+class CheckSharedCachesTest(SimpleTestCase):
+    """
+    TestCase for testing the check of the caches shared between the processes
+    """
+
+    @parameterized.expand(
+        [
+            ("CRM_API_JWT_ROLE_CLAIMS", True, "crm_api.W001"),
+            ("CRM_API_LIST_CACHE", True, "crm_api.W002"),
+            ("CRM_API_OBJECT_CACHE", True, "crm_api.W003"),
+            ("CRM_API_PROFILE_CACHE_TIMEOUT", 300, "crm_api.W004"),
+        ]
+    )
+    def test_local_cache(self, name, value, check_id):
+        with override_settings(CACHES=LOCAL_CACHE, **{name: value}):
+            self.assertIn(check_id, [error.id for error in check_shared_caches(None)])
+        with override_settings(CACHES=LOCAL_CACHE, **{name: type(value)()}):
+            self.assertNotIn(
+                check_id, [error.id for error in check_shared_caches(None)]
+            )
+
+    @override_settings(
+        CACHES=SHARED_CACHE,
+        CRM_API_JWT_ROLE_CLAIMS=True,
+        CRM_API_LIST_CACHE=True,
+        CRM_API_OBJECT_CACHE=True,
+        CRM_API_PROFILE_CACHE_TIMEOUT=300,
+    )
+    def test_shared_cache(self):
+        self.assertEqual(check_shared_caches(None), [])
+
+    @override_settings(
+        CACHES={**SHARED_CACHE, "objects": LOCAL_CACHE["default"]},
+        CRM_API_OBJECT_CACHE=True,
+        CRM_API_OBJECT_CACHE_ALIAS="objects",
+    )
+    def test_object_cache_alias(self):
+        self.assertEqual(
+            [error.id for error in check_shared_caches(None)], ["crm_api.W003"]
+        )
@@ -0,0 +1,81 @@
+"""
+Module test_coalescing.py
+"""
+
+import threading
+
+from crm_api.coalescing import SingleFlight
+from django.test import SimpleTestCase
+
+
+class SingleFlightTest(SimpleTestCase):
+    """
+    TestCase for testing SingleFlight
+    """
+
+    def run_concurrently(self, key, function, count):
+        results = [None] * count
+
+        def target(index):
+            results[index] = SingleFlight.do(key, function, 5)
+
+        threads = [
+            threading.Thread(target=target, args=(index,)) for index in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_single_execution(self):
+        calls = []
+        release = threading.Event()
+
+        def function():
+            calls.append(1)
+            release.wait(5)
+            return {"count": 1}
+
+        threads, results = self.run_concurrently("key", function, 10)
+        # les requêtes concurrentes attendent le résultat du leader
+        while SingleFlight._flights.get("key") is None \
+                or SingleFlight._flights["key"].waiters < 9:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results.count(({"count": 1}, True)), 9)
+        self.assertEqual(results.count(({"count": 1}, False)), 1)
+        self.assertEqual(SingleFlight.in_flight(), 0)
+
+    def test_sequential_executions(self):
+        calls = []
+
+        def function():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(SingleFlight.do("key", function), (1, False))
+        self.assertEqual(SingleFlight.do("key", function), (2, False))
+
+    def test_failure_of_the_leader(self):
+        calls = []
+        release = threading.Event()
+
+        def function():
+            calls.append(1)
+            if len(calls) == 1:
+                release.wait(5)
+                raise RuntimeError("failure of the leader")
+            return "result"
+
+        threads, results = self.run_concurrently("key", function, 3)
+        while SingleFlight._flights.get("key") is None \
+                or SingleFlight._flights["key"].waiters < 2:
+            threading.Event().wait(0.01)
+        release.set()
+        for thread in threads:
+            thread.join()
+        # les requêtes en attente s'exécutent elles-mêmes
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(results.count(("result", False)), 2)
@@ -0,0 +1,155 @@
+"""
+Module test_compression.py
+"""
+
+import gzip
+import threading
+
+import mock
+from asgiref.sync import async_to_sync
+from crm_api import compression
+from crm_api.compression import (CompressionMetrics, CompressionMiddleware,
+                                 compress, negotiate, parse_accept_encoding)
+from django.http import HttpResponse, HttpResponseNotModified
+from django.test import (AsyncRequestFactory, RequestFactory, SimpleTestCase,
+                         override_settings)
+from parameterized import parameterized
+
+
+class NegotiationTest(SimpleTestCase):
+    """
+    TestCase for testing the negotiation of the content coding
+    """
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(
+            parse_accept_encoding("gzip, br;q=0.8, *;q=0, zstd;q=abc"),
+            {"gzip": 1.0, "br": 0.8, "*": 0.0, "zstd": 0.0},
+        )
+
+    @parameterized.expand(
+        [
+            ("", None),
+            ("identity", None),
+            ("gzip", "gzip"),
+            ("gzip, deflate, br, zstd", "zstd"),
+            ("gzip, br;q=0.5", "gzip"),
+            ("*", "zstd"),
+            ("*, zstd;q=0, br;q=0", "gzip"),
+            ("gzip;q=0", None),
+        ]
+    )
+    @override_settings(CRM_API_COMPRESSION_CODINGS=["zstd", "br", "gzip"])
+    def test_negotiate(self, header, expected):
+        with mock.patch.dict(
+            compression.COMPRESSORS,
+            {"br": None, "zstd": None, "gzip": None},
+        ):
+            self.assertEqual(negotiate(header), expected)
+
+    @override_settings(CRM_API_COMPRESSION_CODINGS=["zstd", "gzip"])
+    def test_unavailable_coding(self):
+        with mock.patch.dict(compression.COMPRESSORS, clear=True):
+            compression.COMPRESSORS["gzip"] = None
+            self.assertEqual(negotiate("zstd, gzip"), "gzip")
+
+
+class CompressionMetricsTest(SimpleTestCase):
+    """
+    TestCase for testing CompressionMetrics
+    """
+
+    def setUp(self):
+        CompressionMetrics.reset()
+
+    def tearDown(self):
+        CompressionMetrics.reset()
+
+    def test_compress(self):
+        content = b'{"notes": "' + b"n" * 10000 + b'"}'
+        compressed, cpu_time = compress("gzip", content)
+        self.assertEqual(gzip.decompress(compressed), content)
+        self.assertGreaterEqual(cpu_time, 0)
+
+    @override_settings(CRM_API_COMPRESSION_METRICS_INTERVAL=2)
+    def test_snapshot(self):
+        CompressionMetrics.record("gzip", 4000, 1000, 0.001)
+        with self.assertLogs("crm_api.compression", "INFO"):
+            CompressionMetrics.record("gzip", 6000, 1000, 0.003)
+        snapshot = CompressionMetrics.snapshot()
+        self.assertEqual(snapshot["gzip"]["responses"], 2)
+        self.assertEqual(snapshot["gzip"]["ratio"], 5.0)
+        self.assertEqual(snapshot["gzip"]["cpu_ms_per_mb"], 400.0)
+
+
+@override_settings(CRM_API_COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTest(SimpleTestCase):
+    """
+    TestCase for testing CompressionMiddleware
+    """
+
+    def setUp(self):
+        CompressionMetrics.reset()
+
+    def tearDown(self):
+        CompressionMetrics.reset()
+
+    def get_response(self, request, size=2048, status=200):
+        response = HttpResponse(
+            b"n" * size, content_type="application/json", status=status
+        )
+        if status == 304:
+            response = HttpResponseNotModified()
+        response["ETag"] = '"1"'
+        return response
+
+    @parameterized.expand(
+        [
+            ("gzip", 2048, 200, "gzip", 'W/"1"'),
+            ("gzip", 10, 200, None, 'W/"1"'),
+            ("gzip", 0, 304, None, 'W/"1"'),
+            ("identity", 2048, 200, None, '"1"'),
+            ("identity", 0, 304, None, '"1"'),
+        ]
+    )
+    def test_validators(self, accept_encoding, size, status, coding, etag):
+        middleware = CompressionMiddleware(
+            lambda request: self.get_response(request, size, status)
+        )
+        response = middleware(
+            RequestFactory().get("/", HTTP_ACCEPT_ENCODING=accept_encoding)
+        )
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response.get("Content-Encoding"), coding)
+        self.assertEqual(response["ETag"], etag)
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    def test_not_compressible(self):
+        middleware = CompressionMiddleware(
+            lambda request: HttpResponse(b"n" * 2048, content_type="image/png")
+        )
+        response = middleware(RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip"))
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertFalse(response.has_header("Vary"))
+
+    def test_asgi(self):
+        threads = []
+        tracked_compress = compression.compress
+
+        def tracking_compress(*args, **kwargs):
+            threads.append(threading.current_thread())
+            return tracked_compress(*args, **kwargs)
+
+        async def get_response(request):
+            return self.get_response(request)
+
+        middleware = CompressionMiddleware(get_response)
+        request = AsyncRequestFactory().get("/")
+        request.META["HTTP_ACCEPT_ENCODING"] = "gzip"
+        with mock.patch.object(compression, "compress", tracking_compress):
+            response = async_to_sync(middleware)(request)
+        self.assertEqual(gzip.decompress(response.content), b"n" * 2048)
+        self.assertEqual(response["ETag"], 'W/"1"')
+        # pas dans le thread des vues synchrones (thread_sensitive=True)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
@@ -3,15 +3,82 @@ Module test_filters.py
 """
 
 import pytest
-from crm_api.filters import ClientFilter, ContractFilter, EventFilter
-from crm_api.models import Client, Contract, Event
+from crm_api.filters import ClientFilter, ContractFilter, EventFilter, Profile
+from crm_api.models import Client, Contract, Event, SalesContact
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
 from django.test.client import RequestFactory
 from parameterized import parameterized
 from rest_framework.exceptions import PermissionDenied
 
 
+class ProfileTest(TestCase):
+    """
+    TestCase for testing Profile
+    """
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("yannis", "STAFF"),
+            ("staff_contact_01", "STAFF"),
+            ("sales_contact_01", "SALES"),
+            ("support_contact_01", "SUPPORT"),
+            ("anonymous_user", None),
+        ]
+    )
+    def test_role(self, username, expected_role):
+        """
+        Test the role is resolved with a single query
+        """
+        request = RequestFactory().get("/")
+        request.user = User.objects.get(username=username)
+        with self.assertNumQueries(1):
+            the_profile = Profile(request)
+        self.assertEqual(the_profile.role, expected_role)
+        self.assertEqual(the_profile.is_anonymous, expected_role is None)
+
+    @pytest.mark.django_db
+    def test_from_request(self):
+        """
+        Test the profile is resolved once per request and cached per user
+        """
+        request = RequestFactory().get("/")
+        request.user = User.objects.get(username="sales_contact_01")
+        the_profile = Profile.from_request(request)
+        with self.assertNumQueries(0):
+            self.assertIs(Profile.from_request(request), the_profile)
+            other_request = RequestFactory().get("/")
+            other_request.user = request.user
+            self.assertTrue(Profile.from_request(other_request).is_sales)
+
+    @pytest.mark.django_db
+    def test_invalidation(self):
+        """
+        Test the cached profile is invalidated when the contact is deleted
+        """
+        user = User.objects.get(username="sales_contact_01")
+        request = RequestFactory().get("/")
+        request.user = user
+        self.assertTrue(Profile(request).is_sales)
+        SalesContact.objects.filter(user=user).delete()
+        self.assertFalse(Profile(request).is_sales)
+
+
 class ClientFilterTest(TestCase):
     """
     TestCase for testing ClientFilter
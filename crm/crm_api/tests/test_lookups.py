@@ -0,0 +1,95 @@
+"""
+Module test_lookups.py
+"""
+
+import pytest
+from crm_api.lookups import LookupRegistry
+from crm_api.models import EventStatus, SalesContact
+from django.contrib.auth.models import Group, User
+from django.test import TestCase
+from parameterized import parameterized
+
+
+class LookupRegistryTest(TestCase):
+    """
+    TestCase for testing LookupRegistry
+    """
+
+    fixtures = [
+        "contenttype.json",
+        "permission.json",
+        "group.json",
+        "eventstatus.json",
+    ]
+
+    def setUp(self):
+        LookupRegistry.invalidate()
+
+    def tearDown(self):
+        LookupRegistry.invalidate()
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            (EventStatus.Status.CREATED, "CREATED"),
+            (EventStatus.Status.IN_PROGRESS, "IN PROGRESS"),
+            (EventStatus.Status.ENDED, "ENDED"),
+        ]
+    )
+    def test_event_status(self, code, label):
+        """
+        Test the lookups by code and by label return the row of the table
+        """
+        expected = EventStatus.objects.get(status=code)
+        self.assertEqual(LookupRegistry.event_status(code), expected)
+        self.assertEqual(LookupRegistry.event_status_by_label(label), expected)
+
+    @pytest.mark.django_db
+    def test_no_query_once_loaded(self):
+        """
+        Test the lookups are dict lookups once the tables are loaded
+        """
+        LookupRegistry.get()
+        with self.assertNumQueries(0):
+            LookupRegistry.event_status(EventStatus.Status.CREATED)
+            LookupRegistry.event_status_by_label("ENDED")
+            LookupRegistry.group("SALES")
+
+    @pytest.mark.django_db
+    def test_unknown_rows(self):
+        """
+        Test unknown rows raise DoesNotExist
+        """
+        with self.assertRaises(EventStatus.DoesNotExist):
+            LookupRegistry.event_status_by_label("UNKNOWN")
+        with self.assertRaises(Group.DoesNotExist):
+            LookupRegistry.group("UNKNOWN")
+
+    @pytest.mark.django_db
+    def test_invalidation(self):
+        """
+        Test the registry is invalidated when a group is saved or deleted
+        """
+        LookupRegistry.group("SALES")
+        Group.objects.filter(name="SALES").update(name="SELLERS")
+        # une modification sans signal est vue au prochain chargement
+        self.assertEqual(LookupRegistry.group("SALES").name, "SALES")
+        the_group = Group.objects.create(name="MANAGERS")
+        self.assertEqual(LookupRegistry.group("SELLERS").name, "SELLERS")
+        with self.assertRaises(Group.DoesNotExist):
+            LookupRegistry.group("SALES")
+        self.assertEqual(LookupRegistry.group("MANAGERS"), the_group)
+        the_group.delete()
+        with self.assertRaises(Group.DoesNotExist):
+            LookupRegistry.group("MANAGERS")
+
+    @pytest.mark.django_db
+    def test_contact_save(self):
+        """
+        Test the group of a contact is looked up in the registry
+        """
+        LookupRegistry.get()
+        SalesContact.objects.create(user=User(username="registry_sales"))
+        self.assertTrue(
+            User.objects.filter(username="registry_sales", groups__name="SALES").exists()
+        )
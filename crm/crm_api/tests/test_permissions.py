@@ -0,0 +1,103 @@
+"""
+Module test_permissions.py
+"""
+
+import pytest
+from crm_api.permissions import PermissionMatrix, user_has_perm
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.client import RequestFactory
+from parameterized import parameterized
+
+
+class PermissionMatrixTest(TestCase):
+    """
+    TestCase for testing PermissionMatrix and user_has_perm
+    """
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        PermissionMatrix.invalidate()
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("yannis", "crm_api.delete_contract", True),
+            ("staff_contact_01", "crm_api.delete_contract", True),
+            ("sales_contact_01", "crm_api.add_contract", True),
+            ("sales_contact_01", "crm_api.change_contract_status", True),
+            ("sales_contact_01", "crm_api.change_contract", False),
+            ("support_contact_01", "crm_api.change_event", True),
+            ("support_contact_01", "crm_api.view_contract", False),
+            ("anonymous_user", "crm_api.view_client", False),
+        ]
+    )
+    def test_user_has_perm(self, username, perm, expected):
+        """
+        Test user_has_perm gives the same answer as User.has_perm
+        """
+        request = RequestFactory().get("/")
+        request.user = User.objects.get(username=username)
+        self.assertEqual(user_has_perm(request, perm), expected)
+        self.assertEqual(request.user.has_perm(perm), expected)
+
+    @pytest.mark.django_db
+    def test_no_query_once_compiled(self):
+        """
+        Test permission checks are dict lookups once the matrix is compiled
+        """
+        PermissionMatrix.get()
+        request = RequestFactory().get("/")
+        request.user = User.objects.get(username="sales_contact_01")
+        user_has_perm(request, "crm_api.view_client")
+        user_has_perm(request, "crm_api.delete_client")
+        with self.assertNumQueries(0):
+            self.assertTrue(user_has_perm(request, "crm_api.add_event"))
+            self.assertFalse(user_has_perm(request, "crm_api.delete_event"))
+
+    @pytest.mark.django_db
+    def test_invalidation(self):
+        """
+        Test the matrix is invalidated when the permissions of a group change
+        """
+        self.assertFalse(
+            PermissionMatrix.role_has_perm("SUPPORT", "crm_api.add_event")
+        )
+        Group.objects.get(name="SUPPORT").permissions.add(
+            Permission.objects.get(codename="add_event")
+        )
+        self.assertTrue(
+            PermissionMatrix.role_has_perm("SUPPORT", "crm_api.add_event")
+        )
+
+    @pytest.mark.django_db
+    def test_user_and_other_group_permissions(self):
+        """
+        Test the permissions of the user itself and of its other groups
+        are granted along with those of its role
+        """
+        request = RequestFactory().get("/")
+        request.user = User.objects.get(username="sales_contact_01")
+        self.assertFalse(user_has_perm(request, "crm_api.delete_contract"))
+        request.user.user_permissions.add(
+            Permission.objects.get(codename="delete_contract")
+        )
+        self.assertTrue(user_has_perm(request, "crm_api.delete_contract"))
+        self.assertFalse(user_has_perm(request, "crm_api.delete_event"))
+        auditors = Group.objects.create(name="AUDITORS")
+        auditors.permissions.add(Permission.objects.get(codename="delete_event"))
+        request.user.groups.add(auditors)
+        self.assertTrue(user_has_perm(request, "crm_api.delete_event"))
+        request.user.groups.remove(auditors)
+        self.assertFalse(user_has_perm(request, "crm_api.delete_event"))
@@ -0,0 +1,137 @@
+"""
+Module test_renderers.py
+"""
+
+import datetime
+import io
+from collections import OrderedDict
+from decimal import Decimal
+
+import mock
+from crm_api import parsers as crm_parsers
+from crm_api import renderers as crm_renderers
+from crm_api.parsers import FastJSONParser, MessagePackParser
+from crm_api.renderers import FastJSONRenderer, MessagePackRenderer
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from parameterized import parameterized
+from rest_framework.exceptions import NotAcceptable, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+DATA = OrderedDict(
+    [
+        ("id", 1),
+        ("amount", Decimal("2000.50")),
+        ("payment_due", datetime.datetime(2021, 11, 30, 23, 0, 0, 123456,
+                                          tzinfo=timezone.utc)),
+        ("event_date", datetime.date(2021, 11, 30)),
+        ("notes", "Événement ligne paragraphe"),
+        ("label", gettext_lazy("CREATED")),
+        ("status", True),
+        ("attendees", None),
+        ("keys", {1: "one"}),
+        ("items", (1.5, [2, {"nested": "ü"}])),
+    ]
+)
+
+
+class FastJSONRendererTest(SimpleTestCase):
+    """
+    TestCase for testing FastJSONRenderer
+    """
+
+    @parameterized.expand(
+        [
+            (DATA, None),
+            ([DATA, DATA], None),
+            ({"big": 2 ** 70}, None),
+            (DATA, "application/json; indent=4"),
+            ("", None),
+        ]
+    )
+    def test_same_output(self, data, accepted_media_type):
+        self.assertEqual(
+            FastJSONRenderer().render(data, accepted_media_type),
+            JSONRenderer().render(data, accepted_media_type),
+        )
+
+    def test_none(self):
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+    def test_without_orjson(self):
+        with mock.patch.object(crm_renderers, "orjson", None):
+            self.assertEqual(
+                FastJSONRenderer().render(DATA), JSONRenderer().render(DATA)
+            )
+
+
+class FastJSONParserTest(SimpleTestCase):
+    """
+    TestCase for testing FastJSONParser
+    """
+
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), "application/json", {})
+
+    @parameterized.expand(
+        [
+            (b'{"id": 1, "amount": "2000.50", "notes": "\\u00c9v\\u00e9nement"}',),
+            ('[{"notes": "Événement"}, 1.5, null, true]'.encode(),),
+            (b'{"big": 1180591620717411303424}',),
+        ]
+    )
+    def test_same_data(self, body):
+        self.assertEqual(
+            self.parse(FastJSONParser(), body), self.parse(JSONParser(), body)
+        )
+
+    @parameterized.expand([(b'{"id": 1,}',), (b"NaN",), (b"",)])
+    def test_same_error(self, body):
+        with self.assertRaises(ParseError) as expected:
+            self.parse(JSONParser(), body)
+        with self.assertRaises(ParseError) as error:
+            self.parse(FastJSONParser(), body)
+        self.assertEqual(str(error.exception), str(expected.exception))
+
+    def test_without_orjson(self):
+        with mock.patch.object(crm_parsers, "orjson", None):
+            self.assertEqual(self.parse(FastJSONParser(), b'{"id": 1}'), {"id": 1})
+
+
+class MessagePackTest(SimpleTestCase):
+    """
+    TestCase for testing MessagePackRenderer and MessagePackParser
+    """
+
+    def round_trip(self, data):
+        body = MessagePackRenderer().render(data)
+        return MessagePackParser().parse(io.BytesIO(body), "application/msgpack", {})
+
+    def test_native_types(self):
+        data = self.round_trip(DATA)
+        self.assertEqual(data["amount"], Decimal("2000.50"))
+        self.assertIsInstance(data["amount"], Decimal)
+        self.assertEqual(data["payment_due"], DATA["payment_due"])
+        self.assertEqual(data["event_date"], "2021-11-30")
+        self.assertEqual(data["label"], "CREATED")
+        self.assertEqual(data["keys"], {1: "one"})
+        self.assertEqual(data["items"], [1.5, [2, {"nested": "ü"}]])
+
+    def test_naive_datetime(self):
+        data = self.round_trip({"date": datetime.datetime(2021, 11, 30, 23, 0)})
+        self.assertEqual(data["date"], "2021-11-30T23:00:00")
+
+    def test_smaller_than_json(self):
+        self.assertLess(len(MessagePackRenderer().render(DATA)),
+                        len(JSONRenderer().render(DATA)))
+
+    def test_parse_error(self):
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b"\x81"), "application/msgpack", {})
+
+    def test_without_msgpack(self):
+        with mock.patch.object(crm_renderers, "msgpack", None):
+            with self.assertRaises(NotAcceptable):
+                MessagePackRenderer().render(DATA)
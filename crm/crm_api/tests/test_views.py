@@ -1,11 +1,35 @@
-from datetime import datetime
-
+import csv
+import gzip
+import io
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import mock
+import msgpack
 import pytest
-from crm_api.models import (Client, Contract, Event, SalesContact,
+from crm_api import deletion, visibility
+from crm_api.coalescing import Flight, SingleFlight
+from crm_api.compression import COMPRESSORS, CompressionMetrics
+from crm_api.fast_list import FieldPlan
+from crm_api.filters import ClientFilter, ContractFilter, EventFilter
+from crm_api.identity import IdentityMap
+from crm_api.models import (Client, Contract, Event, EventStatus, SalesContact,
                             StaffContact, SupportContact, User)
+from crm_api.pagination import CrmPagination, KeysetPagination
+from crm_api.parsers import ext_hook
+from crm_api.renderers import MessagePackRenderer
 from crm_api.serializers import (ClientSerializer, ContractSerializer,
-                                 EventSerializer)
-from django.test import TestCase
+                                 EventSerializer, SalesContactSerializer)
+from django.core import management
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import post_delete
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.dateparse import parse_datetime
 from parameterized import parameterized
 from rest_framework import status
 
@@ -962,6 +986,24 @@ class EventViewTest(TestCase, TestInterface):
                 datetime.fromisoformat(new_date_iso),
             )
 
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ({"status": "UNKNOWN"},),
+            ({"label": "ENDED"},),
+            ("ENDED",),
+        ]
+    )
+    def test_patch_event_invalid_status(self, event_status):
+        self.login("staff_contact_01", "N3wpolo6")
+        response = self.client.patch("/events/1/",
+                                     {"event_status": event_status},
+                                     content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("event_status", response.data)
+        self.assertEqual(Event.objects.get(pk=1).event_status.status,
+                         EventStatus.Status.CREATED)
+
     @pytest.mark.order(6)
     @pytest.mark.django_db
     @parameterized.expand(
@@ -1018,3 +1060,1649 @@ class InitDataBaseViewTest(TestCase, TestInterface):
         url = "/init_database/"
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class QueryCountTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context)
+
+    def add_rows(self, count):
+        sales_contact = SalesContact.objects.get(pk=1)
+        support_contact = SupportContact.objects.get(pk=1)
+        event_status = EventStatus.objects.get(status=EventStatus.Status.CREATED)
+        for i in range(count):
+            SalesContact.objects.create(user=User(username=f"sales_{i}"))
+            SupportContact.objects.create(user=User(username=f"support_{i}"))
+            StaffContact.objects.create(user=User(username=f"staff_{i}"))
+            client = Client.objects.create(
+                first_name="Query",
+                last_name=f"Count {i}",
+                email=f"query.count.{i}@example.com",
+                sales_contact=sales_contact,
+            )
+            Contract.objects.create(
+                sales_contact=sales_contact,
+                client=client,
+                status=False,
+                amount=1000,
+                payment_due=datetime.fromisoformat("2021-12-24 00:00:00.000+00:00"),
+            )
+            Event.objects.create(
+                client=client,
+                support_contact=support_contact,
+                event_status=event_status,
+                attendees=10,
+                event_date=datetime.fromisoformat("2021-12-24 00:00:00.000+00:00"),
+            )
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("/salescontacts/",),
+            ("/supportcontacts/",),
+            ("/staffcontacts/",),
+            ("/clients/",),
+            ("/contracts/",),
+            ("/events/",),
+        ]
+    )
+    def test_constant_query_count(self, url):
+        self.login("staff_contact_01", "N3wpolo6")
+        self.count_queries(url)
+        expected = self.count_queries(url)
+        self.add_rows(5)
+        self.assertEqual(self.count_queries(url), expected)
+
+
+class KeysetPaginationTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        sales_contact = SalesContact.objects.get(pk=1)
+        for i in range(5):
+            Client.objects.create(
+                first_name="Keyset",
+                last_name=f"Pagination {i}",
+                email=f"keyset.pagination.{i}@example.com",
+                sales_contact=sales_contact,
+            )
+
+    def fetch_all(self, url):
+        ids = []
+        with CaptureQueriesContext(connection) as context:
+            while url:
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertNotIn("count", response.data)
+                ids += [item["id"] for item in response.data["results"]]
+                url = response.data["next"]
+        for query in context.captured_queries:
+            self.assertNotIn("COUNT(", query["sql"])
+        return ids
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("staff_contact_01", "/clients/?pagination=cursor", Client, False),
+            ("sales_contact_01", "/clients/?pagination=cursor", Client, False),
+            (
+                "staff_contact_01",
+                "/clients/?pagination=cursor&ordering=-id",
+                Client,
+                True,
+            ),
+            ("staff_contact_01", "/contracts/?pagination=cursor", Contract, False),
+            ("staff_contact_01", "/events/?pagination=cursor", Event, False),
+            (
+                "staff_contact_01",
+                "/salescontacts/?pagination=cursor",
+                SalesContact,
+                False,
+            ),
+        ]
+    )
+    def test_cursor_pagination(self, username, url, model, reverse):
+        self.login(username, "N3wpolo6")
+        with mock.patch.object(KeysetPagination, "page_size", 2):
+            ids = self.fetch_all(url)
+        expected = self.client.get(url.replace("pagination=cursor", "")).data
+        expected_ids = sorted((item["id"] for item in expected["results"]),
+                              reverse=reverse)
+        self.assertEqual(ids, expected_ids)
+        self.assertEqual(len(ids), expected["count"])
+
+    @pytest.mark.django_db
+    def test_ordering_on_date_updated(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        client = Client.objects.get(pk=1)
+        client.save()
+        with mock.patch.object(KeysetPagination, "page_size", 2):
+            ids = self.fetch_all("/clients/?pagination=cursor&ordering=date_updated")
+        self.assertEqual(ids[-1], client.pk)
+        self.assertEqual(len(ids), Client.objects.count())
+
+
+class PaginationCountTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    @pytest.mark.django_db
+    def test_exact_count(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        response = self.client.get("/events/")
+        self.assertEqual(response.data["count_type"], "exact")
+        self.assertEqual(response.data["count"], Event.objects.count())
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_COUNT_ESTIMATE_THRESHOLD=1000)
+    def test_estimated_count(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        with mock.patch("crm_api.pagination.estimate_count", return_value=10):
+            response = self.client.get("/events/")
+        self.assertEqual(response.data["count_type"], "exact")
+        with mock.patch("crm_api.pagination.estimate_count", return_value=12345):
+            response = self.client.get("/events/")
+        self.assertEqual(response.data["count_type"], "estimated")
+        self.assertEqual(response.data["count"], 12345)
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_COUNT_ESTIMATE_THRESHOLD=1000)
+    def test_pages_with_estimated_count(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        # surestimation : pas de page vide ni de lien next
+        with mock.patch("crm_api.pagination.estimate_count", return_value=12345):
+            response = self.client.get("/events/")
+            self.assertEqual(len(response.data["results"]), Event.objects.count())
+            self.assertIsNone(response.data["next"])
+            response = self.client.get("/events/?page=2")
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        # sous-estimation : toutes les pages sont servies
+        with mock.patch("crm_api.pagination.estimate_count", return_value=1000), \
+                mock.patch.object(CrmPagination, "page_size", 1):
+            response = self.client.get("/events/?page=2")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["count_type"], "estimated")
+            self.assertIsNone(response.data["next"])
+            self.assertIsNotNone(self.client.get("/events/").data["next"])
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_COUNT_CACHE_TIMEOUT=60)
+    def test_pages_with_stale_cached_count(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        with mock.patch.object(CrmPagination, "page_size", 1):
+            self.assertEqual(self.client.get("/events/").data["count"], 2)
+            # bulk_create sans signaux : count en cache périmé
+            the_event = Event.objects.get(pk=1)
+            the_event.pk = None
+            Event.objects.bulk_create([the_event])
+            response = self.client.get("/events/?page=2")
+            self.assertEqual(response.data["count_type"], "cached")
+            self.assertIsNotNone(response.data["next"])
+            response = self.client.get("/events/?page=3")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data["results"]), 1)
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_COUNT_CACHE_TIMEOUT=60)
+    def test_cached_count(self):
+        self.login("sales_contact_01", "N3wpolo6")
+        response = self.client.get("/clients/")
+        self.assertEqual(response.data["count_type"], "exact")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/clients/")
+        self.assertEqual(response.data["count_type"], "cached")
+        for query in context.captured_queries:
+            self.assertNotIn("COUNT(", query["sql"])
+        response = self.client.get("/clients/?search=nothing")
+        self.assertEqual(response.data["count_type"], "exact")
+        self.assertEqual(response.data["count"], 0)
+
+
+class ExportViewTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    def export(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("sales_contact_01", "/clients/"),
+            ("support_contact_01", "/clients/"),
+            ("sales_contact_01", "/contracts/"),
+            ("staff_contact_01", "/contracts/?client=1"),
+            ("sales_contact_01", "/events/"),
+            ("support_contact_01", "/events/"),
+        ]
+    )
+    def test_export_ndjson(self, username, url):
+        self.login(username, "N3wpolo6")
+        expected = self.client.get(url).data["results"]
+        path, _, query = url.partition("?")
+        content = self.export(f"{path}export/?{query}")
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [row["id"] for row in rows],
+            sorted(item["id"] for item in expected),
+        )
+
+    @pytest.mark.django_db
+    def test_export_csv(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        content = self.export("/events/export/?export_format=csv")
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), Event.objects.count())
+        self.assertIn("event_status.status", rows[0])
+        self.assertEqual(rows[0]["id"], str(Event.objects.order_by("id")[0].pk))
+
+    @pytest.mark.django_db
+    def test_export_empty_csv(self):
+        Event.objects.all().delete()
+        self.login("staff_contact_01", "N3wpolo6")
+        content = self.export("/events/export/?export_format=csv")
+        self.assertEqual(len(content.splitlines()), 1)
+        self.assertIn("event_status.status", next(csv.reader(io.StringIO(content))))
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("text/csv", "text/csv"),
+            ("application/x-ndjson", "application/x-ndjson"),
+        ]
+    )
+    def test_export_negotiated_with_accept(self, accept, content_type):
+        self.login("staff_contact_01", "N3wpolo6")
+        response = self.client.get("/events/export/", HTTP_ACCEPT=accept)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith(content_type))
+        content = b"".join(response.streaming_content).decode()
+        if accept == "text/csv":
+            rows = list(csv.DictReader(io.StringIO(content)))
+        else:
+            rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), Event.objects.count())
+
+    @pytest.mark.django_db
+    def test_export_invalid_format(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        response = self.client.get("/clients/export/?export_format=xml")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("support_contact_01", "/contracts/export/"),
+            ("anonymous_user", "/clients/export/"),
+            ("anonymous_user", "/events/export/"),
+        ]
+    )
+    def test_export_forbidden(self, username, url):
+        self.login(username, "N3wpolo6")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BulkCreateViewTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    def clients_data(self, size, prefix="bulk"):
+        return [
+            {
+                "first_name": "Bulk",
+                "last_name": f"Client {i}",
+                "email": f"{prefix}.client.{i}@example.com",
+                "sales_contact_id": 1,
+            }
+            for i in range(size)
+        ]
+
+    def bulk_create(self, url, data, status_code):
+        response = self.client.post(url, data, content_type="application/json")
+        self.assertEqual(response.status_code, status_code)
+        return response
+
+    @pytest.mark.django_db
+    def test_bulk_create_clients(self):
+        self.login("sales_contact_01", "N3wpolo6")
+        self.bulk_create("/clients/bulk/", self.clients_data(1, "first"),
+                         status.HTTP_201_CREATED)
+        count = Client.objects.count()
+        with CaptureQueriesContext(connection) as small:
+            self.bulk_create("/clients/bulk/", self.clients_data(2, "small"),
+                             status.HTTP_201_CREATED)
+        with CaptureQueriesContext(connection) as large:
+            response = self.bulk_create("/clients/bulk/", self.clients_data(20),
+                                        status.HTTP_201_CREATED)
+        self.assertEqual(len(large), len(small))
+        self.assertEqual(Client.objects.count(), count + 22)
+        self.assertEqual(len(response.data), 20)
+        for item in response.data:
+            self.assertEqual(Client.objects.get(pk=item["id"]).email, item["email"])
+        # les nouveaux clients sont visibles par leur commercial
+        response = self.client.get(f"/clients/{response.data[0]['id']}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @pytest.mark.django_db
+    def test_bulk_create_errors(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        count = Client.objects.count()
+        data = self.clients_data(4)
+        data[1]["email"] = data[0]["email"]
+        data[2]["sales_contact_id"] = 999
+        data[3]["email"] = Client.objects.get(pk=1).email
+        response = self.bulk_create("/clients/bulk/", data,
+                                    status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("email", response.data[1])
+        self.assertIn("sales_contact_id", response.data[2])
+        self.assertIn("email", response.data[3])
+        self.assertEqual(Client.objects.count(), count)
+
+    @pytest.mark.django_db
+    def test_bulk_create_not_a_list(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        self.bulk_create("/clients/bulk/", self.clients_data(1)[0],
+                         status.HTTP_400_BAD_REQUEST)
+
+    @pytest.mark.django_db
+    def test_bulk_create_contracts_and_events(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        contracts = [
+            {
+                "status": False,
+                "amount": 1000.00 + i,
+                "payment_due": "2021-12-24T00:00:00Z",
+                "client_id": 1,
+                "sales_contact_id": 1,
+            }
+            for i in range(3)
+        ]
+        count = Contract.objects.count()
+        self.bulk_create("/contracts/bulk/", contracts, status.HTTP_201_CREATED)
+        self.assertEqual(Contract.objects.count(), count + 3)
+        events = [
+            {
+                "attendees": i,
+                "notes": "bulk event",
+                "event_date": "2021-12-01T00:00:00Z",
+                "client_id": 1,
+                "support_contact_id": 1,
+            }
+            for i in range(3)
+        ]
+        response = self.bulk_create("/events/bulk/", events, status.HTTP_201_CREATED)
+        self.assertEqual(Event.objects.filter(notes="bulk event").count(), 3)
+        self.assertEqual(response.data[0]["event_status"]["status"], "CREATED")
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("support_contact_01", "/clients/bulk/"),
+            ("support_contact_01", "/contracts/bulk/"),
+            ("anonymous_user", "/events/bulk/"),
+        ]
+    )
+    def test_bulk_create_forbidden(self, username, url):
+        self.login(username, "N3wpolo6")
+        self.bulk_create(url, [], status.HTTP_403_FORBIDDEN)
+
+
+class BulkUpdateViewTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    def bulk_update(self, url, data, status_code):
+        response = self.client.patch(url, data, content_type="application/json")
+        self.assertEqual(response.status_code, status_code)
+        return response
+
+    def visible_ids(self, url):
+        return [item["id"] for item in self.client.get(url).data["results"]]
+
+    @pytest.mark.django_db
+    def test_bulk_update_contracts_status(self):
+        self.login("sales_contact_01", "N3wpolo6")
+        ids = self.visible_ids("/contracts/")
+        before = {
+            contract.pk: contract.date_updated
+            for contract in Contract.objects.filter(pk__in=ids)
+        }
+        response = self.bulk_update(
+            "/contracts/bulk/",
+            [{"id": pk, "status": True} for pk in ids],
+            status.HTTP_200_OK,
+        )
+        self.assertEqual(response.data["updated"], len(ids))
+        for contract in Contract.objects.filter(pk__in=ids):
+            self.assertTrue(contract.status)
+            self.assertGreater(contract.date_updated, before[contract.pk])
+
+    @pytest.mark.django_db
+    def test_bulk_update_contracts_status_ids(self):
+        self.login("sales_contact_01", "N3wpolo6")
+        ids = self.visible_ids("/contracts/")
+        response = self.bulk_update(
+            "/contracts/bulk/", {"ids": ids, "status": True}, status.HTTP_200_OK
+        )
+        self.assertEqual(response.data["updated"], len(ids))
+        self.assertEqual(
+            set(Contract.objects.filter(pk__in=ids).values_list("status", flat=True)),
+            {True},
+        )
+        self.bulk_update(
+            "/contracts/bulk/", {"ids": ids, "amount": "1.00"},
+            status.HTTP_403_FORBIDDEN,
+        )
+
+    @pytest.mark.django_db
+    def test_bulk_update_contracts_filter(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        response = self.bulk_update(
+            "/contracts/bulk/?client=1", {"amount": "1234.50"}, status.HTTP_200_OK
+        )
+        self.assertEqual(
+            response.data["updated"], Contract.objects.filter(client_id=1).count()
+        )
+        self.assertEqual(
+            set(Contract.objects.filter(client_id=1).values_list("amount", flat=True)),
+            {Decimal("1234.50")},
+        )
+        self.assertFalse(Contract.objects.exclude(client_id=1)
+                         .filter(amount=Decimal("1234.50")).exists())
+
+    @pytest.mark.django_db
+    def test_bulk_update_contracts_ids(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        response = self.bulk_update(
+            "/contracts/bulk/", {"ids": [1, 3], "amount": "99.00"}, status.HTTP_200_OK
+        )
+        self.assertEqual(response.data["updated"], 2)
+        self.assertEqual(
+            set(Contract.objects.filter(amount=Decimal("99.00"))
+                .values_list("id", flat=True)),
+            {1, 3},
+        )
+        response = self.bulk_update(
+            "/contracts/bulk/", {"ids": "1", "amount": "99.00"},
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertIn("ids", response.data)
+
+    @pytest.mark.django_db
+    def test_bulk_update_without_filter(self):
+        # pas de modification de tous les contrats sans filtre ni ids
+        self.login("staff_contact_01", "N3wpolo6")
+        amounts = list(Contract.objects.values_list("amount", flat=True))
+        for url in ("/contracts/bulk/", "/contracts/bulk/?client=", "/contracts/bulk/?page=1"):
+            response = self.bulk_update(url, {"amount": "1.00"},
+                                        status.HTTP_400_BAD_REQUEST)
+            self.assertIn("non_field_errors", response.data)
+        self.assertEqual(list(Contract.objects.values_list("amount", flat=True)), amounts)
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_BULK_MAX_SIZE=1)
+    def test_bulk_update_max_size(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        response = self.bulk_update("/contracts/bulk/?client=1", {"amount": "1.00"},
+                                    status.HTTP_400_BAD_REQUEST)
+        self.assertIn("non_field_errors", response.data)
+        self.assertFalse(Contract.objects.filter(amount=Decimal("1.00")).exists())
+
+    @pytest.mark.django_db
+    def test_bulk_update_contracts_forbidden(self):
+        # un commercial ne peut modifier que le statut des contrats
+        self.login("sales_contact_01", "N3wpolo6")
+        ids = self.visible_ids("/contracts/")
+        self.bulk_update(
+            "/contracts/bulk/",
+            [{"id": pk, "amount": "1.00"} for pk in ids],
+            status.HTTP_403_FORBIDDEN,
+        )
+        self.login("support_contact_01", "N3wpolo6")
+        self.bulk_update("/contracts/bulk/", {"status": True},
+                         status.HTTP_403_FORBIDDEN)
+
+    @pytest.mark.django_db
+    def test_bulk_update_errors(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        amount = Contract.objects.get(pk=1).amount
+        response = self.bulk_update(
+            "/contracts/bulk/",
+            [
+                {"id": 1, "amount": "10.00"},
+                {"id": 999, "status": True},
+                {"id": 2, "amount": "not a number"},
+                {"id": 2, "client_id": 3},
+            ],
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertEqual(response.data[0], {})
+        self.assertIn("id", response.data[1])
+        self.assertIn("amount", response.data[2])
+        self.assertIn("client_id", response.data[3])
+        self.assertEqual(Contract.objects.get(pk=1).amount, amount)
+
+    @pytest.mark.django_db
+    def test_bulk_update_events_status(self):
+        self.login("support_contact_01", "N3wpolo6")
+        ids = self.visible_ids("/events/")
+        with CaptureQueriesContext(connection) as context:
+            response = self.bulk_update(
+                "/events/bulk/",
+                [{"id": pk, "event_status": {"status": "ENDED"}} for pk in ids],
+                status.HTTP_200_OK,
+            )
+        self.assertEqual(response.data["updated"], len(ids))
+        self.assertEqual(
+            set(Event.objects.filter(pk__in=ids)
+                .values_list("event_status__status", flat=True)),
+            {EventStatus.Status.ENDED},
+        )
+        updates = [query for query in context.captured_queries
+                   if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 1)
+
+    @pytest.mark.django_db
+    def test_bulk_update_events_invalid_status(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        response = self.bulk_update(
+            "/events/bulk/", {"event_status": {"status": "UNKNOWN"}},
+            status.HTTP_400_BAD_REQUEST,
+        )
+        self.assertIn("event_status", response.data)
+
+
+@override_settings(CRM_API_VISIBILITY_INDEX=True)
+class ReassignViewTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        visibility.rebuild()
+
+    def reassign(self, url, data, status_code):
+        response = self.client.post(url, data, content_type="application/json")
+        self.assertEqual(response.status_code, status_code)
+        return response
+
+    @pytest.mark.django_db
+    @parameterized.expand([(None,), (1,)])
+    def test_reassign_sales_portfolio(self, chunk_size):
+        self.login("staff_contact_01", "N3wpolo6")
+        clients = Client.objects.filter(sales_contact_id=1).count()
+        contracts = Contract.objects.filter(sales_contact_id=1).count()
+        response = self.reassign(
+            "/salescontacts/1/reassign/",
+            {"sales_contact_id": 2, "chunk_size": chunk_size},
+            status.HTTP_200_OK,
+        )
+        self.assertEqual(response.data, {"clients": clients, "contracts": contracts})
+        self.assertFalse(Client.objects.filter(sales_contact_id=1).exists())
+        self.assertFalse(Contract.objects.filter(sales_contact_id=1).exists())
+        self.assertEqual(visibility.check(), set())
+        self.assertEqual(SalesContact.objects.count(), 2)
+
+    @pytest.mark.django_db
+    def test_reassign_support_events(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        events = Event.objects.filter(support_contact_id=1).count()
+        response = self.reassign(
+            "/supportcontacts/1/reassign/", {"support_contact_id": 2},
+            status.HTTP_200_OK,
+        )
+        self.assertEqual(response.data, {"events": events})
+        self.assertEqual(Event.objects.filter(support_contact_id=2).count(),
+                         Event.objects.count())
+        self.assertEqual(visibility.check(), set())
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("staff_contact_01", {"sales_contact_id": 1}, status.HTTP_400_BAD_REQUEST),
+            ("staff_contact_01", {"sales_contact_id": 9}, status.HTTP_404_NOT_FOUND),
+            (
+                "staff_contact_01",
+                {"sales_contact_id": 2, "chunk_size": 0},
+                status.HTTP_400_BAD_REQUEST,
+            ),
+            ("sales_contact_01", {"sales_contact_id": 2}, status.HTTP_403_FORBIDDEN),
+        ]
+    )
+    def test_reassign_invalid(self, username, data, status_code):
+        self.login(username, "N3wpolo6")
+        self.reassign("/salescontacts/1/reassign/", data, status_code)
+        self.assertTrue(Client.objects.filter(sales_contact_id=1).exists())
+
+    @pytest.mark.django_db
+    def test_reassign_command(self):
+        management.call_command("reassignportfolio", "sales", "1", "2",
+                                "--chunk-size", "2", verbosity=0)
+        self.assertFalse(Client.objects.filter(sales_contact_id=1).exists())
+        with self.assertRaises(management.base.CommandError):
+            management.call_command("reassignportfolio", "support", "1", "9",
+                                    verbosity=0)
+
+
+@override_settings(CRM_API_VISIBILITY_INDEX=True)
+class ContactDeletionTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        visibility.rebuild()
+
+    @pytest.mark.django_db
+    def test_delete_contact_by_chunks(self):
+        the_contact = SalesContact.objects.get(pk=1)
+        total = deletion.cascade_size(the_contact)
+        progress = mock.Mock()
+        deleted = deletion.delete_contact(the_contact, chunk_size=1, progress=progress)
+        self.assertEqual(deleted, total)
+        self.assertEqual(progress.call_count, total)
+        progress.assert_called_with(total, total)
+        self.assertFalse(SalesContact.objects.filter(pk=1).exists())
+        self.assertFalse(Client.objects.filter(sales_contact_id=1).exists())
+        self.assertFalse(Contract.objects.filter(sales_contact_id=1).exists())
+        self.assertEqual(visibility.check(), set())
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_DELETION_THRESHOLD=0)
+    def test_destroy_in_background(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        the_contact = SupportContact.objects.get(pk=1)
+        total = deletion.cascade_size(the_contact)
+        with mock.patch("crm_api.deletion.threading.Thread") as thread:
+            response = self.client.delete("/supportcontacts/1/")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data,
+                         {"status": "running", "deleted": 0, "total": total})
+        thread.return_value.start.assert_called_once_with()
+        response = self.client.get("/supportcontacts/1/deletion/")
+        self.assertEqual(response.data["status"], "running")
+        # exécution du job sans thread
+        deletion.run_deletion_job(the_contact)
+        response = self.client.get("/supportcontacts/1/deletion/")
+        self.assertEqual(response.data,
+                         {"status": "done", "deleted": total, "total": total})
+        self.assertFalse(SupportContact.objects.filter(pk=1).exists())
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_DELETION_THRESHOLD=0)
+    def test_interrupted_deletion(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        with mock.patch("crm_api.deletion.threading.Thread") as thread:
+            self.client.delete("/supportcontacts/1/")
+            # job déjà en cours : pas de second thread
+            response = self.client.delete("/supportcontacts/1/")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        thread.return_value.start.assert_called_once_with()
+        # processus arrêté : plus d'avancement
+        with mock.patch("crm_api.deletion.time.time", return_value=time.time() + 600):
+            response = self.client.get("/supportcontacts/1/deletion/")
+        self.assertEqual(response.data["status"], "interrupted")
+        management.call_command("deletecontact", "support", "1", stdout=io.StringIO())
+        self.assertFalse(SupportContact.objects.filter(pk=1).exists())
+
+    @pytest.mark.django_db
+    def test_concurrent_destroys(self):
+        # deux suppressions simultanées : un seul job démarré
+        the_contact = SupportContact.objects.get(pk=1)
+        barrier = threading.Barrier(2)
+
+        def cascade_size(contact):
+            barrier.wait(timeout=5)
+            return 3
+
+        states = []
+        with mock.patch.object(deletion, "cascade_size", cascade_size), \
+                mock.patch.object(deletion, "_run_in_thread") as run_in_thread:
+            threads = [
+                threading.Thread(
+                    target=lambda: states.append(deletion.start_deletion_job(the_contact))
+                )
+                for _ in range(2)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(run_in_thread.call_count, 1)
+        self.assertEqual([state["status"] for state in states], ["running", "running"])
+
+    @pytest.mark.django_db
+    def test_deletion_without_signals(self):
+        the_contact = SalesContact.objects.get(pk=1)
+        with mock.patch("crm_api.signals.visibility.object_changed") as object_changed:
+            deletion.delete_contact(the_contact, chunk_size=1)
+        object_changed.assert_not_called()
+        self.assertEqual(visibility.check(), set())
+
+    @pytest.mark.django_db
+    def test_deletion_with_other_receivers(self):
+        # un receiver ajouté par ailleurs n'est pas ignoré
+        deleted = []
+
+        def on_event_deleted(sender, instance, **kwargs):
+            deleted.append(instance.pk)
+
+        expected = list(Event.objects.filter(client__sales_contact_id=1)
+                        .order_by("pk").values_list("pk", flat=True))
+        post_delete.connect(on_event_deleted, sender=Event)
+        try:
+            self.assertFalse(deletion.can_raw_delete(Event))
+            self.assertTrue(deletion.can_raw_delete(Client))
+            deletion.delete_contact(SalesContact.objects.get(pk=1), chunk_size=1)
+        finally:
+            post_delete.disconnect(on_event_deleted, sender=Event)
+        self.assertEqual(deleted, expected)
+        self.assertFalse(Client.objects.filter(sales_contact_id=1).exists())
+        self.assertEqual(visibility.check(), set())
+
+    @pytest.mark.django_db
+    def test_deletion_status_not_found(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        response = self.client.get("/salescontacts/1/deletion/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.login("sales_contact_01", "N3wpolo6")
+        response = self.client.get("/salescontacts/1/deletion/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @pytest.mark.django_db
+    def test_delete_command(self):
+        management.call_command("deletecontact", "sales", "2", "--chunk-size", "2",
+                                verbosity=0, stdout=io.StringIO())
+        self.assertFalse(SalesContact.objects.filter(pk=2).exists())
+        self.assertFalse(Client.objects.filter(sales_contact_id=2).exists())
+        with self.assertRaises(management.base.CommandError):
+            management.call_command("deletecontact", "sales", "2", verbosity=0)
+
+
+class IdentityMapTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("/clients/1/", ClientFilter, Client, ClientSerializer),
+            ("/contracts/1/", ContractFilter, Contract, ContractSerializer),
+            ("/events/1/", EventFilter, Event, EventSerializer),
+        ]
+    )
+    def test_get_object_once(self, url, filter_backend, model, serializer_class):
+        self.login("staff_contact_01", "N3wpolo6")
+        data = serializer_class(model.objects.get(pk=1)).data
+        with mock.patch.object(
+            filter_backend, "filter_queryset", autospec=True,
+            side_effect=filter_backend.filter_queryset,
+        ) as filter_queryset:
+            response = self.client.patch(url, data, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        filter_queryset.assert_called_once()
+
+    @pytest.mark.django_db
+    def test_fetch_once(self):
+        identity_map = IdentityMap()
+        with self.assertNumQueries(1):
+            the_client = identity_map.fetch(Client, 1)
+            self.assertIs(identity_map.fetch(Client, "1"), the_client)
+        # une instance chargée sans les filtres d'une vue n'est pas visible
+        self.assertIsNone(identity_map.get(Client, 1, visible=True))
+
+
+@override_settings(CRM_API_OBJECT_CACHE=True)
+class ObjectCacheTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    def retrieve_data(self, url, status_code=status.HTTP_200_OK):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status_code)
+        return response.data
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("/clients/1/", ClientSerializer),
+            ("/contracts/1/", ContractSerializer),
+            ("/events/1/", EventSerializer),
+        ]
+    )
+    def test_cached_retrieve(self, url, serializer_class):
+        self.login("staff_contact_01", "N3wpolo6")
+        expected = self.retrieve_data(url)
+        with mock.patch.object(serializer_class, "to_representation") as to_representation:
+            self.assertEqual(self.retrieve_data(url), expected)
+        to_representation.assert_not_called()
+
+    @pytest.mark.django_db
+    def test_invalidation(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        self.retrieve_data("/events/1/")
+        the_event = Event.objects.get(pk=1)
+        the_event.notes = "invalidated by signal"
+        the_event.save()
+        self.assertEqual(self.retrieve_data("/events/1/")["notes"],
+                         "invalidated by signal")
+        EventStatus.objects.filter(pk=the_event.event_status_id).update(
+            status=EventStatus.Status.ENDED
+        )
+        EventStatus.objects.get(pk=the_event.event_status_id).save()
+        self.assertEqual(self.retrieve_data("/events/1/")["event_status"]["status"],
+                         "ENDED")
+        self.client.patch("/events/bulk/", [{"id": 1, "attendees": 42}],
+                          content_type="application/json")
+        self.assertEqual(self.retrieve_data("/events/1/")["attendees"], 42)
+        self.client.patch("/events/bulk/", {"ids": [1, 2], "attendees": 43},
+                          content_type="application/json")
+        self.assertEqual(self.retrieve_data("/events/1/")["attendees"], 43)
+
+    @pytest.mark.django_db
+    def test_visibility(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        self.retrieve_data("/clients/2/")
+        # client 2 n'est pas un client de sales_contact_01
+        self.login("sales_contact_01", "N3wpolo6")
+        self.retrieve_data("/clients/2/", status.HTTP_404_NOT_FOUND)
+        self.retrieve_data("/clients/1/")
+
+
+@override_settings(CRM_API_LIST_CACHE=True, CRM_API_FAST_LIST=False)
+class ListCacheTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    def list_data(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("/clients/", ClientSerializer),
+            ("/contracts/", ContractSerializer),
+            ("/events/?page=1", EventSerializer),
+        ]
+    )
+    def test_cached_list(self, url, serializer_class):
+        self.login("sales_contact_01", "N3wpolo6")
+        expected = self.list_data(url)
+        with mock.patch.object(serializer_class, "to_representation") as to_representation:
+            self.assertEqual(self.list_data(url), expected)
+        to_representation.assert_not_called()
+
+    @pytest.mark.django_db
+    def test_per_profile(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        self.assertEqual(self.list_data("/clients/")["count"], 2)
+        self.login("sales_contact_01", "N3wpolo6")
+        self.assertEqual(self.list_data("/clients/")["count"], 1)
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_VISIBILITY_INDEX=True)
+    def test_invalidation_of_the_contacts_concerned(self):
+        visibility.rebuild()
+        self.login("sales_contact_01", "N3wpolo6")
+        expected = self.list_data("/contracts/")
+        # le contrat 3 (client 2) n'est pas visible par sales_contact_01
+        the_contract = Contract.objects.get(pk=3)
+        the_contract.amount = Decimal("1.00")
+        the_contract.save()
+        with mock.patch.object(ContractSerializer, "to_representation") as to_representation:
+            self.assertEqual(self.list_data("/contracts/"), expected)
+        to_representation.assert_not_called()
+        # le contrat 2 (client 1) est visible par sales_contact_01
+        the_contract = Contract.objects.get(pk=2)
+        the_contract.amount = Decimal("2.00")
+        the_contract.save()
+        amounts = {
+            item["id"]: item["amount"] for item in self.list_data("/contracts/")["results"]
+        }
+        self.assertEqual(amounts[2], "2.00")
+
+    @pytest.mark.django_db
+    def test_invalidation_without_visibility_index(self):
+        self.login("sales_contact_01", "N3wpolo6")
+        self.list_data("/contracts/")
+        # sans la table Visibilities, toutes les listes sont invalidées
+        the_contract = Contract.objects.get(pk=2)
+        the_contract.amount = Decimal("2.00")
+        the_contract.save()
+        amounts = {
+            item["id"]: item["amount"] for item in self.list_data("/contracts/")["results"]
+        }
+        self.assertEqual(amounts[2], "2.00")
+
+    @pytest.mark.django_db
+    def test_invalidation_on_visibility_change(self):
+        self.login("sales_contact_filters_01", "N3wpolo6")
+        self.assertNotIn(
+            1, [item["id"] for item in self.list_data("/clients/")["results"]]
+        )
+        Client.objects.filter(pk=1).update(sales_contact_id=2)
+        Client.objects.get(pk=1).save()
+        self.assertIn(1, [item["id"] for item in self.list_data("/clients/")["results"]])
+        self.login("sales_contact_01", "N3wpolo6")
+        self.assertEqual(self.list_data("/clients/")["count"], 0)
+
+    @pytest.mark.django_db
+    def test_invalidation_on_bulk_update(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        self.list_data("/events/")
+        self.client.patch("/events/bulk/", {"ids": [1, 2], "attendees": 43},
+                          content_type="application/json")
+        attendees = {item["attendees"] for item in self.list_data("/events/")["results"]}
+        self.assertEqual(attendees, {43})
+        self.client.patch("/events/bulk/", [{"id": 1, "attendees": 42}],
+                          content_type="application/json")
+        attendees = {
+            item["id"]: item["attendees"] for item in self.list_data("/events/")["results"]
+        }
+        self.assertEqual(attendees[1], 42)
+
+
+@override_settings(CRM_API_COALESCE_LIST=True, CRM_API_FAST_LIST=False)
+class CoalescingTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    @pytest.mark.django_db
+    @parameterized.expand(["/clients/", "/contracts/", "/events/"])
+    def test_list(self, url):
+        self.login("sales_contact_01", "N3wpolo6")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with override_settings(CRM_API_COALESCE_LIST=False):
+            self.assertEqual(self.client.get(url).data, response.data)
+        self.assertEqual(SingleFlight.in_flight(), 0)
+
+    @pytest.mark.django_db
+    def test_shared_execution(self):
+        self.login("sales_contact_01", "N3wpolo6")
+        flight = Flight()
+        flight.data = {"count": 42}
+        flight.done.set()
+        SingleFlight._flights["in flight"] = flight
+        try:
+            with mock.patch("crm_api.list_cache.list_key", return_value="in flight"), \
+                    mock.patch.object(ContractSerializer, "to_representation") \
+                    as to_representation:
+                response = self.client.get("/contracts/")
+        finally:
+            del SingleFlight._flights["in flight"]
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"count": 42})
+        to_representation.assert_not_called()
+
+    @pytest.mark.django_db
+    def test_not_shared_between_contacts(self):
+        self.login("staff_contact_01", "N3wpolo6")
+        staff_count = self.client.get("/clients/").data["count"]
+        self.login("sales_contact_01", "N3wpolo6")
+        self.assertNotEqual(self.client.get("/clients/").data["count"], staff_count)
+
+
+class SparseFieldsetTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.login("staff_contact_01", "N3wpolo6")
+
+    def get_data(self, url, status_code=status.HTTP_200_OK):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status_code)
+        return response.data
+
+    @pytest.mark.django_db
+    def test_fields(self):
+        with CaptureQueriesContext(connection) as context:
+            data = self.get_data("/events/?fields=id,event_date,event_status")
+        for item in data["results"]:
+            self.assertEqual(list(item), ["id", "event_status", "event_date"])
+            self.assertEqual(item["event_status"]["status"], "CREATED")
+        select = [query["sql"] for query in context.captured_queries
+                  if f'"{Event._meta.db_table}"."event_date"' in query["sql"]]
+        self.assertEqual(len(select), 1)
+        self.assertNotIn("notes", select[0])
+        self.assertIn(EventStatus._meta.db_table, select[0])
+
+    @pytest.mark.django_db
+    def test_fields_without_relation(self):
+        with CaptureQueriesContext(connection) as context:
+            data = self.get_data("/events/?fields=id,attendees")
+        self.assertEqual(list(data["results"][0]), ["id", "attendees"])
+        select = [query["sql"] for query in context.captured_queries
+                  if f'"{Event._meta.db_table}"."attendees"' in query["sql"]]
+        self.assertNotIn(EventStatus._meta.db_table, select[0])
+
+    @pytest.mark.django_db
+    def test_exclude(self):
+        data = self.get_data("/events/?exclude=notes,event_status")
+        for item in data["results"]:
+            self.assertNotIn("notes", item)
+            self.assertNotIn("event_status", item)
+            self.assertIn("event_date", item)
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("/clients/1/?fields=id,sales_contact_id", ["id", "sales_contact_id"]),
+            ("/contracts/1/?fields=amount", ["amount"]),
+            ("/salescontacts/1/?fields=id", ["id"]),
+            ("/salescontacts/?fields=user", ["user"]),
+        ]
+    )
+    def test_all_viewsets(self, url, expected):
+        data = self.get_data(url)
+        item = data["results"][0] if "results" in data else data
+        self.assertEqual(list(item), expected)
+
+    @pytest.mark.django_db
+    def test_unknown_field(self):
+        data = self.get_data("/clients/?fields=id,unknown",
+                             status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(data["fields"], ["unknown fields: unknown"])
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_OBJECT_CACHE=True)
+    def test_object_cache(self):
+        self.get_data("/contracts/1/")
+        self.assertEqual(list(self.get_data("/contracts/1/?fields=id")), ["id"])
+        self.assertIn("amount", self.get_data("/contracts/1/"))
+
+
+class FastListTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("staff_contact_01", "/clients/"),
+            ("staff_contact_01", "/contracts/"),
+            ("staff_contact_01", "/events/"),
+            ("sales_contact_01", "/contracts/?status=true"),
+            ("support_contact_01", "/events/?pagination=cursor&ordering=-event_date"),
+            ("staff_contact_01", "/events/?fields=id,event_status,event_date"),
+            ("staff_contact_01", "/contracts/?exclude=amount"),
+        ]
+    )
+    def test_same_content(self, username, url):
+        self.login(username, "N3wpolo6")
+        with override_settings(CRM_API_FAST_LIST=False):
+            expected = self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, expected.content)
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("/clients/", ClientSerializer),
+            ("/contracts/", ContractSerializer),
+            ("/events/", EventSerializer),
+        ]
+    )
+    def test_without_serializer(self, url, serializer_class):
+        self.login("staff_contact_01", "N3wpolo6")
+        with mock.patch.object(serializer_class, "to_representation") as to_representation:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        to_representation.assert_not_called()
+
+    @pytest.mark.django_db
+    def test_plan(self):
+        plan = FieldPlan.of(EventSerializer())
+        self.assertIn("event_status__status", plan.columns)
+        self.assertIn("support_contact_id", plan.columns)
+        # UserSerializer a un champ many=True
+        self.assertIsNone(FieldPlan.compile(SalesContactSerializer()))
+
+
+class MessagePackViewTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.login("staff_contact_01", "N3wpolo6")
+
+    def unpack(self, content):
+        return msgpack.unpackb(content, ext_hook=ext_hook, timestamp=3,
+                               strict_map_key=False)
+
+    def get_msgpack(self, url):
+        response = self.client.get(url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        return self.unpack(response.content)
+
+    def assertSameValues(self, item, expected):
+        self.assertEqual(list(item), list(expected))
+        for name, value in item.items():
+            if isinstance(value, datetime):
+                self.assertEqual(value, parse_datetime(expected[name]))
+            elif isinstance(value, Decimal):
+                self.assertEqual(value, Decimal(expected[name]))
+            else:
+                self.assertEqual(value, expected[name])
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("/contracts/", True),
+            ("/contracts/", False),
+            ("/events/", True),
+            ("/events/", False),
+            ("/clients/", True),
+        ]
+    )
+    def test_list(self, url, fast_list):
+        with override_settings(CRM_API_FAST_LIST=fast_list):
+            data = self.get_msgpack(url)
+            expected = self.client.get(url).json()
+        self.assertEqual(data["count"], expected["count"])
+        for item, expected_item in zip(data["results"], expected["results"]):
+            self.assertSameValues(item, expected_item)
+
+    @pytest.mark.django_db
+    def test_native_types(self):
+        data = self.get_msgpack("/contracts/1/")
+        self.assertEqual(data["amount"], Decimal("2000.00"))
+        self.assertIsInstance(data["payment_due"], datetime)
+        self.assertSameValues(data, self.client.get("/contracts/1/").json())
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_OBJECT_CACHE=True)
+    def test_object_cache(self):
+        self.get_msgpack("/contracts/1/")
+        self.assertEqual(self.client.get("/contracts/1/").json()["amount"], "2000.00")
+        self.assertEqual(self.get_msgpack("/contracts/1/")["amount"], Decimal("2000.00"))
+
+    @pytest.mark.django_db
+    def test_create(self):
+        body = MessagePackRenderer().render(
+            {
+                "status": False,
+                "amount": Decimal("1234.50"),
+                "payment_due": datetime(2021, 12, 24, tzinfo=timezone.utc),
+                "client_id": 1,
+                "sales_contact_id": 1,
+            }
+        )
+        response = self.client.post("/contracts/", body,
+                                    content_type="application/msgpack",
+                                    HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = self.unpack(response.content)
+        self.assertEqual(data["amount"], Decimal("1234.50"))
+        self.assertEqual(data["payment_due"], datetime(2021, 12, 24, tzinfo=timezone.utc))
+
+    @pytest.mark.django_db
+    def test_bulk_create(self):
+        body = MessagePackRenderer().render(
+            [
+                {
+                    "first_name": "Bulk",
+                    "last_name": f"Client {i}",
+                    "email": f"msgpack.client.{i}@example.com",
+                    "sales_contact_id": 1,
+                }
+                for i in range(3)
+            ]
+        )
+        response = self.client.post("/clients/bulk/", body,
+                                    content_type="application/msgpack",
+                                    HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(self.unpack(response.content)), 3)
+
+    @pytest.mark.django_db
+    def test_export(self):
+        response = self.client.get("/events/export/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        unpacker = msgpack.Unpacker(ext_hook=ext_hook, timestamp=3)
+        unpacker.feed(b"".join(response.streaming_content))
+        rows = list(unpacker)
+        self.assertEqual([row["id"] for row in rows],
+                         list(Event.objects.order_by("id").values_list("id", flat=True)))
+        self.assertIsInstance(rows[0]["event_date"], datetime)
+
+
+@override_settings(CRM_API_COMPRESSION_MIN_SIZE=1024)
+class CompressionTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        CompressionMetrics.reset()
+        Event.objects.update(notes="n" * 2048)
+        self.login("staff_contact_01", "N3wpolo6")
+
+    def tearDown(self):
+        CompressionMetrics.reset()
+
+    def decompress(self, coding, content):
+        if coding == "gzip":
+            return gzip.decompress(content)
+        if coding == "br":
+            import brotli
+            return brotli.decompress(content)
+        import zstandard
+        return zstandard.ZstdDecompressor().decompressobj().decompress(content)
+
+    @pytest.mark.django_db
+    @parameterized.expand(["gzip", "br", "zstd"])
+    def test_compressed_list(self, coding):
+        if coding not in COMPRESSORS:
+            self.skipTest(f"{coding} is not installed")
+        expected = self.client.get("/events/")
+        response = self.client.get("/events/", HTTP_ACCEPT_ENCODING=coding)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Encoding"], coding)
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertLess(len(response.content), len(expected.content))
+        self.assertEqual(self.decompress(coding, response.content), expected.content)
+        self.assertIn("compress;dur=", response["Server-Timing"])
+        self.assertEqual(CompressionMetrics.snapshot()[coding]["responses"], 1)
+
+    @pytest.mark.django_db
+    def test_small_response(self):
+        response = self.client.get("/clients/1/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    @pytest.mark.django_db
+    def test_not_accepted(self):
+        response = self.client.get("/events/", HTTP_ACCEPT_ENCODING="identity")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    @pytest.mark.django_db
+    def test_streaming_export(self):
+        expected = b"".join(self.client.get("/events/export/").streaming_content)
+        response = self.client.get("/events/export/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        content = b"".join(response.streaming_content)
+        self.assertEqual(gzip.decompress(content), expected)
+        self.assertEqual(CompressionMetrics.snapshot()["gzip"]["bytes_in"], len(expected))
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_COMPRESSION_STREAMING=False)
+    def test_streaming_export_not_compressed(self):
+        response = self.client.get("/events/export/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    @pytest.mark.django_db
+    def test_conditional_request(self):
+        response = self.client.get("/events/1/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        response = self.client.get("/events/1/", HTTP_ACCEPT_ENCODING="gzip",
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertIn("Accept-Encoding", response["Vary"])
+        response = self.client.get("/events/1/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(f'W/{response["ETag"]}', etag)
+
+    @pytest.mark.django_db
+    def test_update_precondition(self):
+        # ETag faible renvoyé tel que reçu par le client dans If-Match
+        response = self.client.get("/clients/1/", HTTP_ACCEPT_ENCODING="gzip")
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith('W/"'))
+        data = {"phone": "0102030405"}
+        response = self.client.patch("/clients/1/", data,
+                                     content_type="application/json",
+                                     HTTP_ACCEPT_ENCODING="gzip",
+                                     HTTP_IF_MATCH='W/"stale"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.patch("/clients/1/", data,
+                                     content_type="application/json",
+                                     HTTP_ACCEPT_ENCODING="gzip",
+                                     HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Client.objects.get(pk=1).phone, "0102030405")
+
+
+class ConditionalRequestTest(TestCase, TestInterface):
+
+    fixtures = [
+        "contenttype.json",
+        "group.json",
+        "permission.json",
+        "eventstatus.json",
+        "user.json",
+        "salescontact.json",
+        "staffcontact.json",
+        "supportcontact.json",
+        "client.json",
+        "contract.json",
+        "event.json",
+    ]
+
+    def setUp(self):
+        cache.clear()
+        self.login("staff_contact_01", "N3wpolo6")
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("/clients/1/", Client, ClientSerializer),
+            ("/contracts/1/", Contract, ContractSerializer),
+            ("/events/1/", Event, EventSerializer),
+        ]
+    )
+    def test_retrieve_not_modified(self, url, model, serializer_class):
+        response = self.client.get(url)
+        etag = response["ETag"]
+        with mock.patch.object(serializer_class, "to_representation") as to_representation:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            response = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+            )
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        to_representation.assert_not_called()
+        model.objects.get(pk=1).save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    @pytest.mark.django_db
+    def test_update_precondition(self):
+        url = "/clients/1/"
+        response = self.client.get(url)
+        etag = response["ETag"]
+        data = dict(response.data, phone="0102030405")
+        response = self.client.patch(url, data, content_type="application/json",
+                                     HTTP_IF_MATCH='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertNotEqual(Client.objects.get(pk=1).phone, "0102030405")
+        response = self.client.patch(url, data, content_type="application/json",
+                                     HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Client.objects.get(pk=1).phone, "0102030405")
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response["ETag"], self.client.get(url)["ETag"])
+
+    def client_queries(self, url, **headers):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [query["sql"] for query in context.captured_queries
+                if 'FROM "crm_api_client"' in query["sql"]]
+
+    @pytest.mark.django_db
+    def test_validators_without_conditions(self):
+        # validateurs lus avant le handler pour les requêtes conditionnelles seules
+        self.assertEqual(len(self.client_queries("/clients/1/")), 1)
+        self.assertEqual(
+            len(self.client_queries("/clients/1/", HTTP_IF_NONE_MATCH='"other"')), 2
+        )
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_OBJECT_CACHE=True)
+    def test_cached_retrieve_visibility_once(self):
+        self.client_queries("/clients/1/")
+        for headers in ({}, {"HTTP_IF_NONE_MATCH": '"other"'}):
+            queries = self.client_queries("/clients/1/", **headers)
+            self.assertEqual(len(queries), 1)
+            self.assertTrue(queries[0].startswith('SELECT "crm_api_client"."date_updated"'))
+
+    @pytest.mark.django_db
+    @override_settings(CRM_API_CONDITIONAL_LIST=True)
+    def test_list_not_modified(self):
+        response = self.client.get("/clients/")
+        etag = response["ETag"]
+        response = self.client.get("/clients/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get("/clients/?search=Client", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        Client.objects.get(pk=2).delete()
+        response = self.client.get("/clients/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,170 @@
+"""
+Module test_visibility.py
+"""
+
+import pytest
+from crm_api import visibility
+from crm_api.filters import ClientFilter, ContractFilter, EventFilter
+from crm_api.models import (Client, Contract, Event, SalesContact,
+                            SupportContact, Visibility)
+from django.contrib.auth.models import User
+from django.core import management
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.client import RequestFactory
+from parameterized import parameterized
+
+FIXTURES = [
+    "contenttype.json",
+    "group.json",
+    "permission.json",
+    "user.json",
+    "salescontact.json",
+    "staffcontact.json",
+    "supportcontact.json",
+    "client.json",
+    "contract.json",
+    "eventstatus.json",
+    "event.json",
+]
+
+
+@override_settings(CRM_API_VISIBILITY_INDEX=True)
+class VisibilityTest(TestCase):
+    """
+    TestCase for testing the maintenance of the Visibility table
+    """
+
+    fixtures = FIXTURES
+
+    def setUp(self):
+        cache.clear()
+        # table construite par rebuildvisibility avant activation
+        visibility.rebuild()
+
+    @pytest.mark.django_db
+    def test_consistent_after_rebuild(self):
+        """
+        Test the Visibility table is consistent once rebuilt
+        """
+        self.assertTrue(Visibility.objects.exists())
+        self.assertEqual(visibility.check(), set())
+
+    @pytest.mark.django_db
+    def test_not_maintained(self):
+        """
+        Test the Visibility table is not maintained while loading fixtures
+        nor when CRM_API_VISIBILITY_INDEX is False
+        """
+        Visibility.objects.all().delete()
+        management.call_command("loaddata", "client.json", verbosity=0)
+        self.assertFalse(Visibility.objects.exists())
+        with override_settings(CRM_API_VISIBILITY_INDEX=False):
+            Client.objects.get(pk=1).save()
+            Contract.objects.get(pk=1).save()
+        self.assertFalse(Visibility.objects.exists())
+
+    @pytest.mark.django_db
+    def test_change_sales_contact(self):
+        """
+        Test the rows follow a client moved to another sales contact
+        """
+        client = Client.objects.get(pk=1)
+        other = SalesContact.objects.exclude(pk=client.sales_contact_id).first()
+        client.sales_contact = other
+        client.save()
+        self.assertTrue(
+            Visibility.objects.filter(
+                contact_id=other.pk,
+                role=visibility.SALES,
+                object_type=visibility.CLIENT,
+                object_id=client.pk,
+            ).exists()
+        )
+        self.assertEqual(visibility.check(), set())
+
+    @pytest.mark.django_db
+    def test_delete(self):
+        """
+        Test the rows of deleted objects are removed
+        """
+        Event.objects.all().delete()
+        self.assertFalse(Visibility.objects.filter(object_type=visibility.EVENT).exists())
+        Client.objects.all().delete()
+        self.assertFalse(Visibility.objects.exists())
+
+    @pytest.mark.django_db
+    def test_deferred_refresh(self):
+        """
+        Test the refresh is done once on exit of a deferred block
+        """
+        with visibility.deferred_refresh():
+            Contract.objects.all().delete()
+            self.assertTrue(
+                Visibility.objects.filter(object_type=visibility.CONTRACT).exists()
+            )
+        self.assertFalse(
+            Visibility.objects.filter(object_type=visibility.CONTRACT).exists()
+        )
+        self.assertEqual(visibility.check(), set())
+
+    @pytest.mark.django_db
+    def test_commands(self):
+        """
+        Test checkvisibility detects and fixes an inconsistent table
+        and rebuildvisibility rebuilds it
+        """
+        Visibility.objects.filter(object_type=visibility.CLIENT).delete()
+        with self.assertRaises(management.base.CommandError):
+            management.call_command("checkvisibility", verbosity=0)
+        management.call_command("checkvisibility", "--fix", verbosity=0)
+        self.assertEqual(visibility.check(), set())
+        Visibility.objects.all().delete()
+        management.call_command("rebuildvisibility", verbosity=0)
+        self.assertEqual(visibility.check(), set())
+
+
+class VisibilityFilterTest(TestCase):
+    """
+    TestCase for testing the filter backends with the Visibility table
+    """
+
+    fixtures = FIXTURES
+
+    def setUp(self):
+        cache.clear()
+        visibility.rebuild()
+        # un support de plus pour un client suivi par plusieurs contacts
+        event = Event.objects.get(pk=1)
+        event.pk = None
+        event.support_contact = SupportContact.objects.last()
+        with override_settings(CRM_API_VISIBILITY_INDEX=True):
+            event.save()
+
+    @pytest.mark.django_db
+    @parameterized.expand(
+        [
+            ("sales_contact_01", ClientFilter, Client),
+            ("sales_contact_filters_01", ClientFilter, Client),
+            ("support_contact_01", ClientFilter, Client),
+            ("support_contact_filters_01", ClientFilter, Client),
+            ("sales_contact_01", ContractFilter, Contract),
+            ("sales_contact_filters_01", ContractFilter, Contract),
+            ("sales_contact_01", EventFilter, Event),
+            ("sales_contact_filters_01", EventFilter, Event),
+            ("support_contact_01", EventFilter, Event),
+            ("support_contact_filters_01", EventFilter, Event),
+        ]
+    )
+    def test_same_results(self, username, filter_backend, model):
+        """
+        Test the filter backends give the same results with the index
+        """
+        request = RequestFactory().get("/")
+        request.user = User.objects.get(username=username)
+        expected = list(filter_backend().filter_queryset(request, model.objects.all()))
+        with override_settings(CRM_API_VISIBILITY_INDEX=True):
+            request = RequestFactory().get("/")
+            request.user = User.objects.get(username=username)
+            results = list(filter_backend().filter_queryset(request, model.objects.all()))
+        self.assertEqual(results, expected)
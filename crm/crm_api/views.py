@@ -2,6 +2,7 @@
 
 import logging
 
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core import management
@@ -9,6 +10,8 @@ from django.core import management
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters, generics, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.authentication import (BasicAuthentication,
                                            SessionAuthentication)
 from rest_framework.permissions import AllowAny
@@ -16,16 +19,33 @@ from rest_framework.response import Response
 from rest_framework_jwt.settings import api_settings
 
 
+from crm_api import bulk, deletion
+from crm_api.async_views import AsyncReadMixin
+from crm_api.authentication import revoke_tokens, role_claims_payload_handler
+from crm_api.coalescing import CoalescingMixin
+from crm_api.conditional import ConditionalMixin
 from crm_api.decorators import route_permissions
+from crm_api.export import (
+    EXPORT_RENDERER_CLASSES,
+    export_response,
+    requested_format,
+)
+from crm_api.fast_list import FastListMixin
 from crm_api.filters import ClientFilter, ContractFilter, EventFilter
+from crm_api.identity import IdentityMapMixin
+from crm_api.list_cache import ListCacheMixin
+from crm_api.lookups import LookupRegistry
+from crm_api.object_cache import ObjectCacheMixin
 from crm_api.models import (Client, Contract, Event, EventStatus, SalesContact,
                             StaffContact, SupportContact)
 from crm_api.permissions import ContractPermission
+from crm_api.renderers import NativeTypesMixin
 from crm_api.serializers import (ClientSerializer, ContractSerializer,
                                  EventSerializer, SalesContactSerializer,
                                  StaffContactSerializer,
                                  SupportContactSerializer, User,
                                  UserSerializer)
+from crm_api.sparse import SparseFieldsetMixin
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
@@ -36,6 +56,35 @@ jwt_payload_handler = api_settings.JWT_PAYLOAD_HANDLER
 jwt_encode_handler = api_settings.JWT_ENCODE_HANDLER
 
 
+def get_reassign_arguments(request, model, key):
+    """
+    Returns the contact receiving the objects and the chunk size
+    given in the data of a reassignment request
+    """
+    the_contact = generics.get_object_or_404(model, pk=request.data.get(key))
+    chunk_size = request.data.get("chunk_size")
+    if chunk_size is not None and (not isinstance(chunk_size, int) or chunk_size < 1):
+        raise ValidationError(
+            detail="chunk_size must be a positive integer", code="invalid"
+        )
+    return the_contact, chunk_size
+
+
+def get_event_status(value):
+    """
+    Returns the EventStatus of a {"status": label} value given in the data
+    of a request, or raises a ValidationError if the label is unknown
+    """
+    try:
+        return LookupRegistry.event_status_by_label(value["status"])
+    except (EventStatus.DoesNotExist, KeyError, TypeError):
+        raise ValidationError(
+            detail="status must be one of "
+            f"{', '.join(LookupRegistry.event_status_labels())}",
+            code="invalid",
+        )
+
+
 class CsrfExemptSessionAuthentication(SessionAuthentication):
     """
     Authentification Class to not perform the csrf check previously happening
@@ -63,7 +112,10 @@ class LoginView(generics.GenericAPIView):
             if username and password:
                 user = authenticate(username=username, password=password)
                 if user and user.is_active:
-                    payload = jwt_payload_handler(user)
+                    if settings.CRM_API_JWT_ROLE_CLAIMS:
+                        payload = role_claims_payload_handler(user)
+                    else:
+                        payload = jwt_payload_handler(user)
                     token = jwt_encode_handler(payload)
                     user_details = dict()
                     user_details["username"] = user.username
@@ -102,18 +154,32 @@ class LogoutView(generics.GenericAPIView):
         details["username"] = request.user.username
         details["message"] = "Your are now logged out"
         logger.info(msg=f"{self.__class__.__name__} : {request.user.username} logged out")
+        if settings.CRM_API_JWT_ROLE_CLAIMS and request.user.is_authenticated:
+            revoke_tokens(request.user.pk)
         logout(request)
         return Response(details, status=status.HTTP_200_OK)
 
 
-class SalesContactViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
+class SalesContactViewSet(
+    LoginRequiredMixin,
+    SparseFieldsetMixin,
+    NativeTypesMixin,
+    IdentityMapMixin,
+    viewsets.ModelViewSet,
+):
     """
     class SalesContactViewSet manages the following endpoints :
     /salescontacts/
     /salescontacts/{pk}/
+    /salescontacts/{pk}/reassign/
+    /salescontacts/{pk}/deletion/
     """
 
-    queryset = SalesContact.objects.order_by("id")
+    queryset = (
+        SalesContact.objects.select_related("user")
+        .prefetch_related("user__groups")
+        .order_by("id")
+    )
     serializer_class = SalesContactSerializer
     redirect_field_name = None
 
@@ -152,17 +218,64 @@ class SalesContactViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
 
     @route_permissions("crm_api.delete_salescontact")
     def destroy(self, request, *args, **kwargs):
-        return super().destroy(request, *args, **kwargs)
-
+        the_contact = self.get_object()
+        if deletion.cascade_size(the_contact) > settings.CRM_API_DELETION_THRESHOLD:
+            # suppression par lots en arrière-plan
+            state = deletion.start_deletion_job(the_contact)
+            return Response(state, status=status.HTTP_202_ACCEPTED)
+        self.perform_destroy(the_contact)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=["get"], url_path="deletion")
+    @route_permissions("crm_api.delete_salescontact")
+    def deletion_status(self, request, pk=None, *args, **kwargs):
+        state = deletion.get_deletion_job(SalesContact, pk)
+        if state is None:
+            raise NotFound()
+        return Response(state, status=status.HTTP_200_OK)
 
-class SupportContactViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
+    @action(detail=True, methods=["post"])
+    @route_permissions("crm_api.change_client")
+    @route_permissions("crm_api.change_contract")
+    def reassign(self, request, *args, **kwargs):
+        the_sales_contact = self.get_object()
+        the_new_sales_contact, chunk_size = get_reassign_arguments(
+            request, SalesContact, "sales_contact_id"
+        )
+        if the_new_sales_contact.pk == the_sales_contact.pk:
+            raise ValidationError(
+                detail="sales_contact_id must be another sales contact", code="invalid"
+            )
+        counts = bulk.reassign_sales_portfolio(
+            the_sales_contact, the_new_sales_contact, chunk_size
+        )
+        logger.info(
+            msg=f"{self.__class__.__name__} : portfolio of {the_sales_contact} "
+            f"reassigned to {the_new_sales_contact} {counts}"
+        )
+        return Response(counts, status=status.HTTP_200_OK)
+
+
+class SupportContactViewSet(
+    LoginRequiredMixin,
+    SparseFieldsetMixin,
+    NativeTypesMixin,
+    IdentityMapMixin,
+    viewsets.ModelViewSet,
+):
     """
     class SupportContactViewSet manages the following endpoints :
     /supportcontacts/
     /supportcontacts/{pk}/
+    /supportcontacts/{pk}/reassign/
+    /supportcontacts/{pk}/deletion/
     """
 
-    queryset = SupportContact.objects.order_by("id")
+    queryset = (
+        SupportContact.objects.select_related("user")
+        .prefetch_related("user__groups")
+        .order_by("id")
+    )
     serializer_class = SupportContactSerializer
     redirect_field_name = None
 
@@ -199,17 +312,62 @@ class SupportContactViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
 
     @route_permissions("crm_api.delete_supportcontact")
     def destroy(self, request, *args, **kwargs):
-        return super().destroy(request, *args, **kwargs)
-
+        the_contact = self.get_object()
+        if deletion.cascade_size(the_contact) > settings.CRM_API_DELETION_THRESHOLD:
+            # suppression par lots en arrière-plan
+            state = deletion.start_deletion_job(the_contact)
+            return Response(state, status=status.HTTP_202_ACCEPTED)
+        self.perform_destroy(the_contact)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=["get"], url_path="deletion")
+    @route_permissions("crm_api.delete_supportcontact")
+    def deletion_status(self, request, pk=None, *args, **kwargs):
+        state = deletion.get_deletion_job(SupportContact, pk)
+        if state is None:
+            raise NotFound()
+        return Response(state, status=status.HTTP_200_OK)
 
-class StaffContactViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
+    @action(detail=True, methods=["post"])
+    @route_permissions("crm_api.change_event")
+    def reassign(self, request, *args, **kwargs):
+        the_support_contact = self.get_object()
+        the_new_support_contact, chunk_size = get_reassign_arguments(
+            request, SupportContact, "support_contact_id"
+        )
+        if the_new_support_contact.pk == the_support_contact.pk:
+            raise ValidationError(
+                detail="support_contact_id must be another support contact",
+                code="invalid",
+            )
+        counts = bulk.reassign_support_events(
+            the_support_contact, the_new_support_contact, chunk_size
+        )
+        logger.info(
+            msg=f"{self.__class__.__name__} : events of {the_support_contact} "
+            f"reassigned to {the_new_support_contact} {counts}"
+        )
+        return Response(counts, status=status.HTTP_200_OK)
+
+
+class StaffContactViewSet(
+    LoginRequiredMixin,
+    SparseFieldsetMixin,
+    NativeTypesMixin,
+    IdentityMapMixin,
+    viewsets.ModelViewSet,
+):
     """
     class StaffContactViewSet manages the following endpoints :
     /staffcontacts/
     /staffcontacts/{pk}/
     """
 
-    queryset = StaffContact.objects.order_by("id")
+    queryset = (
+        StaffContact.objects.select_related("user")
+        .prefetch_related("user__groups")
+        .order_by("id")
+    )
     serializer_class = StaffContactSerializer
     redirect_field_name = None
 
@@ -249,30 +407,60 @@ class StaffContactViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class ClientViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
+class ClientViewSet(
+    AsyncReadMixin,
+    LoginRequiredMixin,
+    SparseFieldsetMixin,
+    NativeTypesMixin,
+    ConditionalMixin,
+    ListCacheMixin,
+    CoalescingMixin,
+    ObjectCacheMixin,
+    IdentityMapMixin,
+    FastListMixin,
+    viewsets.ModelViewSet,
+):
     """
     class ClientViewSet manages the following endpoints :
     /clients/
     /clients/{pk}/
+    /clients/export/
+    /clients/bulk/
     """
 
     queryset = Client.objects.all()
     serializer_class = ClientSerializer
+    fast_list = True
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, ClientFilter]
     filterset_fields = [
         "sales_contact",
     ]
     search_fields = ["first_name", "last_name", "email"]
+    # clé de tri de la pagination par curseur en plus de id (?ordering=)
+    cursor_ordering_fields = ("date_updated",)
     redirect_field_name = None
 
     def _prepare_update_client(self, request):
         the_client = self.get_object()
-        request.data["sales_contact_id"] = the_client.sales_contact.id
+        request.data["sales_contact_id"] = the_client.sales_contact_id
 
     @route_permissions("crm_api.add_client")
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    @route_permissions("crm_api.add_client")
+    def bulk_create(self, request, *args, **kwargs):
+        instances, errors = bulk.bulk_create(
+            self.get_serializer_class(),
+            request.data,
+            (("sales_contact", SalesContact, "sales_contact_id"),),
+        )
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(instances, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     @route_permissions("crm_api.view_client")
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -281,6 +469,17 @@ class ClientViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
+    @action(detail=False, methods=["get"], renderer_classes=EXPORT_RENDERER_CLASSES)
+    @route_permissions("crm_api.view_client")
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by("id")
+        return export_response(
+            queryset,
+            self.get_serializer_class(),
+            requested_format(request),
+            self.basename,
+        )
+
     @route_permissions("crm_api.change_client")
     def update(self, request, *args, **kwargs):
         self._prepare_update_client(request)
@@ -296,31 +495,77 @@ class ClientViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class ContractViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
+class ContractViewSet(
+    AsyncReadMixin,
+    LoginRequiredMixin,
+    SparseFieldsetMixin,
+    NativeTypesMixin,
+    ConditionalMixin,
+    ListCacheMixin,
+    CoalescingMixin,
+    ObjectCacheMixin,
+    IdentityMapMixin,
+    FastListMixin,
+    viewsets.ModelViewSet,
+):
     """
     class ContractViewSet manages the following endpoints :
     /contracts/
     /contracts/{pk}/
+    /contracts/export/
+    /contracts/bulk/
     """
 
     queryset = Contract.objects.all()
     serializer_class = ContractSerializer
+    fast_list = True
     permission_classes = [
         ContractPermission,
     ]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, ContractFilter]
     filterset_fields = ["sales_contact", "client"]
+    # clé de tri de la pagination par curseur en plus de id (?ordering=)
+    cursor_ordering_fields = ("date_updated",)
     redirect_field_name = None
 
     def _prepare_update_contract(self, request):
         the_contract = self.get_object()
-        request.data["client_id"] = the_contract.client.id
-        request.data["sales_contact_id"] = the_contract.sales_contact.id
+        request.data["client_id"] = the_contract.client_id
+        request.data["sales_contact_id"] = the_contract.sales_contact_id
 
     @route_permissions("crm_api.add_contract")
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    @route_permissions("crm_api.add_contract")
+    def bulk_create(self, request, *args, **kwargs):
+        instances, errors = bulk.bulk_create(
+            self.get_serializer_class(),
+            request.data,
+            (
+                ("sales_contact", SalesContact, "sales_contact_id"),
+                ("client", Client, "client_id"),
+            ),
+        )
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(instances, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @bulk_create.mapping.patch
+    def bulk_update(self, request, *args, **kwargs):
+        count, errors = bulk.bulk_update(
+            self.filter_queryset(self.get_queryset()),
+            self.get_serializer_class(),
+            request.data,
+            ("status", "amount", "payment_due"),
+            filtered=bulk.has_filters(request, self),
+        )
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"updated": count}, status=status.HTTP_200_OK)
+
     @route_permissions("crm_api.view_contract")
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -329,6 +574,17 @@ class ContractViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
+    @action(detail=False, methods=["get"], renderer_classes=EXPORT_RENDERER_CLASSES)
+    @route_permissions("crm_api.view_contract")
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by("id")
+        return export_response(
+            queryset,
+            self.get_serializer_class(),
+            requested_format(request),
+            self.basename,
+        )
+
     def update(self, request, *args, **kwargs):
         self._prepare_update_contract(request)
         return super().update(request, *args, **kwargs)
@@ -342,42 +598,93 @@ class ContractViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
 
 
-class EventViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
+class EventViewSet(
+    AsyncReadMixin,
+    LoginRequiredMixin,
+    SparseFieldsetMixin,
+    NativeTypesMixin,
+    ConditionalMixin,
+    ListCacheMixin,
+    CoalescingMixin,
+    ObjectCacheMixin,
+    IdentityMapMixin,
+    FastListMixin,
+    viewsets.ModelViewSet,
+):
     """
     class EventViewSet manages the following endpoints :
     /events/
     /events/{pk}/
+    /events/export/
+    /events/bulk/
     """
 
-    queryset = Event.objects.all()
+    queryset = Event.objects.select_related("event_status")
     serializer_class = EventSerializer
+    fast_list = True
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, EventFilter]
     filterset_fields = ["support_contact", "client", "event_status"]
     search_fields = [
         "notes",
     ]
+    # clé de tri de la pagination par curseur en plus de id (?ordering=)
+    cursor_ordering_fields = ("date_updated",)
     redirect_field_name = None
 
     def _prepare_update_event(self, request):
         the_event = self.get_object()
-        request.data["client_id"] = the_event.client.id
-        request.data["support_contact_id"] = the_event.support_contact.id
-        if "event_status" in request.data and "status" in request.data["event_status"]:
-            the_event_status = [
-                item
-                for item in EventStatus.objects.all()
-                if item.__str__() == request.data["event_status"]["status"]
-            ][0]
+        request.data["client_id"] = the_event.client_id
+        request.data["support_contact_id"] = the_event.support_contact_id
+        if "event_status" in request.data:
+            try:
+                the_event_status = get_event_status(request.data["event_status"])
+            except ValidationError as exc:
+                raise ValidationError(detail={"event_status": exc.detail})
             request.data["event_status_id"] = the_event_status.id
         else:
-            request.data["event_status_id"] = the_event.event_status.id
+            request.data["event_status_id"] = the_event.event_status_id
 
     @route_permissions("crm_api.add_event")
     def create(self, request, *args, **kwargs):
-        the_event_status = EventStatus.objects.get(status=EventStatus.Status.CREATED)
+        the_event_status = LookupRegistry.event_status(EventStatus.Status.CREATED)
         request.data["event_status_id"] = the_event_status.id
         return super().create(request, *args, **kwargs)
 
+    @action(detail=False, methods=["post"], url_path="bulk")
+    @route_permissions("crm_api.add_event")
+    def bulk_create(self, request, *args, **kwargs):
+        instances, errors = bulk.bulk_create(
+            self.get_serializer_class(),
+            request.data,
+            (
+                ("support_contact", SupportContact, "support_contact_id"),
+                ("client", Client, "client_id"),
+            ),
+            event_status=LookupRegistry.event_status(EventStatus.Status.CREATED),
+        )
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(instances, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @bulk_create.mapping.patch
+    @route_permissions("crm_api.change_event")
+    def bulk_update(self, request, *args, **kwargs):
+        def resolve_event_status(value):
+            return "event_status", get_event_status(value)
+
+        count, errors = bulk.bulk_update(
+            self.filter_queryset(self.get_queryset()),
+            self.get_serializer_class(),
+            request.data,
+            ("attendees", "event_date", "notes"),
+            {"event_status": resolve_event_status},
+            filtered=bulk.has_filters(request, self),
+        )
+        if errors:
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"updated": count}, status=status.HTTP_200_OK)
+
     @route_permissions("crm_api.view_event")
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
@@ -386,6 +693,17 @@ class EventViewSet(LoginRequiredMixin, viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
+    @action(detail=False, methods=["get"], renderer_classes=EXPORT_RENDERER_CLASSES)
+    @route_permissions("crm_api.view_event")
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).order_by("id")
+        return export_response(
+            queryset,
+            self.get_serializer_class(),
+            requested_format(request),
+            self.basename,
+        )
+
     @route_permissions("crm_api.change_event")
     def update(self, request, *args, **kwargs):
         self._prepare_update_event(request)
@@ -0,0 +1,224 @@
+"""
+Module maintaining the Visibility table from clients, contracts and events
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+from crm_api import list_cache
+from crm_api.models import Client, Contract, Event, Visibility
+
+SALES = Visibility.Role.SALES.value
+SUPPORT = Visibility.Role.SUPPORT.value
+CLIENT = Visibility.ObjectType.CLIENT.value
+CONTRACT = Visibility.ObjectType.CONTRACT.value
+EVENT = Visibility.ObjectType.EVENT.value
+
+_deferred = threading.local()
+
+
+def compute_rows(client_ids):
+    """
+    Returns the set of tuples (contact_id, role, object_type, object_id,
+    client_id) giving the visibility of the clients and of their contracts
+    and events, according to the rules of crm_api.filters
+    """
+    rows = set()
+    owners = dict(
+        Client.objects.filter(id__in=client_ids).values_list("id", "sales_contact_id")
+    )
+    contracts = Contract.objects.filter(client_id__in=list(owners)).values_list(
+        "id", "client_id", "sales_contact_id"
+    )
+    events = Event.objects.filter(client_id__in=list(owners)).values_list(
+        "id", "client_id", "support_contact_id"
+    )
+    # commerciaux des contrats de chaque client
+    contract_sales = dict()
+    for client_id, sales_contact_id in owners.items():
+        # un commercial voit ses clients
+        rows.add((sales_contact_id, SALES, CLIENT, client_id, client_id))
+    for contract_id, client_id, sales_contact_id in contracts:
+        # un commercial voit ses contrats et les contrats de ses clients
+        rows.add((sales_contact_id, SALES, CONTRACT, contract_id, client_id))
+        rows.add((owners[client_id], SALES, CONTRACT, contract_id, client_id))
+        contract_sales.setdefault(client_id, set()).add(sales_contact_id)
+    for event_id, client_id, support_contact_id in events:
+        # un support voit ses événements et les clients de ses événements
+        rows.add((support_contact_id, SUPPORT, EVENT, event_id, client_id))
+        rows.add((support_contact_id, SUPPORT, CLIENT, client_id, client_id))
+        # un commercial voit les événements de ses clients et de ses contrats
+        rows.add((owners[client_id], SALES, EVENT, event_id, client_id))
+        for sales_contact_id in contract_sales.get(client_id, ()):
+            rows.add((sales_contact_id, SALES, EVENT, event_id, client_id))
+    return rows
+
+
+def stored_rows(client_ids=None):
+    """
+    Returns the set of tuples stored in the Visibility table
+    for the clients, or for all the clients
+    """
+    queryset = Visibility.objects.all()
+    if client_ids is not None:
+        queryset = queryset.filter(client_id__in=client_ids)
+    return set(
+        queryset.values_list(
+            "contact_id", "role", "object_type", "object_id", "client_id"
+        )
+    )
+
+
+def refresh_clients(client_ids):
+    """
+    Recomputes the visibility rows of the clients, of their contracts
+    and of their events, and invalidates the cached lists of the contacts
+    which saw them or see them
+    """
+    client_ids = set(client_ids)
+    if not client_ids:
+        return
+    if getattr(_deferred, "client_ids", None) is not None:
+        _deferred.client_ids.update(client_ids)
+        return
+    with transaction.atomic():
+        # verrou des clients : deux rafraîchissements d'un même client
+        # sont exécutés l'un après l'autre
+        list(
+            Client.objects.select_for_update()
+            .filter(id__in=client_ids)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        queryset = Visibility.objects.filter(client_id__in=client_ids)
+        contacts = set(queryset.values_list("role", "contact_id").distinct())
+        queryset.delete()
+        rows = compute_rows(client_ids)
+        Visibility.objects.bulk_create(
+            (
+                Visibility(
+                    contact_id=contact_id,
+                    role=role,
+                    object_type=object_type,
+                    object_id=object_id,
+                    client_id=client_id,
+                )
+                for contact_id, role, object_type, object_id, client_id in rows
+            ),
+            # client supprimé (donc non verrouillé) rafraîchi en parallèle
+            ignore_conflicts=True,
+        )
+    contacts.update((row[1], row[0]) for row in rows)
+    list_cache.invalidate_contacts(contacts)
+
+
+def refresh_object(object_type, object_id, client_id):
+    """
+    Recomputes the visibility rows of the client of a contract or an event,
+    and of the client it was previously attached to
+    """
+    client_ids = {client_id}
+    client_ids.update(
+        Visibility.objects.filter(
+            object_type=object_type, object_id=object_id
+        ).values_list("client_id", flat=True)
+    )
+    refresh_clients(client_ids)
+
+
+def clients_changed(client_ids):
+    """
+    Refreshes the visibility rows of the clients after a write when
+    CRM_API_VISIBILITY_INDEX is True, otherwise invalidates all the cached
+    lists, the contacts which saw the clients being unknown without the table
+    """
+    if settings.CRM_API_VISIBILITY_INDEX:
+        refresh_clients(client_ids)
+    else:
+        list_cache.invalidate_all()
+
+
+def object_changed(object_type, object_id, client_id):
+    """
+    Same as clients_changed for a contract or an event
+    """
+    if settings.CRM_API_VISIBILITY_INDEX:
+        refresh_object(object_type, object_id, client_id)
+    else:
+        list_cache.invalidate_all()
+
+
+@contextmanager
+def deferred_refresh():
+    """
+    Context manager collecting the clients to refresh
+    and refreshing them once on exit, for bulk operations
+    """
+    if getattr(_deferred, "client_ids", None) is not None:
+        # déjà dans un bloc différé
+        yield
+        return
+    _deferred.client_ids = set()
+    try:
+        yield
+    finally:
+        client_ids, _deferred.client_ids = _deferred.client_ids, None
+    refresh_clients(client_ids)
+
+
+def client_id_chunks(chunk_size):
+    """
+    Yields the ids of all the clients by chunks
+    """
+    last_id = 0
+    while True:
+        chunk = list(
+            Client.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)[:chunk_size]
+        )
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def rebuild(chunk_size=1000):
+    """
+    Rebuilds the whole Visibility table, returns the number of rows
+    """
+    with transaction.atomic():
+        Visibility.objects.all().delete()
+        for chunk in client_id_chunks(chunk_size):
+            refresh_clients(chunk)
+        return Visibility.objects.count()
+
+
+def check(chunk_size=1000):
+    """
+    Compares the Visibility table with the clients, contracts and events,
+    returns the ids of the inconsistent clients
+    """
+    inconsistent = set()
+    for chunk in client_id_chunks(chunk_size):
+        expected = compute_rows(chunk)
+        for row in expected.symmetric_difference(stored_rows(chunk)):
+            inconsistent.add(row[4])
+    # lignes de clients qui n'existent plus
+    inconsistent.update(
+        Visibility.objects.exclude(client_id__in=Client.objects.values("id"))
+        .values_list("client_id", flat=True)
+        .distinct()
+    )
+    return inconsistent
+
+
+def visible_ids(role, contact_id, object_type):
+    """
+    Returns the subquery of the ids of the objects visible by a contact
+    """
+    return Visibility.objects.filter(
+        contact_id=contact_id, role=role, object_type=object_type
+    ).values("object_id")